@@ -1,108 +1,146 @@
-# -*- coding: utf-8 -*-
-# @author : caoyang
-# @email: caoyang@163.sufe.edu.cn
-# 默认参数配置: 尽量不要出现同名参数
-
-import argparse
-
-from copy import deepcopy
-
-class BaseConfig:
-	"""基础的全局配置"""
-	parser = argparse.ArgumentParser('--')
-	parser.add_argument('--filter_stopword', default=True, type=bool, help='是否过滤停用词')
-	parser.add_argument('--retrieval_model_name', default='tfidf', type=str, help='最终使用的文档检索模型')
-	parser.add_argument('--num_top_subject', default=3, type=int, help='每道题目对应的候选法律门类数量')
-	parser.add_argument('--use_reference', default=True, type=bool, help='是否使用参考书目文档')
-
-	parser.add_argument('--train_batch_size', default=32, type=int, help='训练集批训练的批大小')
-	parser.add_argument('--valid_batch_size', default=32, type=int, help='验证集批训练的批大小')
-	parser.add_argument('--test_batch_size', default=32, type=int, help='测试集批训练的批大小')
-	
-	parser.add_argument('--max_reference_length', default=512, type=int, help='参考书目段落分词序列最大长度, 512超过参考书目文档段落分词长度的0.998分位数')
-	parser.add_argument('--max_statement_length', default=256, type=int, help='题目题干分词序列最大长度')
-	parser.add_argument('--max_option_length', default=128, type=int, help='题目选项分词序列最大长度')
-	
-	parser.add_argument('--word_embedding', default=None, type=str, help='使用的词嵌入, 默认值None表示只用token2id的顺序编码值, 目前可用的值包括word2vec, fasttext, bert')
-	parser.add_argument('--document_embedding', default=None, type=str, help='使用的文档嵌入, 2021/12/27 13:55:42新增, 因为我发现调用BERT模型的话是不需要分词, 直接输入句子即可, 可以视为对句子(或文档)进行的嵌入, 而且Gensim里也有doc2vec的模型')
-
-	# 模型训练的配置
-	parser.add_argument('--num_epoch', default=32, type=int, help='训练轮数')
-	parser.add_argument('--lr_multiplier', default=.95, type=float, help='lr_scheduler的gamma参数值, 即学习率的衰减')
-	parser.add_argument('--learning_rate', default=.01, type=float, help='学习率或步长')
-	parser.add_argument('--weight_decay', default=.0, type=float, help='权重衰减')
-	
-	parser.add_argument('--do_valid', default=True, type=bool, help='是否在训练过程中进行模型验证')
-	parser.add_argument('--do_valid_plot', default=True, type=bool, help='是否在验证过程中绘制图像, 目前指对于判断题模型进行ROC曲线和PR曲线的绘制')
-
-
-	parser.add_argument('--num_best', default=32, type=int, help='Similarity的num_best参数值, 是目前引用的参考文献数目')
-
-
-class DatasetConfig:
-	"""数据集相关配置"""
-	parser = deepcopy(BaseConfig.parser)
-
-	parser.add_argument('--num_workers', default=0, type=int, help='DataLoader的num_workers参数值')
-	
-
-class RetrievalModelConfig:
-	"""文档检索模型相关配置"""
-	parser = deepcopy(BaseConfig.parser)
-	
-	parser.add_argument('--smartirs_tfidf', default=None, type=int, help='从{btnaldL}{xnftp}{xncub}的组合中挑选, 默认值为nfc, 详见https://radimrehurek.com/gensim/models/tfidfmodel.html')
-	parser.add_argument('--pivot_tfidf', default=None, type=float, help='针对长文档进行的枢轴修正参数, 见https://radimrehurek.com/gensim/models/tfidfmodel.html')
-	parser.add_argument('--slope_tfidf', default=.25, type=float, help='针对长文档进行的枢轴修正参数, 见https://radimrehurek.com/gensim/models/tfidfmodel.html')
-		
-	parser.add_argument('--num_topics_lsi', default=200, type=int, help='LSI模型的num_topics参数值')
-	parser.add_argument('--decay_lsi', default=1., type=float, help='LSI模型的decay参数值')
-	parser.add_argument('--power_iters_lsi', default=2, type=int, help='LSI模型的power_iters参数值')
-	parser.add_argument('--extra_samples_lsi', default=100, type=int, help='LSI模型的extra_samples参数值')
-	
-	parser.add_argument('--num_topics_lda', default=100, type=int, help='LDA模型的num_topics参数值')
-	parser.add_argument('--decay_lda', default=.5, type=float, help='LDA模型的decay参数值')
-	parser.add_argument('--iterations_lda', default=50, type=float, help='LDA模型的iterations参数值')
-	parser.add_argument('--gamma_threshold_lda', default=.001, type=float, help='LDA模型的gamma_threshold参数值')
-	parser.add_argument('--minimum_probability_lda', default=.01, type=float, help='LDA模型的minimum_probability参数值')
-			
-	parser.add_argument('--kappa_hdp', default=1., type=float, help='HDP模型的kappa参数值')
-	parser.add_argument('--tau_hdp', default=64., type=float, help='HDP模型的tau参数值')
-	parser.add_argument('--K_hdp', default=15, type=int, help='HDP模型的K参数值')
-	parser.add_argument('--T_hdp', default=150, type=int, help='HDP模型的T参数值')
-
-
-class EmbeddingModelConfig:
-	"""词嵌入模型相关配置"""
-	parser = deepcopy(BaseConfig.parser)
-	parser.add_argument('--size_word2vec', default=256, type=int, help='gensim嵌入模型Word2Vec的嵌入维数, 即Word2Vec模型的size参数')
-	parser.add_argument('--min_count_word2vec', default=5, type=int, help='Word2Vec模型的min_count参数')
-	parser.add_argument('--window_word2vec', default=5, type=int, help='Word2Vec模型的window参数')
-	parser.add_argument('--workers_word2vec', default=3, type=int, help='Word2Vec模型的workers参数')
-
-	parser.add_argument('--size_fasttext', default=256, type=int, help='gensim嵌入模型FastText的嵌入维数, 即FastText模型的size参数')
-	parser.add_argument('--min_count_fasttext', default=5, type=int, help='FastText模型的min_count参数')
-	parser.add_argument('--window_fasttext', default=5, type=int, help='FastText模型的window参数')
-	parser.add_argument('--workers_fasttext', default=3, type=int, help='FastText模型的workers参数')
-	
-	parser.add_argument('--size_doc2vec', default=512, type=int, help='gensim嵌入模型Doc2Vec的嵌入维数, 即FastText模型的vector_size参数(size参数即将被弃用)')
-	parser.add_argument('--min_count_doc2vec', default=5, type=int, help='Doc2Vec模型的min_count参数')
-	parser.add_argument('--window_doc2vec', default=5, type=int, help='Doc2Vec模型的window参数')
-	parser.add_argument('--workers_doc2vec', default=3, type=int, help='Doc2Vec模型的workers参数')
-	
-	
-	parser.add_argument('--bert_output', default='pooler_output', type=str, help='BERT模型使用的输出, 默认pooler_output即池化后的输出结果, 也可以使用last_hidden_output, 会比pooler多一个维度')
-
-class QAModelConfig:
-	"""问答模型相关配置"""
-	parser = deepcopy(BaseConfig.parser)
-	
-	parser.add_argument('--test_thresholds', default=[.4, .5, .6], type=list, help='判断题测试的阈值')
-
-
-
-
-if __name__ == '__main__':
-	config = BaseConfig()
-	parser = config.parser
-	args = parser.parse_args()
-	print('num_best' in args)
+# -*- coding: utf-8 -*-
+# @author : caoyang
+# @email: caoyang@163.sufe.edu.cn
+# 默认参数配置: 尽量不要出现同名参数
+
+import argparse
+
+from copy import deepcopy
+
+class BaseConfig:
+	"""基础的全局配置"""
+	parser = argparse.ArgumentParser('--')
+	parser.add_argument('--filter_stopword', default=True, type=bool, help='是否过滤停用词')
+	parser.add_argument('--retrieval_model_name', default='tfidf', type=str, help='最终使用的文档检索模型')
+	parser.add_argument('--num_top_subject', default=3, type=int, help='每道题目对应的候选法律门类数量')
+	parser.add_argument('--use_reference', default=True, type=bool, help='是否使用参考书目文档')
+
+	parser.add_argument('--train_batch_size', default=32, type=int, help='训练集批训练的批大小')
+	parser.add_argument('--valid_batch_size', default=32, type=int, help='验证集批训练的批大小')
+	parser.add_argument('--test_batch_size', default=32, type=int, help='测试集批训练的批大小')
+	
+	parser.add_argument('--max_reference_length', default=512, type=int, help='参考书目段落分词序列最大长度, 512超过参考书目文档段落分词长度的0.998分位数')
+	parser.add_argument('--max_statement_length', default=256, type=int, help='题目题干分词序列最大长度')
+	parser.add_argument('--max_option_length', default=128, type=int, help='题目选项分词序列最大长度')
+	
+	parser.add_argument('--word_embedding', default=None, type=str, help='使用的词嵌入, 默认值None表示只用token2id的顺序编码值, 目前可用的值包括word2vec, fasttext, bert')
+	parser.add_argument('--document_embedding', default=None, type=str, help='使用的文档嵌入, 2021/12/27 13:55:42新增, 因为我发现调用BERT模型的话是不需要分词, 直接输入句子即可, 可以视为对句子(或文档)进行的嵌入, 而且Gensim里也有doc2vec的模型')
+
+	# 模型训练的配置
+	parser.add_argument('--num_epoch', default=32, type=int, help='训练轮数')
+	parser.add_argument('--lr_multiplier', default=.95, type=float, help='lr_scheduler的gamma参数值, 即学习率的衰减')
+	parser.add_argument('--learning_rate', default=.01, type=float, help='学习率或步长')
+	parser.add_argument('--weight_decay', default=.0, type=float, help='权重衰减')
+	
+	parser.add_argument('--do_valid', default=True, type=bool, help='是否在训练过程中进行模型验证')
+	parser.add_argument('--do_valid_plot', default=True, type=bool, help='是否在验证过程中绘制图像, 目前指对于判断题模型进行ROC曲线和PR曲线的绘制')
+
+
+	parser.add_argument('--num_best', default=32, type=int, help='Similarity的num_best参数值, 是目前引用的参考文献数目')
+	
+	# 稠密向量(LSI/LDA/HDP主题向量, Doc2Vec段落向量)的近似最近邻索引配置
+	parser.add_argument('--use_ann', default=False, type=bool, help='稠密向量的检索是否使用IVF-PQ近似最近邻索引代替精确检索')
+	parser.add_argument('--n_lists_ann', default=None, type=int, help='近似最近邻索引的倒排列表数, 默认值None表示4 * sqrt(段落数)')
+	parser.add_argument('--n_subspaces_ann', default=16, type=int, help='近似最近邻索引乘积量化的子空间数')
+	parser.add_argument('--nprobe_ann', default=8, type=int, help='近似最近邻查询时访问的倒排列表数, 越大召回率越高, 速度越慢')
+	parser.add_argument('--rerank_ann', default=256, type=int, help='近似最近邻查询时用原始向量精确重排的候选数, 0表示不重排')
+
+	# 稠密双塔检索模型(neural)的配置
+	parser.add_argument('--embedding_neural', default=None, type=str, help='初始化稠密检索编码器的gensim词向量, 默认值None表示使用NEURAL_RETRIEVAL_MODEL_SUMMARY中的embedding字段, 目前可用的值包括word2vec, fasttext')
+	parser.add_argument('--d_output_neural', default=None, type=int, help='稠密检索编码器的输出维数, 默认值None表示与词向量维数相同, 此时投影层初始化为单位矩阵')
+	parser.add_argument('--dtype_neural', default='float16', type=str, help='参考书目段落向量矩阵的存储类型, 可选float16或int8(每行一个缩放系数)')
+	parser.add_argument('--block_size_neural', default=65536, type=int, help='最大内积检索时每块参与矩阵乘法的段落数')
+
+	# 两阶段级联检索的配置
+	parser.add_argument('--first_stage_cascade', default='bm25', type=str, help='级联检索第一阶段的召回模型, 应为tfidf, bm25等全库扫描代价较低的模型')
+	parser.add_argument('--second_stage_cascade', default='word2vec', type=str, help='级联检索第二阶段的重排模型, 可以是任意文档检索模型或gensim词嵌入模型')
+	parser.add_argument('--num_candidate_cascade', default=256, type=int, help='级联检索第一阶段召回的候选数, 即第二阶段的计算预算, 不小于num_best')
+
+	# 按法律门类分片检索的配置
+	parser.add_argument('--use_shard', default=False, type=bool, help='是否只在题目所属法律门类的分片中检索, 没有subject标签的题目检索first_pass_shard模型预测的num_top_subject个门类')
+	parser.add_argument('--first_pass_shard', default='bm25', type=str, help='分片检索时预测题目法律门类的第一遍检索模型')
+
+
+class DatasetConfig:
+	"""数据集相关配置"""
+	parser = deepcopy(BaseConfig.parser)
+
+	parser.add_argument('--num_workers', default=0, type=int, help='DataLoader的num_workers参数值')
+	parser.add_argument('--use_cache', default=True, type=bool, help='是否使用Dataset管道输出的磁盘缓存, 缓存以相关配置与输入文件的指纹为键, 输入不变时直接加载缓存')
+	
+
+class RetrievalModelConfig:
+	"""文档检索模型相关配置"""
+	parser = deepcopy(BaseConfig.parser)
+	
+	parser.add_argument('--smartirs_tfidf', default=None, type=int, help='从{btnaldL}{xnftp}{xncub}的组合中挑选, 默认值为nfc, 详见https://radimrehurek.com/gensim/models/tfidfmodel.html')
+	parser.add_argument('--pivot_tfidf', default=None, type=float, help='针对长文档进行的枢轴修正参数, 见https://radimrehurek.com/gensim/models/tfidfmodel.html')
+	parser.add_argument('--slope_tfidf', default=.25, type=float, help='针对长文档进行的枢轴修正参数, 见https://radimrehurek.com/gensim/models/tfidfmodel.html')
+		
+	parser.add_argument('--num_topics_lsi', default=200, type=int, help='LSI模型的num_topics参数值')
+	parser.add_argument('--decay_lsi', default=1., type=float, help='LSI模型的decay参数值')
+	parser.add_argument('--power_iters_lsi', default=2, type=int, help='LSI模型的power_iters参数值')
+	parser.add_argument('--extra_samples_lsi', default=100, type=int, help='LSI模型的extra_samples参数值')
+	
+	parser.add_argument('--num_topics_lda', default=100, type=int, help='LDA模型的num_topics参数值')
+	parser.add_argument('--decay_lda', default=.5, type=float, help='LDA模型的decay参数值')
+	parser.add_argument('--iterations_lda', default=50, type=float, help='LDA模型的iterations参数值')
+	parser.add_argument('--gamma_threshold_lda', default=.001, type=float, help='LDA模型的gamma_threshold参数值')
+	parser.add_argument('--minimum_probability_lda', default=.01, type=float, help='LDA模型的minimum_probability参数值')
+			
+	parser.add_argument('--kappa_hdp', default=1., type=float, help='HDP模型的kappa参数值')
+	parser.add_argument('--tau_hdp', default=64., type=float, help='HDP模型的tau参数值')
+	parser.add_argument('--K_hdp', default=15, type=int, help='HDP模型的K参数值')
+	parser.add_argument('--T_hdp', default=150, type=int, help='HDP模型的T参数值')
+	
+	parser.add_argument('--k1_bm25', default=1.2, type=float, help='BM25模型的k1参数值, 控制词频饱和的速度')
+	parser.add_argument('--b_bm25', default=.75, type=float, help='BM25模型的b参数值, 控制文档长度归一化的程度')
+
+
+class EmbeddingModelConfig:
+	"""词嵌入模型相关配置"""
+	parser = deepcopy(BaseConfig.parser)
+	parser.add_argument('--use_corpus_file', default=True, type=bool, help='训练Word2Vec, FastText与Doc2Vec模型时是否使用LineSentence格式的语料文件(corpus_file参数), 训练速度可以随workers线性扩展, 否则从参考书目文档流式读取(sentences参数), 只有一个生产者线程')
+	parser.add_argument('--size_word2vec', default=256, type=int, help='gensim嵌入模型Word2Vec的嵌入维数, 即Word2Vec模型的size参数')
+	parser.add_argument('--min_count_word2vec', default=5, type=int, help='Word2Vec模型的min_count参数')
+	parser.add_argument('--window_word2vec', default=5, type=int, help='Word2Vec模型的window参数')
+	parser.add_argument('--workers_word2vec', default=3, type=int, help='Word2Vec模型的workers参数')
+
+	parser.add_argument('--size_fasttext', default=256, type=int, help='gensim嵌入模型FastText的嵌入维数, 即FastText模型的size参数')
+	parser.add_argument('--min_count_fasttext', default=5, type=int, help='FastText模型的min_count参数')
+	parser.add_argument('--window_fasttext', default=5, type=int, help='FastText模型的window参数')
+	parser.add_argument('--workers_fasttext', default=3, type=int, help='FastText模型的workers参数')
+	
+	parser.add_argument('--size_doc2vec', default=512, type=int, help='gensim嵌入模型Doc2Vec的嵌入维数, 即FastText模型的vector_size参数(size参数即将被弃用)')
+	parser.add_argument('--min_count_doc2vec', default=5, type=int, help='Doc2Vec模型的min_count参数')
+	parser.add_argument('--window_doc2vec', default=5, type=int, help='Doc2Vec模型的window参数')
+	parser.add_argument('--workers_doc2vec', default=3, type=int, help='Doc2Vec模型的workers参数')
+	parser.add_argument('--infer_workers_doc2vec', default=None, type=int, help='Doc2Vec模型批量推断文档向量的进程数, 默认使用全部CPU核心, 1表示在当前进程中推断')
+	parser.add_argument('--seed_doc2vec', default=0, type=int, help='Doc2Vec模型推断每个文档向量前重置随机数生成器的种子, 使推断结果可以复现')
+	
+	parser.add_argument('--nonzero_limit_term_similarity', default=100, type=int, help='软余弦相似度的分词相似度矩阵中每个分词保留的最相似分词数, 即SparseTermSimilarityMatrix的nonzero_limit参数')
+	parser.add_argument('--threshold_term_similarity', default=0., type=float, help='分词相似度不超过该值的分词对不保留, 即WordEmbeddingSimilarityIndex的threshold参数')
+	parser.add_argument('--exponent_term_similarity', default=2., type=float, help='分词相似度取该次幂, 即WordEmbeddingSimilarityIndex的exponent参数')
+	parser.add_argument('--approximate_term_similarity', default=False, type=bool, help='构建分词相似度矩阵时是否用IVF-PQ近似最近邻索引查找最相似的分词')
+	parser.add_argument('--dtype_embedding_matrix', default='float32', type=str, help='按token2id编号导出的词向量矩阵的存储类型, 可选float32或float16')
+	
+	
+	parser.add_argument('--bert_output', default='pooler_output', type=str, help='BERT模型使用的输出, 默认pooler_output即池化后的输出结果, 也可以使用last_hidden_output, 会比pooler多一个维度')
+	parser.add_argument('--batch_size_bert', default=32, type=int, help='BERT模型批量编码文本时每批的文本数')
+	parser.add_argument('--n_threads_bert', default=None, type=int, help='BERT模型编码时的CPU线程数, 即torch.set_num_threads的参数, 默认不修改')
+
+class QAModelConfig:
+	"""问答模型相关配置"""
+	parser = deepcopy(BaseConfig.parser)
+	
+	parser.add_argument('--test_thresholds', default=[.4, .5, .6], type=list, help='判断题测试的阈值')
+	parser.add_argument('--freeze_embedding', default=True, type=bool, help='使用gensim词向量(word_embedding)初始化词嵌入层时是否冻结词嵌入层的参数')
+
+
+
+
+if __name__ == '__main__':
+	config = BaseConfig()
+	parser = config.parser
+	args = parser.parse_args()
+	print('num_best' in args)
@@ -4,15 +4,17 @@
 # 数据预处理
 
 import os
+import json
 import time
 import gensim
+import logging
 
 from setting import *
-from config import RetrievalModelConfig, EmbeddingModelConfig
-from src.data_tools import json_to_csv, split_validset, token2frequency_to_csv, token2id_to_csv, reference_to_csv, load_stopwords, filter_stopwords
-from src.retrieval_model import GensimRetrievalModel
-from src.embedding_model import GensimEmbeddingModel
-from src.utils import load_args, save_args, timer
+from config import DatasetConfig, RetrievalModelConfig, EmbeddingModelConfig
+from src.data_tools import json_to_csv, split_validset, token2frequency_to_csv, token2id_to_csv, reference_to_csv, update_reference_csv, load_stopwords, filter_stopwords, build_reference_id_store, build_reference_id_matrix
+from src.retrieval_model import GensimRetrievalModel, NeuralRetrieveModel
+from src.embedding_model import GensimEmbeddingModel, TransformersEmbeddingModel
+from src.utils import load_args, save_args, timer, run_task_graph
 
 # 新建所有文件夹
 def makedirs():
@@ -21,28 +23,36 @@ def makedirs():
 	os.makedirs(TEMP_DIR, exist_ok=True)
 	os.makedirs(MODEL_DIR, exist_ok=True)
 	os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+	os.makedirs(CACHE_DIR, exist_ok=True)
+	os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
 	os.makedirs(RETRIEVAL_MODEL_DIR, exist_ok=True)
 	os.makedirs(GENSIM_RETRIEVAL_MODEL_DIR, exist_ok=True)
+	os.makedirs(NEURAL_RETRIEVAL_MODEL_DIR, exist_ok=True)
+	os.makedirs(SHARDED_INDEX_DIR, exist_ok=True)
 	os.makedirs(EMBEDDING_MODEL_DIR, exist_ok=True)
 	os.makedirs(GENSIM_EMBEDDING_MODEL_DIR, exist_ok=True)
 
 
-# 题库训练集与测试集的预处理
+# 题库训练集与测试集的预处理: num_workers为分词使用的进程数, 默认使用全部CPU核心
 @timer
-def preprocess_trainsets_and_testsets():
+def preprocess_trainsets_and_testsets(num_workers=None):
+	if num_workers is None:
+		num_workers = os.cpu_count()
 	token2frequency = {}
 	for raw_trainset_path, trainset_path, validset_path in zip(RAW_TRAINSET_PATHs, TRAINSET_PATHs, VALIDSET_PATHs):
 		dataframe, token2frequency = json_to_csv(json_path=raw_trainset_path,
 												 csv_path=None,
 												 token2frequency=token2frequency,
-												 mode='train')
+												 mode='train',
+												 num_workers=num_workers)
 		split_validset(dataframe, train_export_path=trainset_path, valid_export_path=validset_path)
 
 	for raw_testset_path, new_testset_path in zip(RAW_TESTSET_PATHs, TESTSET_PATHs):
 		_, token2frequency = json_to_csv(json_path=raw_testset_path,
 										 csv_path=new_testset_path,
 										 token2frequency=token2frequency,
-										 mode='test')
+										 mode='test',
+										 num_workers=num_workers)
 
 	token2frequency_to_csv(export_path=TOKEN2FREQUENCY_PATH, token2frequency=token2frequency)
 	token2id_to_csv(export_path=TOKEN2ID_PATH, token2frequency=token2frequency)
@@ -54,111 +64,302 @@ def preprocess_reference_book():
 	_, token2frequency = reference_to_csv(export_path=REFERENCE_PATH)
 	token2frequency_to_csv(export_path=REFERENCE_TOKEN2FREQUENCY_PATH, token2frequency=token2frequency)
 	token2id_to_csv(export_path=REFERENCE_TOKEN2ID_PATH, token2frequency=token2frequency)
+	
+	# 参考书目段落预编码为分词编号矩阵, 默认按max_reference_length的默认值补全截断, 其他长度会在Dataset中按需生成
+	build_reference_id_store(reference_path=REFERENCE_PATH, token2id_path=REFERENCE_TOKEN2ID_PATH, export_path=REFERENCE_ID_STORE_PATH)
+	build_reference_id_matrix(max_length=load_args(Config=DatasetConfig).max_reference_length, store_path=REFERENCE_ID_STORE_PATH)
 
-# gensim文档检索模型预构建
+# 参考书目的增量更新: 按章节文件的内容哈希找出变化的章节, 只重新分词变化的章节, 并增量更新字典, 语料, 文档检索模型与相似度索引
+# 没有章节清单(旧版本预处理的结果)时退化为完整的预处理与模型构建
 @timer
-def build_gensim_retrieval_models(args=None, model_names=None, update_reference_corpus=False):
+def update_reference_book(args=None, model_names=None):
 	if args is None:
 		args = load_args(Config=RetrievalModelConfig)
-
-	if model_names is None:
-		model_names = list(GENSIM_RETRIEVAL_MODEL_SUMMARY.keys())
-			
+	tune_gensim_retrieval_args(args)
+	if not os.path.exists(REFERENCE_MANIFEST_PATH):
+		logging.warning(f'参考书目章节清单不存在, 完整重建: {REFERENCE_MANIFEST_PATH}')
+		preprocess_reference_book()
+		build_gensim_retrieval_models(args=args, model_names=model_names, update_reference_corpus=True)
+		return
+	plan = update_reference_csv(reference_path=REFERENCE_PATH, manifest_path=REFERENCE_MANIFEST_PATH)
+	if plan is None:
+		logging.info('参考书目没有变化')
+		return
+	keep_rows, n_new = plan
+	build_reference_id_store(reference_path=REFERENCE_PATH, token2id_path=REFERENCE_TOKEN2ID_PATH, export_path=REFERENCE_ID_STORE_PATH)
+	build_reference_id_matrix(max_length=load_args(Config=DatasetConfig).max_reference_length, store_path=REFERENCE_ID_STORE_PATH)
 	grm = GensimRetrievalModel(args=args)
+	matrix, _, _ = grm.update_reference_corpus(keep_rows=keep_rows, 
+											   n_new=n_new, 
+											   reference_path=REFERENCE_PATH, 
+											   dictionary_path=REFERENCE_DICTIONARY_PATH, 
+											   corpus_path=REFERENCE_CORPUS_PATH, 
+											   document_path=REFERENCE_DOCUMENT_PATH)
+	grm.update_retrieval_models(matrix=matrix, keep_rows=keep_rows, n_new=n_new, model_names=model_names)
 	
-	if update_reference_corpus:
-		grm.build_reference_corpus(reference_path=REFERENCE_PATH, 
-								   dictionary_export_path=REFERENCE_DICTIONARY_PATH, 
-								   corpus_export_path=REFERENCE_CORPUS_PATH)
+	# 已经构建的稠密检索模型: 字典新增分词后编码器的分词数不足, 重新初始化编码器并重新编码参考书目段落
+	nrm = NeuralRetrieveModel(args=args)
+	for model_name, summary in NEURAL_RETRIEVAL_MODEL_SUMMARY.items():
+		if (model_names is None or model_name in model_names) and os.path.exists(summary['model']):
+			nrm.build_similarity(model_name=model_name)
+
+# gensim文档检索模型的调参结果
+def tune_gensim_retrieval_args(args):
+	# 20211214更新: 默认参数是(None, None, .25), 测试下来这一组参数的hit@3精确率有87.8%
+	# ('atu', 1., .5)参数的hit@3能到91.6%
+	# ('atu', .5, .5)参数的hit@3还是87.8%
+	# ('ann', None, .25)参数的hit@3还是91.7%
+	# 详细调参结果见文件夹temp/tfidf调参/下的结果
+	args.smartirs = 'ann'
+	args.pivot = None
+	args.slope = .25
+	
+	args.num_topics_lsi = 256
+	args.power_iters_lsi = 3
+	args.extra_samples_lsi = 256
+	
+	args.decay_lda = 1.
+	args.iterations_lda = 500
+	args.gamma_threshold_lda = .0001
+	args.minimum_probability_lda = 0.
 	
+	args.kappa_hdp = 0.8
+	args.tau_hdp = 32.
+	args.K_hdp = 16
+	args.T_hdp = 256
 	
-	if 'tfidf' in model_names:
-		# 20211214更新: 默认参数是(None, None, .25), 测试下来这一组参数的hit@3精确率有87.8%
-		# ('atu', 1., .5)参数的hit@3能到91.6%
-		# ('atu', .5, .5)参数的hit@3还是87.8%
-		# ('ann', None, .25)参数的hit@3还是91.7%
-		# 详细调参结果见文件夹temp/tfidf调参/下的结果
-		args.smartirs = 'ann'
-		args.pivot = None
-		args.slope = .25
+	args.k1_bm25 = 1.2
+	args.b_bm25 = .75
+	return args
+
+# 构建单个gensim文档检索模型及其相似度索引: 依赖的模型(GENSIM_RETRIEVAL_MODEL_SUMMARY中的sequence)需要已经构建
+def build_gensim_retrieval_model(args, model_name):
+	grm = GensimRetrievalModel(args=args)
+	if model_name == 'tfidf':
 		grm.build_tfidf_model(corpus_import_path=REFERENCE_CORPUS_PATH, 
 							  model_export_path=REFERENCE_TFIDF_MODEL_PATH,
 							  corpus_export_path=REFERENCE_CORPUS_TFIDF_PATH)
-	if 'lsi' in model_names:
-		args.num_topics_lsi = 256
-		args.power_iters_lsi = 3
-		args.extra_samples_lsi = 256
+	elif model_name == 'lsi':
 		grm.build_lsi_model(corpus_import_path=REFERENCE_CORPUS_TFIDF_PATH, 
 							model_export_path=REFERENCE_LSI_MODEL_PATH,
 							corpus_export_path=REFERENCE_CORPUS_LSI_PATH)
-	if 'lda' in model_names:
-		args.num_topics_lsi = 256
-		args.decay_lda = 1.
-		args.iterations_lda = 500
-		args.gamma_threshold_lda = .0001
-		args.minimum_probability_lda = 0.
+	elif model_name == 'lda':
 		grm.build_lda_model(corpus_import_path=REFERENCE_CORPUS_TFIDF_PATH, 
 							model_export_path=REFERENCE_LDA_MODEL_PATH,
 							corpus_export_path=REFERENCE_CORPUS_LDA_PATH)
-	if 'hdp' in model_names:
-		args.kappa_hdp = 0.8
-		args.tau_hdp = 32.
-		args.K_hdp = 16
-		args.T_hdp = 256
+	elif model_name == 'hdp':
 		grm.build_hdp_model(corpus_import_path=REFERENCE_CORPUS_PATH,
 							model_export_path=REFERENCE_HDP_MODEL_PATH,
 							corpus_export_path=REFERENCE_CORPUS_HDP_PATH)
-	if 'logentropy' in model_names:				
+	elif model_name == 'logentropy':
 		grm.build_logentropy_model(corpus_import_path=REFERENCE_CORPUS_PATH, 
 								   model_export_path=REFERENCE_LOGENTROPY_MODEL_PATH,
 								   corpus_export_path=REFERENCE_CORPUS_LOGENTROPY_PATH)
+	elif model_name == 'bm25':
+		grm.build_bm25_model(corpus_import_path=REFERENCE_CORPUS_PATH,
+							 index_export_path=REFERENCE_BM25_INDEX_PATH)
+		return																		# BM25模型的倒排索引即为模型本身
+	else:
+		raise NotImplementedError
+	
+	# 每个模型的相似度索引只在这里构建一次, 之后查询时以内存映射方式加载
+	grm.build_similarity_index(model_name=model_name, export_path=GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['index'])
+	if GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['ann_index'] is not None:
+		grm.build_ann_index(model_name=model_name, export_path=GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['ann_index'])	# 稠密向量模型另外构建近似最近邻索引
+
+# gensim文档检索模型预构建
+@timer
+def build_gensim_retrieval_models(args=None, model_names=None, update_reference_corpus=False):
+	if args is None:
+		args = load_args(Config=RetrievalModelConfig)
+	tune_gensim_retrieval_args(args)
+
+	if model_names is None:
+		model_names = list(GENSIM_RETRIEVAL_MODEL_SUMMARY.keys())
+	
+	if update_reference_corpus:
+		grm = GensimRetrievalModel(args=args)
+		grm.build_reference_corpus(reference_path=REFERENCE_PATH, 
+								   dictionary_export_path=REFERENCE_DICTIONARY_PATH, 
+								   corpus_export_path=REFERENCE_CORPUS_PATH)
+	
+	for model_name in model_names:
+		build_gensim_retrieval_model(args=args, model_name=model_name)
 	
 	save_args(args=args, save_path=os.path.join(TEMP_DIR, 'RetrievalModelConfig.json'))
 
-# gensim词嵌入模型预构建
+# 构建按法律门类分片的相似度索引, 需要在对应的检索模型构建之后调用
 @timer
-def build_gensim_embedding_models(args=None, model_names=None):
+def build_sharded_indexes(args=None, model_names=None):
 	if args is None:
-		args = load_args(Config=EmbeddingModelConfig)
-		args.size_word2vec = 256
-		args.min_count_word2vec = 1
-		args.window_word2vec = 5
-		args.workers_word2vec = 16
-		
-		args.size_fasttext = 256			 
-		args.min_count_fasttext = 1	
-		args.window_fasttext = 5
-		args.workers_fasttext = 16	
-		
-		args.size_doc2vec = 512			 
-		args.min_count_doc2vec = 1	
-		args.window_doc2vec = 5
-		args.workers_doc2vec = 16	
-		
+		args = load_args(Config=RetrievalModelConfig)
 	if model_names is None:
-		model_names = list(GENSIM_EMBEDDING_MODEL_SUMMARY.keys())
+		model_names = [model_name for model_name, summary in RETRIEVAL_MODEL_SUMMARY.items() if summary['index_class'] is not None]	# 级联检索只使用第一阶段模型的分片索引
+	grm = GensimRetrievalModel(args=args)
+	for model_name in model_names:
+		grm.build_sharded_index(model_name=model_name, export_path=SHARDED_INDEX_PATH.format(model_name))
 
-	gem = GensimEmbeddingModel(args=args)
+# 离线预计算每个数据集划分在每个检索模型下的检索结果表, 之后所有需要检索结果的地方直接查表
+@timer
+def precompute_retrieval(args=None, model_names=None, splits=None):
+	if args is None:
+		args = load_args(Config=DatasetConfig)
+	if model_names is None:
+		model_names = list(RETRIEVAL_MODEL_SUMMARY.keys())
+	if splits is None:
+		splits = list(DATASET_SPLIT_PATHs.keys())
+	grm = GensimRetrievalModel(args=args)
+	for model_name in model_names:
+		for split in splits:
+			grm.build_retrieval_table(split=split, model_name=model_name)
+
+# gensim词嵌入模型的调参结果
+def tune_gensim_embedding_args(args):
+	args.size_word2vec = 256
+	args.min_count_word2vec = 1
+	args.window_word2vec = 5
+	args.workers_word2vec = 16
+	
+	args.size_fasttext = 256			 
+	args.min_count_fasttext = 1	
+	args.window_fasttext = 5
+	args.workers_fasttext = 16	
 	
-	if 'word2vec' in model_names:
-		gem.build_word2vec_model(corpus_import_path=REFERENCE_CORPUS_PATH, 
+	args.size_doc2vec = 512			 
+	args.min_count_doc2vec = 1	
+	args.window_doc2vec = 5
+	args.workers_doc2vec = 16	
+	return args
+
+# 构建单个gensim词嵌入模型
+def build_gensim_embedding_model(args, model_name):
+	gem = GensimEmbeddingModel(args=args)
+	if model_name == 'word2vec':
+		gem.build_word2vec_model(corpus_import_path=REFERENCE_LINE_SENTENCE_PATH, 
 								 document_import_path=REFERENCE_DOCUMENT_PATH,
 								 model_export_path=REFERENCE_WORD2VEC_MODEL_PATH)
-	if 'fasttext' in model_names:
-		gem.build_fasttext_model(corpus_import_path=REFERENCE_CORPUS_PATH, 
+	elif model_name == 'fasttext':
+		gem.build_fasttext_model(corpus_import_path=REFERENCE_LINE_SENTENCE_PATH, 
 								 document_import_path=REFERENCE_DOCUMENT_PATH,
 								 model_export_path=REFERENCE_FASTTEXT_MODEL_PATH)
-	if 'doc2vec' in model_names:
-		gem.build_doc2vec_model(corpus_import_path=REFERENCE_CORPUS_PATH, 
+	elif model_name == 'doc2vec':
+		gem.build_doc2vec_model(corpus_import_path=REFERENCE_LINE_SENTENCE_PATH, 
 								document_import_path=REFERENCE_DOCUMENT_PATH,
 								model_export_path=REFERENCE_DOC2VEC_MODEL_PATH)
+		gem.build_ann_index(model_name='doc2vec', export_path=REFERENCE_DOC2VEC_ANN_INDEX_PATH)
+	else:
+		raise NotImplementedError
+	gem.build_similarity_index(model_name=model_name, export_path=GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['index'])	# 分词相似度矩阵只在这里构建一次, 之后查询时以内存映射方式加载
+	if 'matrix' in GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]:
+		gem.build_embedding_matrix(model_name=model_name, export_path=GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['matrix'])	# 问答模型的词嵌入层由按token2id编号排列的词向量矩阵初始化
+
+# gensim词嵌入模型预构建
+@timer
+def build_gensim_embedding_models(args=None, model_names=None):
+	if args is None:
+		args = tune_gensim_embedding_args(load_args(Config=EmbeddingModelConfig))
+		
+	if model_names is None:
+		model_names = list(GENSIM_EMBEDDING_MODEL_SUMMARY.keys())
+
+	for model_name in model_names:
+		build_gensim_embedding_model(args=args, model_name=model_name)
 	
 	save_args(args=args, save_path=os.path.join(TEMP_DIR, 'EmbeddingModelConfig.json'))
+
+# 稠密双塔检索模型预构建: 编码器由词嵌入模型初始化, 需要在build_gensim_embedding_models之后调用
+@timer
+def build_neural_retrieval_models(args=None, model_names=None):
+	if args is None:
+		args = load_args(Config=RetrievalModelConfig)
+	if model_names is None:
+		model_names = list(NEURAL_RETRIEVAL_MODEL_SUMMARY.keys())
+	nrm = NeuralRetrieveModel(args=args)
+	for model_name in model_names:
+		nrm.build_encoder(model_name=model_name, export_path=NEURAL_RETRIEVAL_MODEL_SUMMARY[model_name]['model'])
+		nrm.build_similarity_index(model_name=model_name, export_path=NEURAL_RETRIEVAL_MODEL_SUMMARY[model_name]['index'])	# 参考书目段落只在这里离线编码一次
+
+# BERT文档向量缓存预构建: 题库与参考书目文档的所有文本只在这里编码一次, 之后生成数据集时直接读取缓存
+@timer
+def build_bert_vector_caches(args=None, model_names=None):
+	if args is None:
+		args = load_args(Config=EmbeddingModelConfig)
+	if model_names is None:
+		model_names = list(BERT_MODEL_SUMMARY.keys())
+	tem = TransformersEmbeddingModel(args=args)
+	for model_name in model_names:
+		tem.build_bert_cache(model_name=model_name)
+
+# 并行构建gensim文档检索模型与词嵌入模型: 按GENSIM_RETRIEVAL_MODEL_SUMMARY中sequence字段的依赖关系调度, 相互独立的模型在子进程中同时构建
+# 词嵌入模型本身会使用workers个线程, 调度时按workers计入CPU占用, 其余模型计为1个CPU, 所有同时运行的模型占用之和不超过cpu_budget
+# 返回每个模型的运行状态, 耗时(秒)与峰值内存(MB)
+@timer
+def build_gensim_models(retrieval_args=None, 
+						embedding_args=None, 
+						retrieval_model_names=None, 
+						embedding_model_names=None, 
+						update_reference_corpus=False, 
+						cpu_budget=None):
+	if retrieval_args is None:
+		retrieval_args = load_args(Config=RetrievalModelConfig)
+	tune_gensim_retrieval_args(retrieval_args)
+	if embedding_args is None:
+		embedding_args = tune_gensim_embedding_args(load_args(Config=EmbeddingModelConfig))
+	if retrieval_model_names is None:
+		retrieval_model_names = list(GENSIM_RETRIEVAL_MODEL_SUMMARY.keys())
+	if embedding_model_names is None:
+		embedding_model_names = list(GENSIM_EMBEDDING_MODEL_SUMMARY.keys())
+	
+	# 其他模型都依赖参考书目语料, 需要先单独构建
+	if update_reference_corpus:
+		grm = GensimRetrievalModel(args=retrieval_args)
+		grm.build_reference_corpus(reference_path=REFERENCE_PATH, 
+								   dictionary_export_path=REFERENCE_DICTIONARY_PATH, 
+								   corpus_export_path=REFERENCE_CORPUS_PATH)
+	
+	# 词嵌入模型在各自的子进程中训练, LineSentence格式的语料文件需要先在这里导出一次, 避免多个进程同时重新导出同一个文件
+	if embedding_model_names and embedding_args.use_corpus_file:
+		GensimEmbeddingModel.prepare_corpus_file(corpus_import_path=REFERENCE_LINE_SENTENCE_PATH, document_import_path=REFERENCE_DOCUMENT_PATH)
+	
+	tasks = {}
+	for model_name in retrieval_model_names:
+		dependencies = [_model_name for _model_name in GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['sequence'] if _model_name != model_name and _model_name in retrieval_model_names]	# 未在本次构建的依赖模型视为已经存在
+		tasks[model_name] = {
+			'function'		: build_gensim_retrieval_model,
+			'kwargs'		: {'args': retrieval_args, 'model_name': model_name},
+			'dependencies'	: dependencies,
+			'cpus'			: 1,
+		}
+	for model_name in embedding_model_names:
+		tasks[model_name] = {
+			'function'		: build_gensim_embedding_model,
+			'kwargs'		: {'args': embedding_args, 'model_name': model_name},
+			'dependencies'	: [],
+			'cpus'			: getattr(embedding_args, f'workers_{model_name}'),
+		}
+	summary = run_task_graph(tasks=tasks, cpu_budget=cpu_budget)
+	for model_name, model_summary in summary.items():
+		logging.info(f'{model_name}: {model_summary}')
+	
+	save_args(args=retrieval_args, save_path=os.path.join(TEMP_DIR, 'RetrievalModelConfig.json'))
+	save_args(args=embedding_args, save_path=os.path.join(TEMP_DIR, 'EmbeddingModelConfig.json'))
+	with open(os.path.join(TEMP_DIR, 'build_gensim_models.json'), 'w') as f:
+		json.dump(summary, f, indent=4)
+	failed_model_names = [model_name for model_name, model_summary in summary.items() if model_summary['status'] != 'done']
+	if failed_model_names:
+		raise RuntimeError(f'以下模型构建失败: {failed_model_names}')
+	return summary
 	
 if __name__ == '__main__':
 	# makedirs()
 	# preprocess_trainsets_and_testsets()
 	# preprocess_reference_book()
 	# build_gensim_retrieval_models(model_names=['tfidf', 'lsi', 'lda', 'hdp'], update_reference_corpus=True)
+	# update_reference_book(model_names=['tfidf', 'lsi', 'lda', 'hdp', 'logentropy', 'bm25'])
 	# build_gensim_embedding_models(model_names=['word2vec', 'fasttext'])
+	# build_neural_retrieval_models(model_names=['neural'])
+	# build_bert_vector_caches(model_names=['bert-base-chinese'])
+	# build_sharded_indexes(model_names=['tfidf', 'lsi', 'neural'])
+	# precompute_retrieval(model_names=['tfidf', 'lsi', 'lda', 'hdp', 'logentropy', 'bm25', 'neural'])
+	# build_gensim_models(update_reference_corpus=True, cpu_budget=os.cpu_count())
 	build_gensim_embedding_models(model_names=['word2vec', 'fasttext', 'doc2vec'])
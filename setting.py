@@ -32,12 +32,16 @@ RAW_TESTSET_PATHs	= [os.path.join(RAWDATA_DIR, '0_test.json'), os.path.join(RAWD
 TRAINSET_PATHs	= [os.path.join(NEWDATA_DIR, '0_train.csv'), os.path.join(NEWDATA_DIR, '1_train.csv')]		# 预处理后的训练集包含两个JSON文件: 第一个是概念题, 第二个是情境题
 VALIDSET_PATHs	= [os.path.join(NEWDATA_DIR, '0_valid.csv'), os.path.join(NEWDATA_DIR, '1_valid.csv')]		# 预处理后的验证集包含两个JSON文件: 第一个是概念题, 第二个是情境题
 TESTSET_PATHs	= [os.path.join(NEWDATA_DIR, '0_test.csv'), os.path.join(NEWDATA_DIR, '1_test.csv')]		# 预处理后的测试集包含两个JSON文件: 第一个是概念题, 第二个是情境题
+DATASET_SPLIT_PATHs	= {'train': TRAINSET_PATHs, 'valid': VALIDSET_PATHs, 'test': TESTSET_PATHs}				# 数据集划分名称(即Dataset的mode去掉_kd与_ca后缀)对应的文件
 
 TOKEN2ID_PATH					= os.path.join(NEWDATA_DIR, 'token2id.csv')						# 预处理得到的分词编号文件(题库)
 TOKEN2FREQUENCY_PATH			= os.path.join(NEWDATA_DIR, 'token2frequency.csv')				# 预处理得到的分词词频文件(题库)
 REFERENCE_PATH					= os.path.join(NEWDATA_DIR, 'reference_book.csv')				# 预处理得到的参考书目文件
+REFERENCE_MANIFEST_PATH			= os.path.join(NEWDATA_DIR, 'reference_manifest.json')		# 参考书目章节清单: 每个章节文件的内容哈希与段落数, 用于增量更新
 REFERENCE_TOKEN2ID_PATH			= os.path.join(NEWDATA_DIR, 'reference_token2id.csv')			# 预处理得到的分词编号文件(参考书目)
 REFERENCE_TOKEN2FREQUENCY_PATH	= os.path.join(NEWDATA_DIR, 'reference_token2frequency.csv')	# 预处理得到的分词词频文件(参考书目)
+REFERENCE_ID_STORE_PATH			= os.path.join(NEWDATA_DIR, 'reference_book_ids')				# 参考书目段落按REFERENCE_TOKEN2ID_PATH编码后的分词编号(CSR形式: ids.npy与offsets.npy)
+REFERENCE_ID_MATRIX_PATH		= os.path.join(NEWDATA_DIR, 'reference_book_ids_{}.npy')		# 参考书目段落补全截断到指定长度的分词编号矩阵, 需要用max_reference_length格式化
 
 STOPWORD_PATHs = {
     'baidu'	: os.path.join(STOPWORDS_DIR, 'baidu_stopwords.txt'),	# 百度停用词表
@@ -52,6 +56,12 @@ LOGGING_DIR = DIR_SUFFIX + 'logging'
 # temp文件夹及其结构设定
 TEMP_DIR = DIR_SUFFIX + 'temp'
 
+# cache文件夹及其结构设定
+CACHE_DIR = DIR_SUFFIX + 'cache'
+DATASET_CACHE_DIR = os.path.join(CACHE_DIR, 'dataset')		# Dataset管道输出的缓存, 每个子目录对应一组配置与输入文件的指纹
+RETRIEVAL_TABLE_DIR = os.path.join(CACHE_DIR, 'retrieval')		# 离线预计算的检索结果表
+RETRIEVAL_TABLE_PATH = os.path.join(RETRIEVAL_TABLE_DIR, '{}_{}_top{}_stopword{}{}.rtb')	# 需要用数据集划分名称, 检索模型名称, num_best, filter_stopword与近似检索后缀格式化
+
 # checkpoint文件夹及其结构设定
 CHECKPOINT_DIR = DIR_SUFFIX + 'checkpoint'
 
@@ -63,7 +73,8 @@ MODEL_DIR = DIR_SUFFIX + 'model'
 RETRIEVAL_MODEL_DIR = os.path.join(MODEL_DIR, 'retrieval_model')
 GENSIM_RETRIEVAL_MODEL_DIR = os.path.join(RETRIEVAL_MODEL_DIR, 'gensim')
 
-REFERENCE_DOCUMENT_PATH				= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_document.pk')				# 参考书目字典
+REFERENCE_DOCUMENT_PATH				= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_document.tks')				# 参考书目文档: 过滤停用词后的段落分词列表, 二进制列式存储
+REFERENCE_LINE_SENTENCE_PATH		= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_document.txt')				# 参考书目文档的LineSentence格式文本: 每行一个段落, 分词以空格分隔, 用于词嵌入模型的corpus_file多线程训练
 REFERENCE_DICTIONARY_PATH			= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_dictionary.dtn')			# 参考书目字典
 REFERENCE_CORPUS_PATH				= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_corpus.cps')				# 参考书目分词权重(原始词频)
 REFERENCE_CORPUS_TFIDF_PATH			= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_corpus_tfidf.cps')		# 参考书目分词权重(TFIDF处理后)
@@ -76,15 +87,30 @@ REFERENCE_LSI_MODEL_PATH			= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference
 REFERENCE_LDA_MODEL_PATH			= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_lda.m')					# 参考书目LDA模型
 REFERENCE_HDP_MODEL_PATH			= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_hdp.m')					# 参考书目HDP模型
 REFERENCE_LOGENTROPY_MODEL_PATH		= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_logentropy.m')			# 参考书目LogEntropy模型
+REFERENCE_TFIDF_INDEX_PATH			= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_tfidf.idx')				# 参考书目TFIDF相似度索引(归一化后的段落矩阵)
+REFERENCE_LSI_INDEX_PATH			= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_lsi.idx')					# 参考书目LSI相似度索引
+REFERENCE_LDA_INDEX_PATH			= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_lda.idx')					# 参考书目LDA相似度索引
+REFERENCE_HDP_INDEX_PATH			= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_hdp.idx')					# 参考书目HDP相似度索引
+REFERENCE_LOGENTROPY_INDEX_PATH		= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_logentropy.idx')			# 参考书目LogEntropy相似度索引
+REFERENCE_BM25_INDEX_PATH			= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_bm25.idx')				# 参考书目BM25倒排索引: BM25模型没有单独的模型文件, 倒排索引即为模型
+REFERENCE_LSI_ANN_INDEX_PATH		= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_lsi.ann')					# 参考书目LSI主题向量的近似最近邻索引
+REFERENCE_LDA_ANN_INDEX_PATH		= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_lda.ann')					# 参考书目LDA主题向量的近似最近邻索引
+REFERENCE_HDP_ANN_INDEX_PATH		= os.path.join(GENSIM_RETRIEVAL_MODEL_DIR, 'reference_hdp.ann')					# 参考书目HDP主题向量的近似最近邻索引
 
 # 类似注册表的字典, 便于相关代码简化
 # build_function	: 在src.retrieval_model中对应的模型构建方法
 # class				: 在gensim中对应的模型类
 # sequence			: 该模型依次需要调用的模型序列, 如LSI模型需要先调用TFIDF生成词权矩阵后再进行奇异值分解
+# index				: 预处理时构建的相似度索引, 查询时以内存映射方式只读加载
+# index_class		: 相似度索引在src.retrieval_model中对应的类
+# ann_index			: 稠密向量模型的近似最近邻索引, 稀疏模型为None
 GENSIM_RETRIEVAL_MODEL_SUMMARY = {
 	'tfidf': {
 		'corpus'		: REFERENCE_CORPUS_TFIDF_PATH,
 		'model'			: REFERENCE_TFIDF_MODEL_PATH,
+		'index'			: REFERENCE_TFIDF_INDEX_PATH,
+		'index_class'	: 'SimilarityIndex',
+		'ann_index'		: None,
 		'dictionary'	: REFERENCE_DICTIONARY_PATH,
 		'build_function': 'GensimRetrievalModel.build_tfidf_model',
 		'class'			: 'gensim.models.TfidfModel',
@@ -93,6 +119,9 @@ GENSIM_RETRIEVAL_MODEL_SUMMARY = {
 	'lsi': {
 		'corpus'		: REFERENCE_CORPUS_LSI_PATH,
 		'model'			: REFERENCE_LSI_MODEL_PATH,
+		'index'			: REFERENCE_LSI_INDEX_PATH,
+		'index_class'	: 'SimilarityIndex',
+		'ann_index'		: REFERENCE_LSI_ANN_INDEX_PATH,
 		'dictionary'	: REFERENCE_DICTIONARY_PATH,
 		'build_function': 'GensimRetrievalModel.build_lsi_model',		
 		'class'			: 'gensim.models.LsiModel',
@@ -101,6 +130,9 @@ GENSIM_RETRIEVAL_MODEL_SUMMARY = {
 	'lda': {
 		'corpus'		: REFERENCE_CORPUS_LDA_PATH,
 		'model'			: REFERENCE_LDA_MODEL_PATH,
+		'index'			: REFERENCE_LDA_INDEX_PATH,
+		'index_class'	: 'SimilarityIndex',
+		'ann_index'		: REFERENCE_LDA_ANN_INDEX_PATH,
 		'dictionary'	: REFERENCE_DICTIONARY_PATH,
 		'build_function': 'GensimRetrievalModel.build_lda_model',
 		'class'			: 'gensim.models.LdaModel',
@@ -111,6 +143,9 @@ GENSIM_RETRIEVAL_MODEL_SUMMARY = {
 	'hdp': {
 		'corpus'		: REFERENCE_CORPUS_HDP_PATH,
 		'model'			: REFERENCE_HDP_MODEL_PATH,
+		'index'			: REFERENCE_HDP_INDEX_PATH,
+		'index_class'	: 'SimilarityIndex',
+		'ann_index'		: REFERENCE_HDP_ANN_INDEX_PATH,
 		'dictionary'	: REFERENCE_DICTIONARY_PATH,
 		'build_function': 'GensimRetrievalModel.build_hdp_model',
 		'class'			: 'gensim.models.HdpModel',
@@ -121,40 +156,116 @@ GENSIM_RETRIEVAL_MODEL_SUMMARY = {
 	'logentropy': {
 		'corpus'		: REFERENCE_CORPUS_LOGENTROPY_PATH,
 		'model'			: REFERENCE_LOGENTROPY_MODEL_PATH,
+		'index'			: REFERENCE_LOGENTROPY_INDEX_PATH,
+		'index_class'	: 'SimilarityIndex',
+		'ann_index'		: None,
 		'dictionary'	: None,											# 不知为何gensim.models.LogEntropyModel的构造参数里竟然没有id2word
 		'build_function': 'GensimRetrievalModel.build_logentropy_model',
 		'class'			: 'gensim.models.LogEntropyModel',
 		'sequence'		: ['logentropy'],
 	},
+	
+	# BM25模型: 直接在原始词频语料上构建倒排索引, 查询时无需经过模型序列转换
+	'bm25': {
+		'corpus'		: REFERENCE_CORPUS_PATH,
+		'model'			: REFERENCE_BM25_INDEX_PATH,
+		'index'			: REFERENCE_BM25_INDEX_PATH,
+		'index_class'	: 'BM25Index',
+		'ann_index'		: None,
+		'dictionary'	: REFERENCE_DICTIONARY_PATH,
+		'build_function': 'GensimRetrievalModel.build_bm25_model',
+		'class'			: None,
+		'sequence'		: [],
+	},
 }
 
+# 稠密双塔检索模型: 编码器由gensim词向量初始化, 参考书目段落离线编码为float16/int8矩阵, 题目在查询时在线编码
+NEURAL_RETRIEVAL_MODEL_DIR = os.path.join(RETRIEVAL_MODEL_DIR, 'neural')
+REFERENCE_NEURAL_ENCODER_PATH		= os.path.join(NEURAL_RETRIEVAL_MODEL_DIR, 'reference_encoder.pt')				# 题目与参考书目段落共用的编码器参数
+REFERENCE_NEURAL_INDEX_PATH			= os.path.join(NEURAL_RETRIEVAL_MODEL_DIR, 'reference_neural.idx')				# 参考书目段落向量矩阵的最大内积检索索引
+
+# 与GENSIM_RETRIEVAL_MODEL_SUMMARY字段含义相同, 另有
+# document			: 离线编码的参考书目文档
+# embedding			: 初始化编码器的词向量, 为GENSIM_EMBEDDING_MODEL_SUMMARY的键, 可以被配置中的embedding_neural覆盖
+NEURAL_RETRIEVAL_MODEL_SUMMARY = {
+	'neural': {
+		'model'			: REFERENCE_NEURAL_ENCODER_PATH,
+		'index'			: REFERENCE_NEURAL_INDEX_PATH,
+		'index_class'	: 'DenseIndex',
+		'ann_index'		: None,
+		'dictionary'	: REFERENCE_DICTIONARY_PATH,
+		'document'		: REFERENCE_DOCUMENT_PATH,
+		'embedding'		: 'word2vec',
+		'class'			: 'DenseEncoder',
+	},
+}
+
+# 两阶段级联检索: 两个阶段的模型由配置中的first_stage_cascade与second_stage_cascade指定, 自身没有模型与索引文件
+CASCADE_RETRIEVAL_MODEL_SUMMARY = {
+	'cascade': {
+		'model'			: None,
+		'index'			: None,
+		'index_class'	: None,
+		'ann_index'		: None,
+		'dictionary'	: REFERENCE_DICTIONARY_PATH,
+		'document'		: REFERENCE_DOCUMENT_PATH,
+		'class'			: 'CascadeRetrievalModel',
+	},
+}
+
+# 所有文档检索模型: 检索结果表与配置中的retrieval_model_name可以使用其中任意一个
+RETRIEVAL_MODEL_SUMMARY = {**GENSIM_RETRIEVAL_MODEL_SUMMARY, **NEURAL_RETRIEVAL_MODEL_SUMMARY, **CASCADE_RETRIEVAL_MODEL_SUMMARY}
+
+# 按法律门类分片的相似度索引: 以检索模型名称格式化
+SHARDED_INDEX_DIR = os.path.join(RETRIEVAL_MODEL_DIR, 'sharded')
+SHARDED_INDEX_PATH = os.path.join(SHARDED_INDEX_DIR, 'reference_{}.shd')
+
 EMBEDDING_MODEL_DIR = os.path.join(MODEL_DIR, 'embedding_model')		
 GENSIM_EMBEDDING_MODEL_DIR = os.path.join(EMBEDDING_MODEL_DIR, 'gensim')
 
 REFERENCE_WORD2VEC_MODEL_PATH = os.path.join(GENSIM_EMBEDDING_MODEL_DIR, 'reference_word2vec.m')	# 参考书目文档训练得到的word2vec模型
 REFERENCE_FASTTEXT_MODEL_PATH = os.path.join(GENSIM_EMBEDDING_MODEL_DIR, 'reference_fasttext.m')	# 参考书目文档训练得到的fasttext模型
 REFERENCE_DOC2VEC_MODEL_PATH = os.path.join(GENSIM_EMBEDDING_MODEL_DIR, 'reference_doc2vec.m')		# 参考书目文档训练得到的doc2vec模型: 该模型不用于测试检索
+REFERENCE_DOC2VEC_ANN_INDEX_PATH = os.path.join(GENSIM_EMBEDDING_MODEL_DIR, 'reference_doc2vec.ann')	# 参考书目doc2vec段落向量的近似最近邻索引
+REFERENCE_DOC2VEC_VECTOR_PATH = os.path.join(GENSIM_EMBEDDING_MODEL_DIR, 'reference_doc2vec.vec')	# 参考书目文档在doc2vec模型训练之后有变化时重新推断的段落向量
+REFERENCE_WORD2VEC_INDEX_PATH = os.path.join(GENSIM_EMBEDDING_MODEL_DIR, 'reference_word2vec.idx')	# 参考书目文档在word2vec词向量下的软余弦相似度索引(包含稀疏化的分词相似度矩阵)
+REFERENCE_FASTTEXT_INDEX_PATH = os.path.join(GENSIM_EMBEDDING_MODEL_DIR, 'reference_fasttext.idx')	# 参考书目文档在fasttext词向量下的软余弦相似度索引(包含稀疏化的分词相似度矩阵)
+REFERENCE_DOC2VEC_INDEX_PATH = os.path.join(GENSIM_EMBEDDING_MODEL_DIR, 'reference_doc2vec.idx')		# 参考书目文档在doc2vec词向量下的软余弦相似度索引(包含稀疏化的分词相似度矩阵)
+REFERENCE_WORD2VEC_MATRIX_PATH = os.path.join(GENSIM_EMBEDDING_MODEL_DIR, 'reference_word2vec.emb')	# 按REFERENCE_TOKEN2ID_PATH编号排列的word2vec词向量矩阵, 用于初始化问答模型的词嵌入层
+REFERENCE_FASTTEXT_MATRIX_PATH = os.path.join(GENSIM_EMBEDDING_MODEL_DIR, 'reference_fasttext.emb')	# 按REFERENCE_TOKEN2ID_PATH编号排列的fasttext词向量矩阵, 之后追加题库中的其他分词, 用于初始化问答模型的词嵌入层
 
 # 类似注册表的字典, 便于相关代码简化
 # build_function	: 在src.embedding_model中对应的模型构建方法
 # class				: 在gensim中对应的模型类
+# index				: 软余弦相似度索引, 由词向量构建的稀疏分词相似度矩阵与参考书目语料组成
+# ann_index			: 段落向量的近似最近邻索引
+# matrix			: 按REFERENCE_TOKEN2ID_PATH编号排列的词向量矩阵, 只有词向量模型有该字段
+# oov_vocabulary	: 分词词频文件, 其中不在REFERENCE_TOKEN2ID_PATH中的分词依次追加在matrix之后, 只有可以由字符n-gram计算未登录词词向量的FastText模型有该字段
 GENSIM_EMBEDDING_MODEL_SUMMARY = {
 	'word2vec': {
 		'model': REFERENCE_WORD2VEC_MODEL_PATH,
 		'class': 'gensim.models.Word2Vec',
+		'index': REFERENCE_WORD2VEC_INDEX_PATH,
+		'matrix': REFERENCE_WORD2VEC_MATRIX_PATH,
 	},
 	'fasttext': {
 		'model': REFERENCE_FASTTEXT_MODEL_PATH,
 		'class': 'gensim.models.FastText',
+		'index': REFERENCE_FASTTEXT_INDEX_PATH,
+		'matrix': REFERENCE_FASTTEXT_MATRIX_PATH,
+		'oov_vocabulary': TOKEN2FREQUENCY_PATH,
 	},
 	'doc2vec': {
 		'model': REFERENCE_DOC2VEC_MODEL_PATH,
 		'class': 'gensim.models.Doc2Vec',
+		'index': REFERENCE_DOC2VEC_INDEX_PATH,
+		'ann_index': REFERENCE_DOC2VEC_ANN_INDEX_PATH,
 	}
 }
 
 TRANSFORMERS_EMBEDDING_MODEL_DIR = os.path.join(EMBEDDING_MODEL_DIR, 'transformers')	# Transformers库中调用的HuggingFace模型目录
 BERT_MODEL_DIR = os.path.join(TRANSFORMERS_EMBEDDING_MODEL_DIR, 'bert')					# BERT模型目录
+BERT_VECTOR_CACHE_PATH = os.path.join(BERT_MODEL_DIR, '{}_{}.cache')					# 按文本sha1摘要索引的BERT文档向量缓存(float16), 由模型名称与bert_output格式化
 
 BERT_MODEL_SUMMARY = {
 	'bert-base-chinese': {
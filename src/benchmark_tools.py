@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+# @author: caoyang
+# @email: caoyang@163.sufe.edu.cn
+# 基准测试工具: 检索模型同时评估检索效果(hit@k与MRR)与性能(查询延迟, 吞吐量, 索引构建时间, 索引大小, 峰值内存), 词嵌入模型评估训练速度
+
+if __name__ == '__main__':
+	import sys
+	sys.path.append('../')
+
+import time
+import json
+import numpy
+import pandas
+import logging
+import traceback
+import multiprocessing
+
+from copy import deepcopy
+from gensim.corpora import Dictionary
+
+from config import RetrievalModelConfig, EmbeddingModelConfig
+from setting import *
+
+from src.data_tools import load_preprocessed_dataframe, load_reference_subjects
+from src.retrieval_tools import vote_subjects
+from src.retrieval_model import GensimRetrievalModel, NeuralRetrieveModel, CascadeRetrievalModel
+from src.embedding_model import GensimEmbeddingModel
+from src.utils import load_args, timer, get_peak_memory
+
+
+# 文件或文件夹(递归统计)占用的磁盘空间(MB), 不存在时为0
+def get_disk_size(path):
+	if path is None or not os.path.exists(path):
+		return 0.
+	if os.path.isfile(path):
+		return os.path.getsize(path) / 1024 / 1024
+	return sum(os.path.getsize(os.path.join(root, filename)) for root, _, filenames in os.walk(path) for filename in filenames) / 1024 / 1024
+
+# 加载基准测试的题目: 题库中有subject标签的题目, 查询分词列表为题干与四个选项的拼接, 与evaluate_gensim_model_in_filling_subject一致
+# :param filepaths		: 预处理后的题库文件
+# :param n_questions	: 使用的题目数, 默认使用全部题目
+# :return query_token_lists	: 查询分词列表的列表
+# :return subjects			: 形状为(n_questions, )的正确法律门类编号, 即SUBJECT2INDEX的值
+def load_benchmark_questions(filepaths=TRAINSET_PATHs, n_questions=None):
+	columns = ['subject', 'statement', 'option_a', 'option_b', 'option_c', 'option_d']
+	dataframe = pandas.concat([load_preprocessed_dataframe(filepath, columns=columns) for filepath in filepaths])
+	dataframe = dataframe[~dataframe['subject'].isna()].reset_index(drop=True)
+	if n_questions is not None:
+		dataframe = dataframe.iloc[: n_questions]
+	query_token_lists = [statement + option_a + option_b + option_c + option_d for statement, option_a, option_b, option_c, option_d in zip(*[dataframe[column] for column in columns[1: ]])]
+	subjects = numpy.array([SUBJECT2INDEX[subject] for subject in dataframe['subject']], dtype=numpy.int64)
+	return query_token_lists, subjects
+
+# 由检索结果计算预测法律门类的hit@k与MRR: 检索到的段落按1/(排名+1)的权重对所属门类投票, 正确门类在投票结果中的排名决定是否命中与倒数排名
+# :param indices			: 形状为(n_queries, num_best)的段落编号, 不足的位置填充-1
+# :param subjects			: 形状为(n_queries, )的正确法律门类编号
+# :param paragraph_subjects	: 形状为(n_documents, )的每个段落所属的法律门类编号, 即load_reference_subjects的返回值
+# :param hits				: 需要计算hit@k的k值列表
+# :return metrics			: {'hit@k': 命中率, 'mrr': 平均倒数排名}
+def calc_subject_ranking_metrics(indices, subjects, paragraph_subjects, hits=[1, 3, 5, 10]):
+	ranking = vote_subjects(numpy.asarray(indices), paragraph_subjects, k=len(SUBJECT2INDEX))	# 没有得票的位置填充0, 与任何门类编号都不相同
+	matched = ranking == subjects[:, None]
+	ranks = numpy.where(matched.any(axis=1), matched.argmax(axis=1) + 1, numpy.inf)
+	metrics = {f'hit@{hit}': float(numpy.mean(ranks <= hit)) for hit in hits}
+	metrics['mrr'] = float(numpy.mean(1. / ranks))
+	return metrics
+
+# 加载基准测试的检索模型, 统一为相同的查询接口
+# :param model_name		: 模型名称, 即RETRIEVAL_MODEL_SUMMARY或GENSIM_EMBEDDING_MODEL_SUMMARY的键
+# :param args			: RetrievalModelConfig配置
+# :param embedding_args	: EmbeddingModelConfig配置
+# :return build_function: 重新构建索引的函数
+# :return load_function	: 加载索引的函数, 返回查询函数, 查询函数输入查询分词列表的列表, 返回(indices, values)数组
+# :return index_paths	: 查询时使用的索引路径列表
+def load_benchmark_model(model_name, args, embedding_args):
+	if model_name in GENSIM_EMBEDDING_MODEL_SUMMARY:
+		gem = GensimEmbeddingModel(args=embedding_args)
+		summary = GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]
+		use_ann = embedding_args.use_ann and summary.get('ann_index') is not None
+		dictionary = Dictionary.load(REFERENCE_DICTIONARY_PATH)
+		def _build_function():
+			if use_ann:
+				gem.build_ann_index(model_name=model_name)
+			else:
+				gem.build_similarity_index(model_name=model_name)
+		def _load_function():
+			_similarity = gem.build_similarity(model_name=model_name)
+			return lambda _query_token_lists: gem.batch_query(query_token_lists=_query_token_lists, dictionary=dictionary, similarity=_similarity, return_arrays=True)
+		return _build_function, _load_function, [summary['ann_index'] if use_ann else summary['index']]
+
+	grm = GensimRetrievalModel(args=args)
+	retrieval_model = CascadeRetrievalModel(args=args, embedding_args=embedding_args) if model_name in CASCADE_RETRIEVAL_MODEL_SUMMARY else grm.dispatch(model_name=model_name)
+	summary = RETRIEVAL_MODEL_SUMMARY[model_name]
+	use_ann = retrieval_model is grm and args.use_ann and summary['ann_index'] is not None
+	dictionary = Dictionary.load(REFERENCE_DICTIONARY_PATH if summary['dictionary'] is None else summary['dictionary'])	# logentropy模型的dictionary字段是None
+	def _build_function():
+		if isinstance(retrieval_model, NeuralRetrieveModel) and not os.path.exists(summary['model']):	# 编码器缺失时先初始化, 初始化时间计入构建时间
+			retrieval_model.build_encoder(model_name=model_name)
+		retrieval_model.build_similarity_index(model_name=model_name)
+		if use_ann:
+			grm.build_ann_index(model_name=model_name)
+	def _load_function():
+		_similarity = retrieval_model.build_similarity(model_name=model_name)
+		_sequence = retrieval_model.load_sequence(model_name=model_name)
+		return lambda _query_token_lists: retrieval_model.batch_query(query_token_lists=_query_token_lists, dictionary=dictionary, similarity=_similarity, sequence=_sequence, return_arrays=True)
+	if isinstance(retrieval_model, CascadeRetrievalModel):
+		return _build_function, _load_function, [os.path.dirname(path) for path in grm.index_dependency_paths(model_name=model_name, use_shard=False)]	# 两个阶段各自的索引
+	return _build_function, _load_function, [summary['ann_index'] if use_ann else summary['index']]
+
+# 对一个检索模型做基准测试: 可选地重新构建索引并计时, 然后加载索引, 分批查询所有题目计算检索效果与吞吐量, 最后逐个查询抽样的题目统计延迟分位数
+# 在run_benchmark中每个模型在独立的spawn子进程中运行, 峰值内存不包含父进程的内存, start_memory为子进程导入模块并接收参数之后的峰值内存, memory_increase为测试该模型增加的峰值内存
+# :param model_name			: 模型名称
+# :param query_token_lists	: 查询分词列表的列表, 即load_benchmark_questions的返回值
+# :param subjects			: 正确法律门类编号, 即load_benchmark_questions的返回值
+# :param paragraph_subjects	: 每个段落所属的法律门类编号
+# :param args				: RetrievalModelConfig配置
+# :param embedding_args		: EmbeddingModelConfig配置
+# :param batch_size			: 分批查询时每批的题目数
+# :param n_latency_queries	: 统计单个查询延迟时抽样的题目数
+# :param hits				: 需要计算hit@k的k值列表
+# :param rebuild_index		: 是否重新构建索引并统计构建时间, 否则构建时间为None
+# :return result			: 基准测试结果, 时间单位为秒, 延迟单位为毫秒, 索引大小与内存单位为MB
+def benchmark_retrieval_model(model_name,
+							  query_token_lists,
+							  subjects,
+							  paragraph_subjects,
+							  args,
+							  embedding_args,
+							  batch_size=1024,
+							  n_latency_queries=200,
+							  hits=[1, 3, 5, 10],
+							  rebuild_index=False):
+	result = {'start_memory': get_peak_memory()}
+	build_function, load_function, index_paths = load_benchmark_model(model_name=model_name, args=args, embedding_args=embedding_args)
+	result['build_time'] = None
+	if rebuild_index:
+		start_time = time.time()
+		build_function()
+		result['build_time'] = time.time() - start_time
+	start_time = time.time()
+	query_function = load_function()
+	result['load_time'] = time.time() - start_time
+	result['index_size'] = sum(get_disk_size(index_path) for index_path in index_paths)
+
+	# 分批查询所有题目: 统计吞吐量与检索效果
+	indices = []
+	start_time = time.time()
+	for start in range(0, len(query_token_lists), batch_size):
+		indices.append(query_function(query_token_lists[start: start + batch_size])[0])
+	batch_time = time.time() - start_time
+	result['qps'] = len(query_token_lists) / batch_time if batch_time > 0 else None
+	result.update(calc_subject_ranking_metrics(numpy.vstack(indices), subjects=subjects, paragraph_subjects=paragraph_subjects, hits=hits))
+
+	# 逐个查询抽样的题目: 统计单个查询的延迟分位数(毫秒), 固定随机种子使不同运行的结果可以比较
+	samples = numpy.sort(numpy.random.RandomState(0).choice(len(query_token_lists), min(n_latency_queries, len(query_token_lists)), replace=False))
+	latencies = []
+	for i in samples:
+		start_time = time.perf_counter()
+		query_function([query_token_lists[i]])
+		latencies.append((time.perf_counter() - start_time) * 1000)
+	for percentile, latency in zip([50, 95, 99], numpy.percentile(latencies, [50, 95, 99]) if latencies else [None] * 3):
+		result[f'latency_p{percentile}'] = None if latency is None else float(latency)
+	result['peak_memory'] = get_peak_memory()
+	result['memory_increase'] = None if result['peak_memory'] is None else result['peak_memory'] - result['start_memory']
+	return result
+
+# 在子进程中运行benchmark_retrieval_model, 出错时返回错误信息而不影响其他模型
+def _benchmark_retrieval_model(kwargs):
+	try:
+		return benchmark_retrieval_model(**kwargs)
+	except BaseException:
+		return {'error': traceback.format_exc()}
+
+# 检索模型的基准测试: 题目只加载一次, 每个模型在独立的子进程中测试, 结果以键排序的JSON保存, 便于比较不同运行的差异
+# 注意并行测试多个模型时会相互争用CPU, 延迟与吞吐量只适合在n_jobs=1时与其他运行比较
+# :param model_names		: 模型名称列表, 可以包括RETRIEVAL_MODEL_SUMMARY与GENSIM_EMBEDDING_MODEL_SUMMARY的键, 默认为全部模型
+# :param args				: RetrievalModelConfig配置, 默认加载命令行参数
+# :param embedding_args		: EmbeddingModelConfig配置, 默认加载命令行参数, num_best与use_ann与args保持一致
+# :param filepaths			: 预处理后的题库文件
+# :param n_questions		: 使用的题目数, 默认使用全部题目
+# :param n_jobs				: 同时测试的模型数
+# :param export_path		: 结果保存路径
+# 其余参数与benchmark_retrieval_model相同
+@timer
+def run_benchmark(model_names=None,
+				  args=None,
+				  embedding_args=None,
+				  filepaths=TRAINSET_PATHs,
+				  n_questions=None,
+				  batch_size=1024,
+				  n_latency_queries=200,
+				  hits=[1, 3, 5, 10],
+				  rebuild_index=False,
+				  n_jobs=1,
+				  export_path=os.path.join(TEMP_DIR, 'benchmark_retrieval_model.json')):
+	if model_names is None:
+		model_names = list(RETRIEVAL_MODEL_SUMMARY.keys()) + list(GENSIM_EMBEDDING_MODEL_SUMMARY.keys())
+	args = load_args(Config=RetrievalModelConfig) if args is None else args
+	embedding_args = deepcopy(load_args(Config=EmbeddingModelConfig) if embedding_args is None else embedding_args)
+	embedding_args.num_best = args.num_best
+	embedding_args.use_ann = args.use_ann
+	query_token_lists, subjects = load_benchmark_questions(filepaths=filepaths, n_questions=n_questions)
+	paragraph_subjects = load_reference_subjects(REFERENCE_PATH)
+	kwargs = {
+		'query_token_lists'	: query_token_lists,
+		'subjects'			: subjects,
+		'paragraph_subjects': paragraph_subjects,
+		'args'				: args,
+		'embedding_args'	: embedding_args,
+		'batch_size'		: batch_size,
+		'n_latency_queries'	: n_latency_queries,
+		'hits'				: hits,
+		'rebuild_index'		: rebuild_index,
+	}
+	with multiprocessing.get_context('spawn').Pool(processes=n_jobs, maxtasksperchild=1) as pool:	# 每个子进程只测试一个模型, 使峰值内存互不影响; fork的子进程的峰值内存会包含父进程的常驻内存, 因此使用spawn
+		async_results = {model_name: pool.apply_async(_benchmark_retrieval_model, ({'model_name': model_name, **kwargs}, )) for model_name in model_names}
+		results = {model_name: async_result.get() for model_name, async_result in async_results.items()}
+	for model_name, result in results.items():
+		if 'error' in result:
+			logging.error(f'{model_name}模型的基准测试失败: {result["error"]}')
+		else:
+			logging.info(f'{model_name}模型的基准测试结果: ' + ', '.join(f'{key}={value}' for key, value in result.items()))
+
+	benchmark_summary = {
+		'config': {
+			'n_questions'		: len(query_token_lists),
+			'batch_size'		: batch_size,
+			'n_latency_queries'	: n_latency_queries,
+			'num_best'			: args.num_best,
+			'use_ann'			: bool(args.use_ann),
+			'filter_stopword'	: bool(args.filter_stopword),
+			'rebuild_index'		: rebuild_index,
+			'n_jobs'			: n_jobs,
+		},
+		'models': results,
+	}
+	os.makedirs(os.path.dirname(export_path), exist_ok=True)
+	with open(export_path, 'w', encoding='utf8') as f:
+		json.dump(benchmark_summary, f, indent=4, sort_keys=True, ensure_ascii=False)
+	return benchmark_summary
+
+# 词嵌入模型训练速度的基准测试: 用给定的workers与语料输入方式训练一个词嵌入模型, 训练得到的模型不保存
+# :param model_name		: 模型名称, 即word2vec, fasttext与doc2vec之一
+# :param workers		: 训练线程数
+# :param use_corpus_file: 是否使用LineSentence格式的语料文件训练, 否则从参考书目文档流式读取
+# :param args			: EmbeddingModelConfig配置
+# :return result		: 基准测试结果, words_per_second为每秒训练的分词数(不含建立词表的时间), build_time为包括建立词表在内的总耗时(秒), 内存单位为MB
+def benchmark_embedding_training(model_name, workers, use_corpus_file, args):
+	args = deepcopy(args)
+	args.use_corpus_file = use_corpus_file
+	setattr(args, f'workers_{model_name}', workers)
+	gem = GensimEmbeddingModel(args=args)
+	result = {'start_memory': get_peak_memory()}
+	start_time = time.time()
+	model = getattr(gem, f'build_{model_name}_model')(model_export_path=None)
+	result['build_time'] = time.time() - start_time
+	result['train_time'] = getattr(model, 'total_train_time', None) or result['build_time']
+	result['corpus_total_words'] = int(model.corpus_total_words)
+	result['epochs'] = int(model.epochs)
+	result['words_per_second'] = model.corpus_total_words * model.epochs / result['train_time']
+	result['peak_memory'] = get_peak_memory()
+	result['memory_increase'] = None if result['peak_memory'] is None else result['peak_memory'] - result['start_memory']
+	return result
+
+# 在子进程中运行benchmark_embedding_training, 出错时返回错误信息而不影响其他设置
+def _benchmark_embedding_training(kwargs):
+	try:
+		return benchmark_embedding_training(**kwargs)
+	except BaseException:
+		return {'error': traceback.format_exc()}
+
+# 词嵌入模型训练速度的基准测试: 比较corpus_file与sentences两种语料输入方式在不同workers下每秒训练的分词数
+# 每组设置依次在独立的子进程中训练, 互不争用CPU, 峰值内存也互不影响; speedup为相同语料输入方式下相对于workers_list中第一个设置的加速比
+# LineSentence格式的语料文件在测试之前导出, 导出时间不计入训练时间
+# :param model_names		: 模型名称列表, 默认为word2vec, fasttext与doc2vec
+# :param workers_list		: 需要测试的训练线程数列表
+# :param use_corpus_files	: 需要测试的语料输入方式列表
+# :param args				: EmbeddingModelConfig配置, 默认加载命令行参数
+# :param export_path		: 结果保存路径
+@timer
+def run_embedding_training_benchmark(model_names=['word2vec', 'fasttext', 'doc2vec'],
+									 workers_list=[1, 2, 4, 8],
+									 use_corpus_files=[True, False],
+									 args=None,
+									 export_path=os.path.join(TEMP_DIR, 'benchmark_embedding_training.json')):
+	args = load_args(Config=EmbeddingModelConfig) if args is None else args
+	if True in use_corpus_files:
+		GensimEmbeddingModel.prepare_corpus_file(corpus_import_path=REFERENCE_LINE_SENTENCE_PATH, document_import_path=REFERENCE_DOCUMENT_PATH)
+	results = {model_name: {'corpus_file' if use_corpus_file else 'sentences': {} for use_corpus_file in use_corpus_files} for model_name in model_names}
+	with multiprocessing.get_context('spawn').Pool(processes=1, maxtasksperchild=1) as pool:		# 与run_benchmark相同, 使用spawn使峰值内存不包含父进程的内存
+		for model_name in model_names:
+			for use_corpus_file in use_corpus_files:
+				mode = 'corpus_file' if use_corpus_file else 'sentences'
+				for workers in workers_list:
+					result = pool.apply(_benchmark_embedding_training, ({'model_name': model_name, 'workers': workers, 'use_corpus_file': use_corpus_file, 'args': args}, ))
+					if 'error' in result:
+						logging.error(f'{model_name}模型({mode}, workers={workers})的训练基准测试失败: {result["error"]}')
+					else:
+						baseline = results[model_name][mode].get(workers_list[0], result)
+						result['speedup'] = result['words_per_second'] / baseline['words_per_second'] if 'words_per_second' in baseline else None
+						logging.info(f'{model_name}模型({mode}, workers={workers})的训练基准测试结果: ' + ', '.join(f'{key}={value}' for key, value in result.items()))
+					results[model_name][mode][workers] = result
+
+	benchmark_summary = {
+		'config': {
+			'workers_list'		: workers_list,
+			'use_corpus_files'	: use_corpus_files,
+			'cpu_count'			: os.cpu_count(),
+			'min_count'			: {model_name: getattr(args, f'min_count_{model_name}') for model_name in model_names},
+			'size'				: {model_name: getattr(args, f'size_{model_name}') for model_name in model_names},
+		},
+		'models': results,
+	}
+	os.makedirs(os.path.dirname(export_path), exist_ok=True)
+	with open(export_path, 'w', encoding='utf8') as f:
+		json.dump(benchmark_summary, f, indent=4, sort_keys=True, ensure_ascii=False)
+	return benchmark_summary
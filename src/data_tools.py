@@ -1,226 +1,648 @@
-# -*- coding: utf-8 -*-
-# @author: caoyang
-# @email: caoyang@163.sufe.edu.cn
-# 数据相关工具
-
-if __name__ == '__main__':
-	import sys
-	sys.path.append('../')
-
-import os
-import time
-import json
-import jieba
-import torch
-import pandas
-import pickle
-import logging
-import networkx
-
-from copy import deepcopy
-from sklearn.model_selection import train_test_split
-
-from setting import *
-
-# 分词: 顺带统计分词词频
-def tokenize(sentence, token2frequency):
-	tokens = []
-	for token in jieba.cut(sentence):	# jieba分词
-		tokens.append(token)
-		if not token in token2frequency:
-			token2frequency[token] = 0
-		token2frequency[token] += 1
-	return tokens, token2frequency
-
-# 编码选择题的答案: 用{1, 2, 4, 8}分别表示{A, B, C, D}四个选项, 加和得到编码值(本质为二进制编码)
-def encode_answer(decoded_answer):
-	return sum(list(map(lambda x: 2 ** OPTION2INDEX[x], filter(lambda x: x in OPTION2INDEX, decoded_answer))))
-
-# 解码选择题的答案: encode_answer的反函数
-def decode_answer(encoded_answer, result_type=str):
-	# 20211124更新: 
-	# 1. 之前返回如['A', 'B', 'D']的字符串列表, 为使用判断题形式, 修正为返回如[1, 1, 0, 1]的零一值列表, 通过修改参数result_type为int即可实现
-	# 2. 有部分题目的答案是空, 0_train.json中有四道题是这种情况, id为4_772, 1_1379, 1_1365, 1_1206, 此时encoded_answer为0
-	assert 0 <= encoded_answer <= 15
-	decoded_answer = []
-	for index, char in enumerate(bin(encoded_answer)[: 1: -1]):			# [: 1: -1]这种写法就是从最后一个位置开始反向遍历, 直到第1个位置停止, 可以跳过前2个字符ob 
-		if char == '1':
-			decoded_answer.append(INDEX2OPTION[index])
-	if result_type == str:
-		return decoded_answer
-	elif result_type == int:
-		return [1 if option in decoded_answer else 0 for option in OPTION2INDEX]
-	raise NotImplementedError(f'Unknown param `result_type`: {result_type}')
-
-# JEC-QA数据集中的题库JSON文件转为CSV文件: 顺带统计分词词频
-def json_to_csv(json_path, csv_path, token2frequency=None, mode='train'):
-	assert mode in ['train', 'test'], f'Unknown param `mode`: {mode}'
-	data_dict = {
-		'id'		: [],	# 题目编号
-		'statement'	: [],	# 题干分词列表
-		'option_a'	: [],	# 选项A分词列表
-		'option_b'	: [],	# 选项B分词列表
-		'option_c'	: [],	# 选项C分词列表
-		'option_d'	: [],	# 选项D分词列表
-		'type'		: [],	# 0或1分别表示概念题与情景题
-		'subject'	: [],	# 所属参考书目中的18钟法律类型之一(该字段存在62.9%的缺失, 需要使用语言模型进行预测)
-	}
-	_token2frequency = {} if token2frequency is None else token2frequency.copy()
-	if mode == 'train':
-		data_dict['answer'] = []	# 训练集比测试集多一个answer字段, 即题目答案
-	with open(json_path, 'r', encoding='utf8') as f:
-		while True:
-			line = f.readline()
-			if not line:
-				break
-			data = json.loads(line)
-			assert len(data['option_list']) == TOTAL_OPTIONS	# 确保每道题都是4个选项
-			
-			# 获取每道题的字段信息
-			_id = data['id']
-			_type = data['type']
-			subject = data.get('subject')	# 该字段可能存在缺失, 可能不支持subscriptable, 因此改用get方法
-			statement, _token2frequency = tokenize(data['statement'], _token2frequency)
-			option_a, _token2frequency = tokenize(data['option_list']['A'], _token2frequency)
-			option_b, _token2frequency = tokenize(data['option_list']['B'], _token2frequency)
-			option_c, _token2frequency = tokenize(data['option_list']['C'], _token2frequency)
-			option_d, _token2frequency = tokenize(data['option_list']['D'], _token2frequency)
-			
-			# 记录每道题的字段信息
-			data_dict['id'].append(_id)
-			data_dict['statement'].append(statement)
-			data_dict['option_a'].append(option_a)
-			data_dict['option_b'].append(option_b)
-			data_dict['option_c'].append(option_c)
-			data_dict['option_d'].append(option_d)
-			data_dict['type'].append(_type)
-			data_dict['subject'].append(subject)
-			if mode == 'train':
-				answer = encode_answer(data['answer'])
-				data_dict['answer'].append(answer)
-	
-	# 字典转为DataFrame并导出为CSV文件
-	dataframe = pandas.DataFrame(data_dict, columns=list(data_dict.keys()))
-	if csv_path is not None:
-		dataframe.to_csv(csv_path, sep='\t', index=False, header=True)
-	return dataframe, _token2frequency
-
-# 20211101更新: 划分0_train.csv和1_train.csv文件得到验证集, 用于本地测试
-def split_validset(dataframe, train_export_path, valid_export_path, valid_ratio=VALID_RATIO):
-	dataframe_train, dataframe_valid = train_test_split(dataframe, test_size=valid_ratio)
-	if train_export_path is not None:
-		dataframe_train.to_csv(train_export_path, sep='\t', index=False, header=True)
-	if valid_export_path is not None:
-		dataframe_valid.to_csv(valid_export_path, sep='\t', index=False, header=True)
-	return dataframe_train, dataframe_valid
-
-# token2id字典转为CSV文件
-def token2id_to_csv(export_path, token2frequency):
-	token2id = TOKEN2ID.copy()
-	_id = len(token2id)
-	for token, frequency in token2frequency.items():
-		if frequency >= FREQUENCY_THRESHOLD:
-			token2id[token] = _id
-			_id += 1
-	pandas.DataFrame({
-		'id'	: list(token2id.values()),
-		'token'	: list(token2id.keys()),
-	}).sort_values(by=['id'], ascending=True).to_csv(export_path, sep='\t', index=False, header=True)
-
-# token2frequency字典转为CSV文件: 按照分词频次降序排列
-def token2frequency_to_csv(export_path, token2frequency):
-	pandas.DataFrame({
-		'token'		: list(token2frequency.keys()),
-		'frequency'	: list(token2frequency.values()),
-	}).sort_values(by=['frequency'], ascending=False).to_csv(export_path, sep='\t', index=False, header=True)
-
-# 中文数词转数字: 用于识别参考书目的章节信息, 可处理至多两位数的中文写法
-def chinese_to_number(string):
-	easy_mapper = {
-		'一': '1', '二': '2', '两': '2',
-		'三': '3', '四': '4', '五': '5',
-		'六': '6', '七': '7', '八': '8',
-		'九': '9', '十': '0',
-	}
-	number_string = ''.join(list(map(easy_mapper.get, string)))
-	if number_string[0] == '0':
-		number = int(number_string) + 10
-	elif number_string[-1] == '0':
-		number = int(number_string)
-	else:
-		number = int(number_string.replace('0', ''))
-	return number
-
-# JEC-QA数据集中的参考书目TXT文件转为CSV格式文件: 顺带统计分词词频
-def reference_to_csv(export_path, token2frequency=None):
-	reference_dict = {
-		'law'			: [],	# 法律门类: 即reference_book下18门法律
-		'chapter_number': [],	# 章节编号: 该字段直接从文件名中抽取即可
-		'chapter_name'	: [],	# 章节名称: 有的文件名中有章节名称, 有的则没有, 需要从文件内容中自动识别, 一般在开头部分
-		'section'		: [],	# 小节名称: TXT文件中每一行除最后一个分块外的所有内容的拼接
-		'content'		: [],	# 实际内容分词列表: TXT文件中每一行最后一个分块
-	}
-	_token2frequency = {} if token2frequency is None else token2frequency.copy()
-	# 遍历所有法律门类
-	for law in os.listdir(REFERENCE_DIR):
-		# 遍历所有章节
-		for filename in os.listdir(os.path.join(REFERENCE_DIR, law)):
-			if filename.endswith('.txt'):								# 存在一些无用的特殊文件, 如刑事诉讼法中有一个.swp文件)
-				_filename = filename.replace(' ', '').replace('.txt', '')
-				start_index = _filename.find('第') + 1
-				end_index = _filename.find('章')
-				if start_index == 0 or end_index == -1:					# 跳过文件名中没有章节信息的文件, 如目录和中国法律史中有一个目录.txt文件是无用的
-					continue
-				chapter_number_1 = _filename[start_index: end_index]	# 文件名中的章节编号: 经过检验这个字段要比从文件内容中抽取的章节编号更准确
-				chapter_name_1 = _filename[end_index + 1: ]				# 文件名中的章节名称: 可能缺失
-				filepath = os.path.join(REFERENCE_DIR, law, filename)	# 文件路径
-				with open(filepath, 'r', encoding='utf8') as f:
-					paragraphs = eval(f.read())							# 每个文件中的文档内容由字符串段落组成的列表样式数据组成
-				total_paragraphs = len(paragraphs)						# 统计总段落数
-				
-				# 该循环是为了从文件内容二次识别章节编号与章节名称, 因为文件名中的章节名称可能缺失
-				for i in range(total_paragraphs):
-					paragraph_string = paragraphs[i].replace(' ', '')
-					start_index = paragraph_string.find('第') + 1
-					end_index = paragraph_string.find('章')
-					chapter_number_2 = paragraph_string[start_index: end_index]
-					if start_index != 0 and end_index != -1:
-						chapter_name_2 = paragraphs[i + 1].replace(' ', '') if paragraph_string[-1] == '章' else paragraph_string[paragraph_string.find('章') + 1:]
-						break
-				
-				# 章节编号与章节名称最终确定
-				chapter_number = chinese_to_number(chapter_number_1)				# 目前认为直接使用文件名中的章节编号即可
-				chapter_name = chapter_name_1 if chapter_name_1 else chapter_name_2	# 优先使用文件名中的章节名称, 若缺失则使用文件内容中识别的章节名称
-				
-				# 该循环是记录文件内容中每个段落的小节名称与实际内容
-				for i in range(total_paragraphs):
-					blocks = paragraphs[i].strip().split(' ')
-					section = ' '.join(blocks[: -1])	# 小节名称为每一行除最后一个分块外的所有内容的拼接
-					content, _token2frequency = tokenize(blocks[-1], _token2frequency)
-					reference_dict['law'].append(law)
-					reference_dict['chapter_number'].append(chapter_number)
-					reference_dict['chapter_name'].append(chapter_name)
-					reference_dict['section'].append(section)
-					reference_dict['content'].append(content)
-	
-	# 字典转为DataFrame并导出为CSV文件
-	reference_dataframe = pandas.DataFrame(reference_dict, columns=list(reference_dict.keys()))
-	if export_path is not None:
-		reference_dataframe.to_csv(export_path, sep='\t', header=True, index=False)
-	return reference_dataframe, _token2frequency
-
-# 加载停用词: 默认加载stopwords-master中所有的停用词
-def load_stopwords(stopword_names=None):
-	if stopword_names is None:
-		stopword_names = STOPWORD_PATHs.keys()
-	stopwords = []
-	for stopword_name in stopword_names:
-		with open(STOPWORD_PATHs[stopword_name], 'r', encoding='utf8') as f:
-			stopwords.extend(f.read().splitlines())
-	return list(set(stopwords))
-
-# 过滤停用词: 默认使用stopwords-master中所有的停用词
-def filter_stopwords(tokens, stopwords=None):
-	if stopwords is None:
-		stopwords = load_stopwords(stopword_names=None)
-	return list(filter(lambda x: not x in stopwords, tokens))
+# -*- coding: utf-8 -*-
+# @author: caoyang
+# @email: caoyang@163.sufe.edu.cn
+# 数据相关工具
+
+if __name__ == '__main__':
+	import sys
+	sys.path.append('../')
+
+import os
+import time
+import json
+import jieba
+import torch
+import numpy
+import pandas
+import pickle
+import shutil
+import hashlib
+import logging
+import networkx
+
+from copy import deepcopy
+from functools import partial
+from itertools import chain
+from collections import Counter
+from multiprocessing import Pool
+from sklearn.model_selection import train_test_split
+
+from setting import *
+
+# 分词: 顺带统计分词词频
+def tokenize(sentence, token2frequency):
+	tokens = []
+	for token in jieba.cut(sentence):	# jieba分词
+		tokens.append(token)
+		if not token in token2frequency:
+			token2frequency[token] = 0
+		token2frequency[token] += 1
+	return tokens, token2frequency
+
+# 编码选择题的答案: 用{1, 2, 4, 8}分别表示{A, B, C, D}四个选项, 加和得到编码值(本质为二进制编码)
+def encode_answer(decoded_answer):
+	return sum(list(map(lambda x: 2 ** OPTION2INDEX[x], filter(lambda x: x in OPTION2INDEX, decoded_answer))))
+
+# 解码选择题的答案: encode_answer的反函数
+def decode_answer(encoded_answer, result_type=str):
+	# 20211124更新: 
+	# 1. 之前返回如['A', 'B', 'D']的字符串列表, 为使用判断题形式, 修正为返回如[1, 1, 0, 1]的零一值列表, 通过修改参数result_type为int即可实现
+	# 2. 有部分题目的答案是空, 0_train.json中有四道题是这种情况, id为4_772, 1_1379, 1_1365, 1_1206, 此时encoded_answer为0
+	assert 0 <= encoded_answer <= 15
+	decoded_answer = []
+	for index, char in enumerate(bin(encoded_answer)[: 1: -1]):			# [: 1: -1]这种写法就是从最后一个位置开始反向遍历, 直到第1个位置停止, 可以跳过前2个字符ob 
+		if char == '1':
+			decoded_answer.append(INDEX2OPTION[index])
+	if result_type == str:
+		return decoded_answer
+	elif result_type == int:
+		return [1 if option in decoded_answer else 0 for option in OPTION2INDEX]
+	raise NotImplementedError(f'Unknown param `result_type`: {result_type}')
+
+# 对题库JSON文件中的若干行题目分词: 多进程分词时每个进程处理一个分块, 返回字段信息与该分块的分词词频
+# 分词词频使用Counter记录, 各分块的Counter按分块顺序合并后, 分词首次出现的顺序与逐行分词完全一致, 从而token2id的编号也不变
+def tokenize_json_lines(lines, mode='train'):
+	data_dict = {
+		'id'		: [],	# 题目编号
+		'statement'	: [],	# 题干分词列表
+		'option_a'	: [],	# 选项A分词列表
+		'option_b'	: [],	# 选项B分词列表
+		'option_c'	: [],	# 选项C分词列表
+		'option_d'	: [],	# 选项D分词列表
+		'type'		: [],	# 0或1分别表示概念题与情景题
+		'subject'	: [],	# 所属参考书目中的18钟法律类型之一(该字段存在62.9%的缺失, 需要使用语言模型进行预测)
+	}
+	token2frequency = Counter()
+	if mode == 'train':
+		data_dict['answer'] = []	# 训练集比测试集多一个answer字段, 即题目答案
+	for line in lines:
+		data = json.loads(line)
+		assert len(data['option_list']) == TOTAL_OPTIONS	# 确保每道题都是4个选项
+		
+		# 获取每道题的字段信息
+		_id = data['id']
+		_type = data['type']
+		subject = data.get('subject')	# 该字段可能存在缺失, 可能不支持subscriptable, 因此改用get方法
+		statement, token2frequency = tokenize(data['statement'], token2frequency)
+		option_a, token2frequency = tokenize(data['option_list']['A'], token2frequency)
+		option_b, token2frequency = tokenize(data['option_list']['B'], token2frequency)
+		option_c, token2frequency = tokenize(data['option_list']['C'], token2frequency)
+		option_d, token2frequency = tokenize(data['option_list']['D'], token2frequency)
+		
+		# 记录每道题的字段信息
+		data_dict['id'].append(_id)
+		data_dict['statement'].append(statement)
+		data_dict['option_a'].append(option_a)
+		data_dict['option_b'].append(option_b)
+		data_dict['option_c'].append(option_c)
+		data_dict['option_d'].append(option_d)
+		data_dict['type'].append(_type)
+		data_dict['subject'].append(subject)
+		if mode == 'train':
+			answer = encode_answer(data['answer'])
+			data_dict['answer'].append(answer)
+	return data_dict, token2frequency
+
+# JEC-QA数据集中的题库JSON文件转为CSV文件: 顺带统计分词词频
+# num_workers大于1时将JSON文件按行切分为大小为chunksize的分块, 使用进程池并行分词, 输出的CSV文件与逐行分词的结果逐行一致
+def json_to_csv(json_path, csv_path, token2frequency=None, mode='train', num_workers=1, chunksize=1024):
+	assert mode in ['train', 'test'], f'Unknown param `mode`: {mode}'
+	_token2frequency = {} if token2frequency is None else token2frequency.copy()
+	with open(json_path, 'r', encoding='utf8') as f:
+		lines = [line for line in f.readlines() if line.strip()]
+	chunks = [lines[i: i + chunksize] for i in range(0, len(lines), chunksize)]
+	if num_workers is not None and num_workers > 1 and len(chunks) > 1:
+		with Pool(processes=min(num_workers, len(chunks))) as pool:
+			results = pool.map(partial(tokenize_json_lines, mode=mode), chunks)	# map保证返回结果的顺序与分块顺序一致
+	else:
+		results = [tokenize_json_lines(lines=chunk, mode=mode) for chunk in chunks]
+	
+	# 按分块顺序合并字段信息与分词词频
+	data_dict = None
+	for _data_dict, _chunk_token2frequency in results:
+		if data_dict is None:
+			data_dict = _data_dict
+		else:
+			for key in data_dict:
+				data_dict[key].extend(_data_dict[key])
+		for token, frequency in _chunk_token2frequency.items():
+			_token2frequency[token] = _token2frequency.get(token, 0) + frequency
+	if data_dict is None:
+		data_dict, _ = tokenize_json_lines(lines=[], mode=mode)	# 空文件
+	
+	# 字典转为DataFrame并导出为CSV文件
+	dataframe = pandas.DataFrame(data_dict, columns=list(data_dict.keys()))
+	if csv_path is not None:
+		dataframe.to_csv(csv_path, sep='\t', index=False, header=True)
+		export_token_store(dataframe, store_path=token_store_path(csv_path))	# 同时导出二进制列式存储
+	return dataframe, _token2frequency
+
+# 20211101更新: 划分0_train.csv和1_train.csv文件得到验证集, 用于本地测试
+def split_validset(dataframe, train_export_path, valid_export_path, valid_ratio=VALID_RATIO):
+	dataframe_train, dataframe_valid = train_test_split(dataframe, test_size=valid_ratio)
+	if train_export_path is not None:
+		dataframe_train.to_csv(train_export_path, sep='\t', index=False, header=True)
+		export_token_store(dataframe_train, store_path=token_store_path(train_export_path))
+	if valid_export_path is not None:
+		dataframe_valid.to_csv(valid_export_path, sep='\t', index=False, header=True)
+		export_token_store(dataframe_valid, store_path=token_store_path(valid_export_path))
+	return dataframe_train, dataframe_valid
+
+# token2id字典转为CSV文件
+def token2id_to_csv(export_path, token2frequency):
+	token2id = TOKEN2ID.copy()
+	_id = len(token2id)
+	for token, frequency in token2frequency.items():
+		if frequency >= FREQUENCY_THRESHOLD:
+			token2id[token] = _id
+			_id += 1
+	pandas.DataFrame({
+		'id'	: list(token2id.values()),
+		'token'	: list(token2id.keys()),
+	}).sort_values(by=['id'], ascending=True).to_csv(export_path, sep='\t', index=False, header=True)
+
+# token2frequency字典转为CSV文件: 按照分词频次降序排列
+def token2frequency_to_csv(export_path, token2frequency):
+	pandas.DataFrame({
+		'token'		: list(token2frequency.keys()),
+		'frequency'	: list(token2frequency.values()),
+	}).sort_values(by=['frequency'], ascending=False).to_csv(export_path, sep='\t', index=False, header=True)
+
+# 中文数词转数字: 用于识别参考书目的章节信息, 可处理至多两位数的中文写法
+def chinese_to_number(string):
+	easy_mapper = {
+		'一': '1', '二': '2', '两': '2',
+		'三': '3', '四': '4', '五': '5',
+		'六': '6', '七': '7', '八': '8',
+		'九': '9', '十': '0',
+	}
+	number_string = ''.join(list(map(easy_mapper.get, string)))
+	if number_string[0] == '0':
+		number = int(number_string) + 10
+	elif number_string[-1] == '0':
+		number = int(number_string)
+	else:
+		number = int(number_string.replace('0', ''))
+	return number
+
+# 列出参考书目中的所有章节文件: 返回(法律门类, 文件名)列表, 顺序与reference_to_csv写入CSV文件的顺序一致
+def list_reference_chapters():
+	chapters = []
+	for law in os.listdir(REFERENCE_DIR):
+		for filename in os.listdir(os.path.join(REFERENCE_DIR, law)):
+			if filename.endswith('.txt'):								# 存在一些无用的特殊文件, 如刑事诉讼法中有一个.swp文件)
+				_filename = filename.replace(' ', '').replace('.txt', '')
+				if _filename.find('第') == -1 or _filename.find('章') == -1:	# 跳过文件名中没有章节信息的文件, 如目录和中国法律史中有一个目录.txt文件是无用的
+					continue
+				chapters.append((law, filename))
+	return chapters
+
+# 章节文件的内容哈希: 用于增量更新时识别新增, 删除与修改的章节
+def hash_reference_chapter(law, filename):
+	with open(os.path.join(REFERENCE_DIR, law, filename), 'rb') as f:
+		return hashlib.sha1(f.read()).hexdigest()
+
+# 解析参考书目的一个章节文件: 返回字段名称到该章节所有段落取值列表的字典, 字段与reference_to_csv相同, 顺带统计分词词频
+def parse_reference_chapter(law, filename, token2frequency):
+	chapter_dict = {'law': [], 'chapter_number': [], 'chapter_name': [], 'section': [], 'content': []}
+	_filename = filename.replace(' ', '').replace('.txt', '')
+	start_index = _filename.find('第') + 1
+	end_index = _filename.find('章')
+	chapter_number_1 = _filename[start_index: end_index]	# 文件名中的章节编号: 经过检验这个字段要比从文件内容中抽取的章节编号更准确
+	chapter_name_1 = _filename[end_index + 1: ]				# 文件名中的章节名称: 可能缺失
+	filepath = os.path.join(REFERENCE_DIR, law, filename)	# 文件路径
+	with open(filepath, 'r', encoding='utf8') as f:
+		paragraphs = eval(f.read())							# 每个文件中的文档内容由字符串段落组成的列表样式数据组成
+	total_paragraphs = len(paragraphs)						# 统计总段落数
+	
+	# 该循环是为了从文件内容二次识别章节编号与章节名称, 因为文件名中的章节名称可能缺失
+	for i in range(total_paragraphs):
+		paragraph_string = paragraphs[i].replace(' ', '')
+		start_index = paragraph_string.find('第') + 1
+		end_index = paragraph_string.find('章')
+		chapter_number_2 = paragraph_string[start_index: end_index]
+		if start_index != 0 and end_index != -1:
+			chapter_name_2 = paragraphs[i + 1].replace(' ', '') if paragraph_string[-1] == '章' else paragraph_string[paragraph_string.find('章') + 1:]
+			break
+	
+	# 章节编号与章节名称最终确定
+	chapter_number = chinese_to_number(chapter_number_1)				# 目前认为直接使用文件名中的章节编号即可
+	chapter_name = chapter_name_1 if chapter_name_1 else chapter_name_2	# 优先使用文件名中的章节名称, 若缺失则使用文件内容中识别的章节名称
+	
+	# 该循环是记录文件内容中每个段落的小节名称与实际内容
+	for i in range(total_paragraphs):
+		blocks = paragraphs[i].strip().split(' ')
+		section = ' '.join(blocks[: -1])	# 小节名称为每一行除最后一个分块外的所有内容的拼接
+		content, token2frequency = tokenize(blocks[-1], token2frequency)
+		chapter_dict['law'].append(law)
+		chapter_dict['chapter_number'].append(chapter_number)
+		chapter_dict['chapter_name'].append(chapter_name)
+		chapter_dict['section'].append(section)
+		chapter_dict['content'].append(content)
+	return chapter_dict, token2frequency
+
+# JEC-QA数据集中的参考书目TXT文件转为CSV格式文件: 顺带统计分词词频
+# 同时导出章节清单manifest_export_path: 按CSV文件中的顺序记录每个章节文件的内容哈希与段落数, 用于update_reference_csv增量更新
+def reference_to_csv(export_path, token2frequency=None, manifest_export_path=REFERENCE_MANIFEST_PATH):
+	reference_dict = {
+		'law'			: [],	# 法律门类: 即reference_book下18门法律
+		'chapter_number': [],	# 章节编号: 该字段直接从文件名中抽取即可
+		'chapter_name'	: [],	# 章节名称: 有的文件名中有章节名称, 有的则没有, 需要从文件内容中自动识别, 一般在开头部分
+		'section'		: [],	# 小节名称: TXT文件中每一行除最后一个分块外的所有内容的拼接
+		'content'		: [],	# 实际内容分词列表: TXT文件中每一行最后一个分块
+	}
+	_token2frequency = {} if token2frequency is None else token2frequency.copy()
+	manifest = []
+	# 遍历所有法律门类的所有章节
+	for law, filename in list_reference_chapters():
+		chapter_dict, _token2frequency = parse_reference_chapter(law, filename, _token2frequency)
+		for column in reference_dict:
+			reference_dict[column].extend(chapter_dict[column])
+		manifest.append({'law': law, 'filename': filename, 'hash': hash_reference_chapter(law, filename), 'n_paragraphs': len(chapter_dict['content'])})
+	
+	# 字典转为DataFrame并导出为CSV文件
+	reference_dataframe = pandas.DataFrame(reference_dict, columns=list(reference_dict.keys()))
+	if export_path is not None:
+		reference_dataframe.to_csv(export_path, sep='\t', header=True, index=False)
+		export_token_store(reference_dataframe, store_path=token_store_path(export_path))
+		if manifest_export_path is not None:
+			with open(manifest_export_path, 'w', encoding='utf8') as f:
+				json.dump(manifest, f, ensure_ascii=False, indent=4)
+	return reference_dataframe, _token2frequency
+
+# 增量更新参考书目CSV文件: 按章节清单中的内容哈希找出新增, 删除与修改的章节文件, 只重新解析与分词变化的章节
+# 未变化的章节保持原有顺序, 变化(新增与修改)的章节按list_reference_chapters的顺序追加在末尾, 二进制列式存储同步拼接
+# 分词词频与分词编号(题库问答模型的词表)保持不变, 新出现的分词在问答模型中视为UNK, 需要时再完整预处理
+# :param reference_path	: 预处理得到的参考书目CSV文件
+# :param manifest_path	: reference_to_csv导出的章节清单
+# :return keep_rows		: 原参考书目中保留的段落编号(升序), 更新后依次为第0至len(keep_rows) - 1个段落, 参考书目没有变化时返回None
+# :return n_new			: 追加在末尾的新段落数
+def update_reference_csv(reference_path=REFERENCE_PATH, manifest_path=REFERENCE_MANIFEST_PATH):
+	with open(manifest_path, 'r', encoding='utf8') as f:
+		manifest = json.load(f)
+	hashes = {(law, filename): hash_reference_chapter(law, filename) for law, filename in list_reference_chapters()}
+	offsets = numpy.zeros((len(manifest) + 1, ), dtype=numpy.int64)
+	offsets[1: ] = numpy.cumsum([chapter['n_paragraphs'] for chapter in manifest])
+	kept_chapters = [i for i, chapter in enumerate(manifest) if hashes.get((chapter['law'], chapter['filename'])) == chapter['hash']]
+	kept_keys = set((manifest[i]['law'], manifest[i]['filename']) for i in kept_chapters)
+	new_keys = [key for key in hashes if key not in kept_keys]
+	if len(kept_chapters) == len(manifest) and not new_keys:
+		return None
+	old_keys = set((chapter['law'], chapter['filename']) for chapter in manifest)
+	logging.info(f'参考书目章节: 新增{sum(key not in old_keys for key in new_keys)}个, 修改{sum(key in old_keys for key in new_keys)}个, 删除{sum(key not in hashes for key in old_keys)}个')
+	
+	# 只解析变化的章节
+	keep_rows = numpy.concatenate([numpy.arange(offsets[i], offsets[i + 1]) for i in kept_chapters] + [numpy.zeros((0, ), dtype=numpy.int64)]).astype(numpy.int64)
+	new_dict = {'law': [], 'chapter_number': [], 'chapter_name': [], 'section': [], 'content': []}
+	new_manifest = [manifest[i] for i in kept_chapters]
+	for law, filename in new_keys:
+		chapter_dict, _ = parse_reference_chapter(law, filename, {})
+		for column in new_dict:
+			new_dict[column].extend(chapter_dict[column])
+		new_manifest.append({'law': law, 'filename': filename, 'hash': hashes[(law, filename)], 'n_paragraphs': len(chapter_dict['content'])})
+	new_dataframe = pandas.DataFrame(new_dict, columns=list(new_dict.keys()))
+	
+	# CSV文件中的分词列表字段不需要还原, 保留的行直接按字符串写回
+	reference_dataframe = pandas.read_csv(reference_path, sep='\t', header=0)
+	reference_dataframe = pandas.concat([reference_dataframe.iloc[keep_rows], new_dataframe], ignore_index=True)
+	reference_dataframe.to_csv(reference_path, sep='\t', header=True, index=False)
+	splice_token_store(token_store_path(reference_path), keep_rows=keep_rows, dataframe=new_dataframe)
+	with open(manifest_path, 'w', encoding='utf8') as f:
+		json.dump(new_manifest, f, ensure_ascii=False, indent=4)
+	return keep_rows, new_dataframe.shape[0]
+
+# 预处理得到的CSV文件对应的二进制列式存储目录: 如data/JEC-QA-preprocessed/0_train.csv对应data/JEC-QA-preprocessed/0_train.tks
+def token_store_path(csv_path):
+	return os.path.splitext(csv_path)[0] + '.tks'
+
+# 将DataFrame导出为二进制列式存储: 分词列表字段存储为int32分词编号数组与int64偏移量数组, 读取时可以直接内存映射, 无需逐行eval
+# 存储目录下的文件结构:
+# meta.json				: 字段名称, 分词列表字段名称与字符串字段名称
+# vocabulary.npy		: 所有分词列表字段共用的分词表(unicode数组), 分词编号即分词在该表中的索引
+# {column}.ids.npy		: 分词列表字段所有行拼接后的分词编号, int32
+# {column}.offsets.npy	: 分词列表字段第i行的分词编号为ids[offsets[i]: offsets[i + 1]], int64
+# {column}.npy			: 其他标量字段
+# {column}.isna.npy		: 字符串字段的缺失值标记
+def export_token_store(dataframe, store_path, token_columns=None):
+	if token_columns is None:	# 默认将取值为列表的字段视为分词列表字段
+		token_columns = [column for column in dataframe.columns if dataframe.shape[0] > 0 and isinstance(dataframe[column].iloc[0], list)]
+	os.makedirs(store_path, exist_ok=True)
+	token2index = {}
+	string_columns = []
+	for column in dataframe.columns:
+		values = dataframe[column].tolist()
+		if column in token_columns:
+			lengths = numpy.fromiter(map(len, values), dtype=numpy.int64, count=len(values))
+			offsets = numpy.zeros(len(values) + 1, dtype=numpy.int64)
+			numpy.cumsum(lengths, out=offsets[1: ])
+			ids = numpy.fromiter((token2index.setdefault(token, len(token2index)) for tokens in values for token in tokens), dtype=numpy.int32, count=offsets[-1])
+			numpy.save(os.path.join(store_path, f'{column}.ids.npy'), ids)
+			numpy.save(os.path.join(store_path, f'{column}.offsets.npy'), offsets)
+		elif pandas.api.types.is_numeric_dtype(dataframe[column]):
+			numpy.save(os.path.join(store_path, f'{column}.npy'), dataframe[column].values)
+		else:
+			isna = dataframe[column].isna().values
+			numpy.save(os.path.join(store_path, f'{column}.npy'), numpy.array(['' if _isna else str(value) for value, _isna in zip(values, isna)], dtype=str))
+			numpy.save(os.path.join(store_path, f'{column}.isna.npy'), isna)
+			string_columns.append(column)
+	vocabulary = numpy.array(list(token2index.keys()), dtype=str) if token2index else numpy.zeros((0, ), dtype='<U1')
+	numpy.save(os.path.join(store_path, 'vocabulary.npy'), vocabulary)
+	with open(os.path.join(store_path, 'meta.json'), 'w', encoding='utf8') as f:
+		json.dump({'columns': dataframe.columns.tolist(), 'token_columns': token_columns, 'string_columns': string_columns}, f, ensure_ascii=False)
+
+
+class TokenColumn:
+	"""二进制列式存储中的分词列表字段: 第i行的分词列表为vocabulary[ids[offsets[i]: offsets[i + 1]]]"""
+	def __init__(self, ids, offsets, vocabulary):
+		self.ids = ids
+		self.offsets = offsets
+		self.vocabulary = vocabulary
+	
+	@property
+	def lengths(self):
+		return numpy.diff(self.offsets)
+	
+	def __len__(self):
+		return self.offsets.shape[0] - 1
+	
+	def __getitem__(self, item):
+		return self.vocabulary[self.ids[self.offsets[item]: self.offsets[item + 1]]].tolist()
+	
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self[i]
+	
+	def tolist(self):
+		return list(self)
+
+# 加载二进制列式存储: 返回字段名称到TokenColumn(分词列表字段)或numpy数组(标量字段)的字典, 默认使用内存映射读取
+def load_token_store(store_path, columns=None, mmap_mode='r'):
+	with open(os.path.join(store_path, 'meta.json'), 'r', encoding='utf8') as f:
+		meta = json.load(f)
+	if columns is None:
+		columns = meta['columns']
+	vocabulary = numpy.load(os.path.join(store_path, 'vocabulary.npy'), mmap_mode=mmap_mode)
+	store = {}
+	for column in columns:
+		if column in meta['token_columns']:
+			store[column] = TokenColumn(ids=numpy.load(os.path.join(store_path, f'{column}.ids.npy'), mmap_mode=mmap_mode),
+										offsets=numpy.load(os.path.join(store_path, f'{column}.offsets.npy'), mmap_mode=mmap_mode),
+										vocabulary=vocabulary)
+		elif column in meta['string_columns']:
+			values = numpy.load(os.path.join(store_path, f'{column}.npy')).astype(object)
+			values[numpy.load(os.path.join(store_path, f'{column}.isna.npy'))] = numpy.nan	# 还原缺失值, 与pandas.read_csv的结果一致
+			store[column] = values
+		else:
+			store[column] = numpy.load(os.path.join(store_path, f'{column}.npy'), mmap_mode=mmap_mode)
+	return store
+
+# 增量更新二进制列式存储: 保留原存储中keep_rows指定的行, 再在末尾追加dataframe中的新行, 其余字段与原存储相同
+# 分词表只追加新出现的分词, 原有分词编号保持不变, 保留的行的分词编号直接按偏移量整体取出, 无需还原分词列表
+# 先将原存储完整读入内存再写入临时目录, 最后替换原目录, 避免覆盖仍被内存映射读取的文件
+# :param store_path	: 存储目录
+# :param keep_rows	: 原存储中保留的行号
+# :param dataframe	: 追加的新行, 字段需要与原存储相同
+def splice_token_store(store_path, keep_rows, dataframe):
+	with open(os.path.join(store_path, 'meta.json'), 'r', encoding='utf8') as f:
+		meta = json.load(f)
+	keep_rows = numpy.asarray(keep_rows, dtype=numpy.int64)
+	vocabulary = numpy.load(os.path.join(store_path, 'vocabulary.npy')).tolist()
+	token2index = {token: index for index, token in enumerate(vocabulary)}
+	arrays = {}
+	for column in meta['columns']:
+		values = dataframe[column].tolist() if column in dataframe.columns else []
+		if column in meta['token_columns']:
+			ids = numpy.load(os.path.join(store_path, f'{column}.ids.npy'))
+			offsets = numpy.load(os.path.join(store_path, f'{column}.offsets.npy'))
+			lengths = numpy.concatenate([numpy.diff(offsets)[keep_rows], numpy.fromiter(map(len, values), dtype=numpy.int64, count=len(values))])
+			new_offsets = numpy.zeros((lengths.shape[0] + 1, ), dtype=numpy.int64)
+			numpy.cumsum(lengths, out=new_offsets[1: ])
+			n_kept = int(new_offsets[keep_rows.shape[0]])
+			positions = numpy.arange(n_kept) + numpy.repeat(offsets[keep_rows] - new_offsets[: keep_rows.shape[0]], lengths[: keep_rows.shape[0]])	# 保留的行在原ids中的位置
+			new_ids = numpy.fromiter((token2index.setdefault(token, len(token2index)) for tokens in values for token in tokens), dtype=numpy.int32, count=new_offsets[-1] - n_kept)
+			arrays[f'{column}.ids.npy'] = numpy.concatenate([ids[positions], new_ids]).astype(numpy.int32)
+			arrays[f'{column}.offsets.npy'] = new_offsets
+		elif column in meta['string_columns']:
+			isna = pandas.isna(pandas.Series(values, dtype=object)).values
+			arrays[f'{column}.npy'] = numpy.concatenate([numpy.load(os.path.join(store_path, f'{column}.npy'))[keep_rows], numpy.array(['' if _isna else str(value) for value, _isna in zip(values, isna)], dtype=str)])
+			arrays[f'{column}.isna.npy'] = numpy.concatenate([numpy.load(os.path.join(store_path, f'{column}.isna.npy'))[keep_rows], isna])
+		else:
+			array = numpy.load(os.path.join(store_path, f'{column}.npy'))
+			arrays[f'{column}.npy'] = numpy.concatenate([array[keep_rows], numpy.asarray(values, dtype=array.dtype)])
+	arrays['vocabulary.npy'] = numpy.array(list(token2index.keys()), dtype=str) if token2index else numpy.zeros((0, ), dtype='<U1')
+	temp_path = f'{store_path}.{os.getpid()}.tmp'
+	os.makedirs(temp_path, exist_ok=True)
+	for filename, array in arrays.items():
+		numpy.save(os.path.join(temp_path, filename), array)
+	with open(os.path.join(temp_path, 'meta.json'), 'w', encoding='utf8') as f:
+		json.dump(meta, f, ensure_ascii=False)
+	shutil.rmtree(store_path)
+	os.replace(temp_path, store_path)
+
+# 流式导出只有一个分词列表字段的二进制列式存储, 文件结构与export_token_store相同
+# 分词编号与偏移量按块追加写入临时文件, 最后补上npy文件头, 内存占用只与分词表大小和chunksize有关, 与总行数无关
+# :param token_lists	: 分词列表的可迭代对象, 只会遍历一次
+# :param store_path		: 存储目录
+# :param column			: 字段名称
+# :param chunksize		: 每次写入的分词数
+def export_token_stream(token_lists, store_path, column='content', chunksize=1048576):
+	os.makedirs(store_path, exist_ok=True)
+	token2index = {}
+	ids_path = os.path.join(store_path, f'{column}.ids.npy')
+	offsets_path = os.path.join(store_path, f'{column}.offsets.npy')
+	with open(f'{ids_path}.tmp', 'wb') as ids_file, open(f'{offsets_path}.tmp', 'wb') as offsets_file:
+		ids_buffer, lengths_buffer, total = [], [], 0
+		offsets_file.write(numpy.zeros((1, ), dtype=numpy.int64).tobytes())
+		
+		def _flush():
+			nonlocal ids_buffer, lengths_buffer, total
+			ids_file.write(numpy.array(ids_buffer, dtype=numpy.int32).tobytes())
+			offsets = total + numpy.cumsum(numpy.array(lengths_buffer, dtype=numpy.int64))
+			offsets_file.write(offsets.tobytes())
+			total = int(offsets[-1]) if offsets.shape[0] > 0 else total
+			ids_buffer, lengths_buffer = [], []
+		
+		for tokens in token_lists:
+			ids_buffer.extend(token2index.setdefault(token, len(token2index)) for token in tokens)
+			lengths_buffer.append(len(tokens))
+			if len(ids_buffer) >= chunksize:
+				_flush()
+		_flush()
+	
+	# 原始字节前补上npy文件头即为可以内存映射读取的npy文件
+	for path, dtype in [(ids_path, numpy.int32), (offsets_path, numpy.int64)]:
+		with open(f'{path}.tmp', 'rb') as raw_file, open(path, 'wb') as npy_file:
+			header = {'descr': numpy.lib.format.dtype_to_descr(numpy.dtype(dtype)), 'fortran_order': False, 'shape': (os.path.getsize(f'{path}.tmp') // numpy.dtype(dtype).itemsize, )}
+			numpy.lib.format.write_array_header_1_0(npy_file, header)
+			shutil.copyfileobj(raw_file, npy_file)
+		os.remove(f'{path}.tmp')
+	vocabulary = numpy.array(list(token2index.keys()), dtype=str) if token2index else numpy.zeros((0, ), dtype='<U1')
+	numpy.save(os.path.join(store_path, 'vocabulary.npy'), vocabulary)
+	with open(os.path.join(store_path, 'meta.json'), 'w', encoding='utf8') as f:
+		json.dump({'columns': [column], 'token_columns': [column], 'string_columns': []}, f, ensure_ascii=False)
+
+# 逐个段落读取参考书目文档: 每个段落为小节名称的分词与内容分词的拼接, 可选过滤停用词
+# 优先以内存映射方式读取二进制列式存储, 不存在时分块读取CSV文件, 内存占用与参考书目的规模无关
+# :param reference_path	: 预处理得到的参考书目CSV文件
+# :param stopwords		: 停用词, 为None时不过滤
+# :param chunksize		: 每次读取的段落数
+# :param start			: 从第start个段落开始读取, 用于增量更新时只读取追加的新段落
+def iterate_reference_paragraphs(reference_path=REFERENCE_PATH, stopwords=None, chunksize=4096, start=0):
+	stopwords = None if stopwords is None else set(stopwords)
+	store_path = token_store_path(reference_path)
+	if os.path.exists(os.path.join(store_path, 'meta.json')):
+		content = load_token_store(store_path, columns=['content'])['content']
+		sections = numpy.load(os.path.join(store_path, 'section.npy'), mmap_mode='r')		# 缺失值在存储中已经是空字符串, 与fillna('')一致
+		chunks = ((sections[_start: _start + chunksize].tolist(), (content[i] for i in range(_start, min(_start + chunksize, len(content))))) for _start in range(start, len(content), chunksize))
+	else:
+		reader = pandas.read_csv(reference_path, sep='\t', header=0, usecols=['section', 'content'], chunksize=chunksize, skiprows=range(1, start + 1))
+		chunks = ((chunk['section'].fillna('').tolist(), chunk['content'].map(eval)) for chunk in reader)
+	last_section, section_tokens = None, []
+	for _sections, _contents in chunks:
+		for section, paragraph in zip(_sections, _contents):
+			if section != last_section:												# 同一小节的段落是连续的, 小节名称只需分词一次
+				last_section, section_tokens = section, jieba.lcut(section)
+			paragraph = section_tokens + paragraph									# 要把小节名称作为文档段落内容: 因为数据预处理时把小节名称从文档段落中分离出来了
+			if stopwords is not None:
+				paragraph = [token for token in paragraph if token not in stopwords]
+			yield paragraph
+
+# 加载参考书目文档: 返回以内存映射方式读取的TokenColumn, 可以重复迭代, 每次迭代逐个段落读取; 旧版本pickle保存的文档直接整体加载
+def load_reference_document(document_import_path=REFERENCE_DOCUMENT_PATH):
+	if os.path.isdir(document_import_path):
+		return load_token_store(document_import_path, columns=['content'])['content']
+	with open(document_import_path, 'rb') as f:
+		return pickle.load(f)
+
+# 参考书目文档导出为gensim的LineSentence格式文本文件: 每行一个段落, 分词之间以空格分隔, 用于Word2Vec, FastText与Doc2Vec的corpus_file参数多线程训练
+# 第i行即为第i个段落(空段落为空行), Doc2Vec用corpus_file训练时以行号作为段落标签, 与TaggedDocumentStream的段落编号一致
+# LineSentence按空白字符切分分词, 因此分词内部的空白字符替换为下划线, 只由空白字符组成的分词直接丢弃
+# 先写入以进程编号区分的临时文件再替换, 避免覆盖正在训练的模型仍在读取的文件, 多个进程同时导出时也不会相互截断
+# :param export_path			: 导出的文本文件路径
+# :param document_import_path	: 参考书目文档
+# :return n_paragraphs			: 导出的段落数
+def reference_document_to_line_sentence(export_path=REFERENCE_LINE_SENTENCE_PATH, document_import_path=REFERENCE_DOCUMENT_PATH):
+	token2word = {}
+	n_paragraphs = 0
+	temp_path = f'{export_path}.{os.getpid()}.tmp'
+	with open(temp_path, 'w', encoding='utf8') as f:
+		for paragraph in load_reference_document(document_import_path):
+			words = []
+			for token in paragraph:
+				if token not in token2word:
+					token2word[token] = '_'.join(token.split())
+				if token2word[token]:
+					words.append(token2word[token])
+			f.write(' '.join(words) + '\n')
+			n_paragraphs += 1
+	os.replace(temp_path, export_path)
+	return n_paragraphs
+
+# 加载参考书目文档每个段落所属的法律门类编号(即SUBJECT2INDEX的值), 与Dataset中的index2subject一致, 目录和中国法律史视为法制史
+def load_reference_subjects(reference_path=REFERENCE_PATH):
+	laws = load_preprocessed_dataframe(reference_path, columns=['law'])['law']
+	return numpy.array([SUBJECT2INDEX['法制史' if law == '目录和中国法律史' else law] for law in laws], dtype=numpy.int64)
+
+# 读取预处理得到的CSV文件: 优先读取对应的二进制列式存储, 分词列表字段直接还原为列表; 不存在时退化为读取CSV文件并用eval还原分词列表字段
+def load_preprocessed_dataframe(csv_path, columns=None, token_columns=None):
+	store_path = token_store_path(csv_path)
+	if os.path.exists(os.path.join(store_path, 'meta.json')):
+		store = load_token_store(store_path, columns=columns)
+		return pandas.DataFrame({column: value.tolist() if isinstance(value, TokenColumn) else value for column, value in store.items()})
+	dataframe = pandas.read_csv(csv_path, sep='\t', header=0, usecols=columns)
+	if token_columns is None:	# 默认将字符串形式为列表的字段视为分词列表字段
+		token_columns = [column for column in dataframe.columns if dataframe.shape[0] > 0 and isinstance(dataframe[column].iloc[0], str) and dataframe[column].iloc[0].startswith('[')]
+	for column in token_columns:
+		dataframe[column] = dataframe[column].map(eval)
+	return dataframe
+
+# 将CSR形式的分词编号(ids与offsets)截断并补全为(行数, max_length)的矩阵: 全程使用numpy批量操作, 不逐行处理
+def pad_ragged_ids(ids, offsets, max_length, pad_id=TOKEN2ID['PAD'], out=None):
+	n_rows = offsets.shape[0] - 1
+	lengths = numpy.diff(offsets)
+	if out is None:
+		out = numpy.empty((n_rows, max_length), dtype=numpy.int32)
+	out[: n_rows] = pad_id
+	rows = numpy.repeat(numpy.arange(n_rows), lengths)								# 每个分词所在的行
+	positions = numpy.arange(offsets[-1] - offsets[0]) - numpy.repeat(offsets[: -1] - offsets[0], lengths)	# 每个分词在所在行中的位置
+	mask = positions < max_length													# 截断超过max_length的部分
+	out[rows[mask], positions[mask]] = numpy.asarray(ids[offsets[0]: offsets[-1]])[mask]
+	return out
+
+# 加载token2id字典: 不把NA, null等分词解析为缺失值, 与分词词频文件的读取方式一致
+def load_token2id(token2id_path=REFERENCE_TOKEN2ID_PATH):
+	token2id_dataframe = pandas.read_csv(token2id_path, sep='\t', header=0, keep_default_na=False)
+	return {token: _id for token, _id in zip(token2id_dataframe['token'], token2id_dataframe['id'])}
+
+# 批量编码分词列表: 将一列分词列表编码为(行数, max_length)的int32矩阵
+# 先用pandas.factorize得到所有分词的去重分词表, 再对去重分词表查一次token2id得到查找表, 最后统一截断与补全, 避免逐个分词调用dict.get
+def encode_token_lists(token_lists, token2id, max_length):
+	token_lists = list(token_lists)
+	lengths = numpy.fromiter(map(len, token_lists), dtype=numpy.int64, count=len(token_lists))
+	offsets = numpy.zeros(len(token_lists) + 1, dtype=numpy.int64)
+	numpy.cumsum(lengths, out=offsets[1: ])
+	codes, uniques = pandas.factorize(numpy.fromiter(chain.from_iterable(token_lists), dtype=object, count=offsets[-1]))
+	lookup = numpy.fromiter((token2id.get(token, token2id['UNK']) for token in uniques), dtype=numpy.int32, count=len(uniques))
+	ids = lookup[codes] if offsets[-1] > 0 else numpy.zeros((0, ), dtype=numpy.int32)
+	return pad_ragged_ids(ids=ids, offsets=offsets, max_length=max_length, pad_id=token2id['PAD'])
+
+# 参考书目段落预编码: 将所有段落的分词列表按token2id编码为CSR形式的分词编号并保存, 只需在预处理时执行一次
+def build_reference_id_store(reference_path=REFERENCE_PATH, token2id_path=REFERENCE_TOKEN2ID_PATH, export_path=REFERENCE_ID_STORE_PATH):
+	store_path = token_store_path(reference_path)
+	if not os.path.exists(os.path.join(store_path, 'meta.json')):
+		reference_dataframe = pandas.read_csv(reference_path, sep='\t', header=0)
+		reference_dataframe['content'] = reference_dataframe['content'].map(eval)
+		export_token_store(reference_dataframe, store_path=store_path, token_columns=['content'])
+	content = load_token_store(store_path, columns=['content'])['content']
+	token2id = load_token2id(token2id_path)
+	lookup = numpy.array([token2id.get(token, token2id['UNK']) for token in content.vocabulary], dtype=numpy.int32)	# 分词表中每个分词对应的编号, 只需遍历一次分词表
+	os.makedirs(export_path, exist_ok=True)
+	numpy.save(os.path.join(export_path, 'ids.npy'), lookup[content.ids] if lookup.shape[0] > 0 else numpy.zeros((0, ), dtype=numpy.int32))
+	numpy.save(os.path.join(export_path, 'offsets.npy'), numpy.asarray(content.offsets))
+
+# 参考书目段落的分词编号矩阵: 形状为(段落数 + 1, max_length)的int32内存映射矩阵
+# 最后一行全为UNK, 用于填补检索结果不足num_best的情况, 这样任意一道题目的参考段落张量都可以通过一次索引操作得到
+def build_reference_id_matrix(max_length, store_path=REFERENCE_ID_STORE_PATH, export_path=None):
+	if export_path is None:
+		export_path = REFERENCE_ID_MATRIX_PATH.format(max_length)
+	ids = numpy.load(os.path.join(store_path, 'ids.npy'), mmap_mode='r')
+	offsets = numpy.load(os.path.join(store_path, 'offsets.npy'))
+	n_paragraphs = offsets.shape[0] - 1
+	matrix = numpy.lib.format.open_memmap(export_path, mode='w+', dtype=numpy.int32, shape=(n_paragraphs + 1, max_length))
+	pad_ragged_ids(ids=ids, offsets=offsets, max_length=max_length, pad_id=TOKEN2ID['PAD'], out=matrix)
+	matrix[n_paragraphs] = TOKEN2ID['UNK']
+	matrix.flush()
+	return matrix
+
+# 加载参考书目段落的分词编号矩阵: 不存在或早于预编码结果时重新生成
+def load_reference_id_matrix(max_length, store_path=REFERENCE_ID_STORE_PATH):
+	matrix_path = REFERENCE_ID_MATRIX_PATH.format(max_length)
+	if not os.path.exists(os.path.join(store_path, 'ids.npy')):
+		build_reference_id_store(export_path=store_path)
+	if not os.path.exists(matrix_path) or os.path.getmtime(matrix_path) < os.path.getmtime(os.path.join(store_path, 'ids.npy')):
+		build_reference_id_matrix(max_length=max_length, store_path=store_path, export_path=matrix_path)
+	return numpy.load(matrix_path, mmap_mode='r')
+
+# 将若干行检索结果reference_index补全为(行数, num_best)的索引矩阵: 不足num_best的部分用padding_index(即分词编号矩阵的最后一行)填补
+def pad_reference_index(reference_indices, num_best, padding_index):
+	index_matrix = numpy.full((len(reference_indices), num_best), padding_index, dtype=numpy.int64)
+	for i, reference_index in enumerate(reference_indices):
+		reference_index = reference_index[: num_best]
+		index_matrix[i, : len(reference_index)] = reference_index
+	return index_matrix
+
+# 加载停用词: 默认加载stopwords-master中所有的停用词
+def load_stopwords(stopword_names=None):
+	if stopword_names is None:
+		stopword_names = STOPWORD_PATHs.keys()
+	stopwords = []
+	for stopword_name in stopword_names:
+		with open(STOPWORD_PATHs[stopword_name], 'r', encoding='utf8') as f:
+			stopwords.extend(f.read().splitlines())
+	return list(set(stopwords))
+
+# 过滤停用词: 默认使用stopwords-master中所有的停用词
+def filter_stopwords(tokens, stopwords=None):
+	if stopwords is None:
+		stopwords = load_stopwords(stopword_names=None)
+	return list(filter(lambda x: not x in stopwords, tokens))
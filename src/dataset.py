@@ -8,7 +8,9 @@ if __name__ == '__main__':
 	sys.path.append('../')
 
 import os
+import json
 import time
+import shutil
 import jieba
 import torch
 import numpy
@@ -19,16 +21,16 @@ import logging
 from copy import deepcopy
 from collections import Counter
 from gensim.corpora import Dictionary
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
 from sklearn.model_selection import train_test_split
 
 from setting import *
 from config import RetrievalModelConfig, EmbeddingModelConfig
 
-from src.data_tools import load_stopwords, encode_answer, decode_answer, chinese_to_number, filter_stopwords
+from src.data_tools import load_stopwords, encode_answer, decode_answer, chinese_to_number, filter_stopwords, load_preprocessed_dataframe, load_token2id, load_reference_id_matrix, pad_reference_index, encode_token_lists
 from src.retrieval_model import GensimRetrievalModel
 from src.embedding_model import GensimEmbeddingModel, TransformersEmbeddingModel
-from src.utils import load_args, timer
+from src.utils import load_args, timer, generate_fingerprint
 
 
 # 生成数据加载器
@@ -40,7 +42,7 @@ def generate_dataloader(args, mode='train', do_export=False, pipeline='judgment'
 					  do_export=do_export, 
 					  pipeline=pipeline,
 					  for_test=for_test)
-	column = dataset.data.columns.tolist()
+	column = dataset.columns
 	if mode.startswith('train'):
 		batch_size = args.train_batch_size
 		shuffle = True
@@ -51,99 +53,42 @@ def generate_dataloader(args, mode='train', do_export=False, pipeline='judgment'
 		batch_size = args.test_batch_size
 		shuffle = False
 	
+	# 数据集各字段以连续的numpy数组存储, 采样器直接产出一个批次的索引列表, 由Dataset.__getitems__一次性切片得到整批数据
+	sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+	batch_sampler = BatchSampler(sampler, batch_size=batch_size, drop_last=False)
+	
+	# 顺序编号编码在数据集中以int32存储, 组成批数据时再转为long类型, gensim词向量也由问答模型按编号查找; 否则即使用向量转化, 此时转为float类型
+	tensor_type = 'long' if args.document_embedding is None and (args.word_embedding is None or args.word_embedding in GENSIM_EMBEDDING_MODEL_SUMMARY) else 'float'
+	
 	def _collate_fn(_batch_data):
-		
-		def __collate_id():
-			return [__data['id'] for __data in _batch_data]
-		
-		if args.word_embedding is None and args.document_embedding is None:
-			# 不使用词向量或文档向量的情况, 即使用顺序编号编码, 类型是long
-			def __collate_question():
-				return torch.LongTensor([__data['question'] for __data in _batch_data])
-
-			def __collate_reference():
-				return torch.LongTensor([__data['reference'] for __data in _batch_data])
-				
-			def __collate_options():
-				return torch.LongTensor([__data['options'] for __data in _batch_data])
-				
-			def __collate_option():
-				return torch.LongTensor([__data['option'] for __data in _batch_data])
-				
-		else:
-			# 否则即使用向量转化, 此时转化为float类型
-			def __collate_question():
-				if isinstance(_batch_data[0]['question'], numpy.ndarray):
-					return torch.FloatTensor([__data['question'] for __data in _batch_data])
-				elif isinstance(_batch_data[0]['question'], torch.Tensor):
-					return torch.stack([__data['question'] for __data in _batch_data])
-				else:
-					print(_batch_data[0]['question'])
-					raise NotImplementedError(type(_batch_data[0]['question']))
-					
-			def __collate_reference():
-				if isinstance(_batch_data[0]['reference'], numpy.ndarray):
-					return torch.FloatTensor([__data['reference'] for __data in _batch_data])
-				elif isinstance(_batch_data[0]['reference'], torch.Tensor):
-					return torch.stack([__data['reference'] for __data in _batch_data])
-				else:
-					raise NotImplementedError(type(_batch_data[0]['reference']))
-				
-			def __collate_options():
-				if isinstance(_batch_data[0]['options'], numpy.ndarray):
-					return torch.FloatTensor([__data['options'] for __data in _batch_data])
-				elif isinstance(_batch_data[0]['options'], torch.Tensor):
-					return torch.stack([__data['options'] for __data in _batch_data])
-				elif isinstance(_batch_data[0]['options'], list):
-					# 2021/12/27 22:35:27 目前只有options可能存在batch_data的每一个元素是一个列表, 该列表里面是四个选项的嵌入向量
-					# 2021/12/27 22:36:51 原因是options可能会涉及要转为judgment形式, 需要expand, 我担心如果不是list的话可能会失败, 因此只保留了options的list格式, reference之前也是list, 我已经转为numpy.ndarray了
-					return torch.stack([torch.stack(__data['options']) for __data in _batch_data])
-				else:
-					raise NotImplementedError(type(_batch_data[0]['options']))
-				
-			def __collate_option():
-				if isinstance(_batch_data[0]['option'], numpy.ndarray):
-					return torch.FloatTensor([__data['option'] for __data in _batch_data])		
-				elif isinstance(_batch_data[0]['option'], torch.Tensor):
-					return torch.stack([__data['option'] for __data in _batch_data])
-				else:
-					raise NotImplementedError(type(_batch_data[0]['option']))	
-
-		def __collate_type():
-			return [__data['type'] for __data in _batch_data]
-			
-		def __collate_subject():
-			return torch.LongTensor([__data['subject'] for __data in _batch_data])
-		
-		def __collate_label_choice():
-			return torch.LongTensor([__data['label_choice'] for __data in _batch_data])		# 0-15的选择题答案编码值
-			
-		def __collate_label_judgment():
-			return torch.LongTensor([__data['label_judgment'] for __data in _batch_data])	# 零一的判断题答案编码值
-
-		def __collate_option_id():
-			return [__data['option_id'] for __data in _batch_data]							# 20211216更新: 选项号需要记录进来
-
 		_collate_data = {}
 		for _column in column:
-			_collate_data[_column] = eval(f'__collate_{_column}')()
+			_array = _batch_data[_column]
+			if _column in ['id', 'type', 'option_id']:
+				_collate_data[_column] = _array.tolist()												# 这几个字段保持列表形式
+			elif _column in ['question', 'options', 'option', 'reference']:
+				_collate_data[_column] = getattr(torch.from_numpy(numpy.ascontiguousarray(_array)), tensor_type)()
+			else:
+				_collate_data[_column] = torch.from_numpy(numpy.ascontiguousarray(_array)).long()		# subject, label_choice(0-15的选择题答案编码值), label_judgment(零一的判断题答案编码值)
 		return _collate_data
 
 	dataloader = DataLoader(dataset=dataset,
-							batch_size=batch_size,
+							batch_size=None,
+							sampler=batch_sampler,
 							num_workers=args.num_workers,
-							collate_fn=_collate_fn,
-							shuffle=shuffle)
+							collate_fn=_collate_fn)
 	return dataloader
 
 
 class Dataset(Dataset):
 	"""模型输入数据集管道"""
+	cache_version = 5	# 数据表缓存的格式版本, 管道输出格式变化时需要递增
+	
 	def __init__(self, args, mode='train', do_export=False, pipeline='judgment', for_test=False):
 		"""
 		:param args			: DatasetConfig配置
 		:param mode			: 数据集模式, 详见下面第一行的断言
-		:param do_export	: 是否导出self.data
+		:param do_export	: 是否导出数据表
 		:param pipeline		: 目前考虑judgment与choice两种模式
 		:param for_test		: 2021/12/30 19:21:46 测试模式, 只用少量数据集加快测试效率
 		"""
@@ -194,13 +139,23 @@ class Dataset(Dataset):
 					_args.__setattr__(key, self.args.__getattribute__(key))
 			self.tem = TransformersEmbeddingModel(args=_args)
 		
-		# 生成数据表
-		self.pipelines[pipeline]()
+		# 生成数据表: 相关配置与输入文件都未改变时直接加载磁盘缓存
+		cache_path = os.path.join(DATASET_CACHE_DIR, self.generate_cache_key()) if self.args.use_cache else None
+		if cache_path is not None and os.path.exists(os.path.join(cache_path, 'meta.json')):
+			logging.info(f'加载数据表缓存: {cache_path}')
+			self.load_cache(cache_path)
+		else:
+			self.pipelines[pipeline]()
+			self.arrays = self.to_arrays(self.data)
+			del self.data		# 管道生成的数据表只用于转为数组, 之后只保留self.arrays, 需要数据表时由to_dataframe从数组视图构造
+			if cache_path is not None:
+				logging.info(f'保存数据表缓存: {cache_path}')
+				self.save_cache(cache_path)
 		
 		# 导出数据表
 		if self.do_export:
 			logging.info('导出数据表...')
-			self.data.to_csv(COMPLETE_REFERENCE_PATH, sep='\t', header=True, index=False)
+			self.to_dataframe().to_csv(COMPLETE_REFERENCE_PATH, sep='\t', header=True, index=False)
 	
 	@timer
 	def choice_pipeline(self):
@@ -231,11 +186,14 @@ class Dataset(Dataset):
 		start_time = time.time()
 		
 		# token2id字典: 20211212后决定以参考书目文档的token2id为标准, 而非题库的token2id
-		token2id_dataframe = pandas.read_csv(REFERENCE_TOKEN2ID_PATH, sep='\t', header=0)
-		token2id = {token: _id for token, _id in zip(token2id_dataframe['token'], token2id_dataframe['id'])}			
+		token2id = load_token2id(REFERENCE_TOKEN2ID_PATH)
+		if self.args.document_embedding is None and self.args.word_embedding in GENSIM_EMBEDDING_MODEL_SUMMARY and GENSIM_EMBEDDING_MODEL_SUMMARY[self.args.word_embedding].get('oov_vocabulary') is not None:
+			# FastText词向量矩阵在参考书目的token2id之后追加了题库中的其他分词, 预处理时已由字符n-gram计算好词向量, 这些分词按矩阵的行号编码而不再视为UNK
+			matrix, oov_tokens = self.gem.load_embedding_matrix(model_name=self.args.word_embedding, return_oov_tokens=True)
+			token2id.update({token: matrix.shape[0] - len(oov_tokens) + i for i, token in enumerate(oov_tokens.tolist())})
 		
 		# 合并概念题和情景题后的题库
-		dataset_dataframe = pandas.concat([pandas.read_csv(filepath, sep='\t', header=0) for filepath in filepaths]).reset_index(drop=True)	
+		dataset_dataframe = pandas.concat([load_preprocessed_dataframe(filepath) for filepath in filepaths]).reset_index(drop=True)	# 分词列表字段直接从二进制列式存储中读取, 无需再用eval转换
 		
 		if self.mode.endswith('_kd'):   
 			dataset_dataframe = dataset_dataframe[dataset_dataframe['type'] == 0].reset_index(drop=True)	# 筛选概念题
@@ -250,30 +208,13 @@ class Dataset(Dataset):
 			
 		dataset_dataframe['id'] = dataset_dataframe['id'].astype(str)				# 字段id转为字符串
 		dataset_dataframe['type'] = dataset_dataframe['type'].astype(int)			# 字段type转为整数
-		dataset_dataframe['statement'] = dataset_dataframe['statement'].map(eval)	# 字段statement用eval函数转为分词列表
-		dataset_dataframe['option_a'] = dataset_dataframe['option_a'].map(eval)		# 字段option_a用eval函数转为分词列表
-		dataset_dataframe['option_b'] = dataset_dataframe['option_b'].map(eval)		# 字段option_b用eval函数转为分词列表
-		dataset_dataframe['option_c'] = dataset_dataframe['option_c'].map(eval)		# 字段option_c用eval函数转为分词列表
-		dataset_dataframe['option_d'] = dataset_dataframe['option_d'].map(eval)		# 字段option_d用eval函数转为分词列表
 		
-		if self.args.word_embedding is None and self.args.document_embedding is None:
-			# 使用token2id的顺序编码值进行词嵌入
-			dataset_dataframe['question'] = dataset_dataframe['statement'].map(self.token_to_id(max_length=max_statement_length, token2id=token2id))																# 题目题干的分词列表转为编号列表
-			dataset_dataframe['options'] = dataset_dataframe[['option_a', 'option_b', 'option_c', 'option_d']].apply(self.combine_option(max_length=max_option_length, token2emb=token2id, encode_as='id'), axis=1)	# 题目选项的分词列表转为编号列表并合并	
-		
-		elif self.args.word_embedding in GENSIM_EMBEDDING_MODEL_SUMMARY:
-			# 使用gensim词向量模型进行训练: word2vec, fasttext
-			embedding_model_class = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[self.args.word_embedding]['class'])
-			embedding_model_path = GENSIM_EMBEDDING_MODEL_SUMMARY[self.args.word_embedding]['model']
-			embedding_model = embedding_model_class.load(embedding_model_path)
-			token2vector = embedding_model.wv
-			self.vector_size = embedding_model.wv.vector_size
-			
-			# 2021/12/27 21:26:45 这里可以直接删除模型, 直接用wv即可
-			del embedding_model
-
-			dataset_dataframe['question'] = dataset_dataframe['statement'].map(self.token_to_vector(max_length=max_statement_length, token2vector=token2vector))															# 题目题干的分词列表转为编号列表
-			dataset_dataframe['options'] = dataset_dataframe[['option_a', 'option_b', 'option_c', 'option_d']].apply(self.combine_option(max_length=max_option_length, token2emb=token2vector, encode_as='vector'), axis=1)	# 题目选项的分词列表转为编号列表并合并
+		if self.args.document_embedding is None and (self.args.word_embedding is None or self.args.word_embedding in GENSIM_EMBEDDING_MODEL_SUMMARY):
+			# 使用token2id的顺序编码值进行词嵌入: 整列批量编码为int32矩阵, 每行是矩阵的一个视图
+			# gensim词向量(word2vec, fasttext)同样只保存分词编号, 由问答模型的词嵌入层按导出的词向量矩阵查找
+			dataset_dataframe['question'] = list(encode_token_lists(dataset_dataframe['statement'], token2id=token2id, max_length=max_statement_length))		# 题目题干的分词列表转为编号矩阵, 形状为(n_rows, max_statement_length)
+			dataset_dataframe['options'] = list(numpy.stack([encode_token_lists(dataset_dataframe[column], token2id=token2id, max_length=max_option_length) 
+															 for column in ['option_a', 'option_b', 'option_c', 'option_d']], axis=1))							# 题目选项的分词列表转为编号矩阵并合并, 形状为(n_rows, 4, max_option_length)
 		
 		elif self.args.word_embedding in BERT_MODEL_SUMMARY:
 			# 目前不考虑用BERT模型生成词向量
@@ -281,48 +222,40 @@ class Dataset(Dataset):
 		
 		elif self.args.document_embedding in GENSIM_EMBEDDING_MODEL_SUMMARY:
 			# 使用gensim文档向量模型进行训练: 目前这里特指doc2vec模型, 代码目前比较硬
-			embedding_model_class = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[self.args.document_embedding]['class'])
-			embedding_model_path = GENSIM_EMBEDDING_MODEL_SUMMARY[self.args.document_embedding]['model']
-			embedding_model = embedding_model_class.load(embedding_model_path)
-			
-			# 相对来说词向量模型的调用要麻烦一些, 文档向量模型的调用要容易很多, 也不是很好和下面几个成员函数合并, 所以直接写lambda函数来解决了
-			# 2021/12/27 22:25:08 注意torch.cat与torch.stack的区别, 前者不会增加维数, 后者则支持拼接得到更高维数的张量
-			dataset_dataframe['question'] = dataset_dataframe['statement'].map(embedding_model.infer_vector)
-			dataset_dataframe['options'] = dataset_dataframe[['option_a', 'option_b', 'option_c', 'option_d']].apply(lambda _dataframe: [embedding_model.infer_vector(_dataframe[0]),
-																																		 embedding_model.infer_vector(_dataframe[1]),
-																																		 embedding_model.infer_vector(_dataframe[2]),
-																																		 embedding_model.infer_vector(_dataframe[3])], axis=1)
+			# 所有题干与选项一次性在进程池中批量推断文档向量, 子进程以内存映射方式共享模型
+			n_rows = dataset_dataframe.shape[0]
+			document_vectors = self.gem.infer_vectors(dataset_dataframe['statement'].tolist() + sum([dataset_dataframe[column].tolist() for column in ['option_a', 'option_b', 'option_c', 'option_d']], []), 
+													  model_name=self.args.document_embedding)
+			dataset_dataframe['question'] = list(document_vectors[: n_rows])
+			dataset_dataframe['options'] = list(document_vectors[n_rows: ].reshape(TOTAL_OPTIONS, n_rows, -1).transpose(1, 0, 2))
 		elif self.args.document_embedding in BERT_MODEL_SUMMARY:	
 			# 使用BERT模型生成文档向量: 注意只有BERT模型输出是torch.Tensor, 其他都是numpy.ndarray, 是可以比较容易处理的
+			# 所有题干与选项一次性批量编码, 已在预处理时缓存的文本直接读取文档向量缓存
 			bert_tokenizer, bert_model = TransformersEmbeddingModel.load_bert_model(model_name=self.args.document_embedding)
 			bert_config = TransformersEmbeddingModel.load_bert_config(model_name=self.args.document_embedding)
+			bert_cache = self.tem.load_bert_cache(model_name=self.args.document_embedding, max_length=bert_config['max_position_embeddings'])
 			
-			def _generate_bert_output(_tokens):
-				# BERT模型无需分词, 直接输入整个句子即可
-				_text = [''.join(_tokens)]
-				_output = self.tem.generate_bert_output(text=_text, tokenizer=bert_tokenizer, model=bert_model, max_length=bert_config['max_position_embeddings'])
-				return _output
-				
-			dataset_dataframe['question'] = dataset_dataframe['statement'].map(_generate_bert_output)
-			dataset_dataframe['options'] = dataset_dataframe[['option_a', 'option_b', 'option_c', 'option_d']].apply(lambda _dataframe: [_generate_bert_output(_dataframe[0]),
-																																		 _generate_bert_output(_dataframe[1]),
-																																		 _generate_bert_output(_dataframe[2]),
-																																		 _generate_bert_output(_dataframe[3])], axis=1)
+			def _generate_bert_output(_token_lists):
+				# BERT模型无需分词, 直接输入整个句子即可, 每个文本的输出形状为(1, hidden_size), 与逐个编码时一致
+				_texts = [''.join(_tokens) for _tokens in _token_lists]
+				_output = self.tem.encode_texts(texts=_texts, tokenizer=bert_tokenizer, model=bert_model, cache=bert_cache, max_length=bert_config['max_position_embeddings'])
+				return _output[:, None, :]
+			
+			n_rows = dataset_dataframe.shape[0]
+			bert_output = _generate_bert_output(dataset_dataframe['statement'].tolist() + sum([dataset_dataframe[column].tolist() for column in ['option_a', 'option_b', 'option_c', 'option_d']], []))
+			dataset_dataframe['question'] = list(bert_output[: n_rows])
+			dataset_dataframe['options'] = list(bert_output[n_rows: ].reshape(TOTAL_OPTIONS, n_rows, *bert_output.shape[1: ]).transpose(1, 0, 2, 3))
+			bert_cache.save(BERT_VECTOR_CACHE_PATH.format(self.args.document_embedding, self.tem.args.bert_output))
 		else:
 			# 目前尚未完成其他词嵌入的使用
 			raise NotImplementedError
 		
 		# 参考文献相关字段预处理
 		if self.args.use_reference:
-			# 加载文档检索模型相关内容
-			dictionary_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[self.args.retrieval_model_name]['dictionary']
-			if dictionary_path is None:		# logentropy模型的dictionary字段是None
-				dictionary_path = REFERENCE_DICTIONARY_PATH
-			dictionary = Dictionary.load(dictionary_path)
-			similarity = self.grm.build_similarity(model_name=self.args.retrieval_model_name)
-			sequence = GensimRetrievalModel.load_sequence(model_name=self.args.retrieval_model_name)
+			# 加载预处理时生成的检索结果表
+			retrieval_table = self.grm.load_retrieval_table(split=self.mode.split('_')[0], model_name=self.args.retrieval_model_name)
 
-			reference_dataframe = pandas.read_csv(REFERENCE_PATH, sep='\t', header=0)
+			reference_dataframe = load_preprocessed_dataframe(REFERENCE_PATH, columns=['law', 'content'])
 			index2subject = {index: '法制史' if law == '目录和中国法律史' else law for index, law in enumerate(reference_dataframe['law'])}		# 记录reference_dataframe中每一行对应的法律门类
 			
 			# 新生成的几个字段说明:
@@ -330,50 +263,42 @@ class Dataset(Dataset):
 			# reference_index	: 将[4, 7, 1]给抽取出来
 			# reference			: 将[4, 7, 1]对应的参考书目文档的段落的分词列表给抽取出来并转为编号列表
 			# subject			: 题目对应的args.num_top_subject个候选法律门类
-			logging.info('生成查询得分向量...')
-			dataset_dataframe['query_result'] = dataset_dataframe[['statement', 'option_a', 'option_b', 'option_c', 'option_d']].apply(self.generate_query_result(dictionary=dictionary, 
-																																								  similarity=similarity, 
-																																								  sequence=sequence), axis=1)
+			logging.info('查询检索结果表...')
+			dataset_dataframe['query_result'] = self.generate_query_result(dataframe=dataset_dataframe, retrieval_table=retrieval_table)
 			dataset_dataframe['reference_index'] = dataset_dataframe['query_result'].map(lambda result: list(map(lambda x: x[0], result)))
 			
 
 			logging.info('检索参考书目文档段落...')
 			
-			if self.args.word_embedding is None and self.args.document_embedding is None:
-				dataset_dataframe['reference'] = dataset_dataframe['reference_index'].map(self.find_reference_by_index(max_length=max_reference_length, 
-																													   token2emb=token2id, 
-																													   reference_dataframe=reference_dataframe,
-																													   encode_as='id'))
-			elif self.args.word_embedding in GENSIM_EMBEDDING_MODEL_SUMMARY:
-				dataset_dataframe['reference'] = dataset_dataframe['reference_index'].map(self.find_reference_by_index(max_length=max_reference_length, 
-																													   token2emb=token2vector, 
-																													   reference_dataframe=reference_dataframe,
-																													   encode_as='vector'))		
+			if self.args.document_embedding is None and (self.args.word_embedding is None or self.args.word_embedding in GENSIM_EMBEDDING_MODEL_SUMMARY):
+				# 参考书目段落已在预处理时编码为分词编号矩阵, 只需按reference_index做一次索引即可得到所有题目的参考段落张量
+				reference_id_matrix = load_reference_id_matrix(max_length=max_reference_length)
+				reference_index_matrix = pad_reference_index(reference_indices=dataset_dataframe['reference_index'], num_best=self.args.num_best, padding_index=reference_id_matrix.shape[0] - 1)
+				dataset_dataframe['reference'] = list(reference_id_matrix[reference_index_matrix])
 			elif self.args.word_embedding in BERT_MODEL_SUMMARY:
 				# 目前不考虑用BERT模型生成词向量
 				raise NotImplementedError
 				
 			elif self.args.document_embedding in GENSIM_EMBEDDING_MODEL_SUMMARY:
 				# 2021/12/27 22:17:56 使用gensim文档向量模型进行训练: 目前这里特指doc2vec模型, 代码目前比较硬
-				# 2021/12/27 22:20:22 改自self.find_reference_by_index函数, 其实还是可以用lambda一行写完的, 可读性差了一些
-				dataset_dataframe['reference'] = dataset_dataframe['reference_index'].map(lambda _reference_index: numpy.stack([embedding_model.infer_vector(eval(reference_dataframe.loc[_index, 'content'])) for _index in _reference_index]))
+				# 参考书目段落就是训练时的文档, 直接按reference_index取出模型中的段落向量, 无需逐个推断
+				# 检索结果不足num_best时以-1填补索引, 对应位置再置为零向量, 每道题目的参考段落张量形状为(num_best, vector_size)
+				reference_vectors = self.gem.build_reference_vectors(model_name=self.args.document_embedding)
+				reference_index_matrix = pad_reference_index(reference_indices=dataset_dataframe['reference_index'], num_best=self.args.num_best, padding_index=-1)
+				reference_matrix = numpy.asarray(reference_vectors[reference_index_matrix], dtype=numpy.float32)
+				reference_matrix[reference_index_matrix == -1] = 0
+				dataset_dataframe['reference'] = list(reference_matrix)
 			
 			elif self.args.document_embedding in BERT_MODEL_SUMMARY:	
 				# 2021/12/27 22:42:30 使用BERT模型生成文档向量: 注意只有BERT模型输出是torch.Tensor, 其他都是numpy.ndarray, 是可以比较容易处理的
-				def _generate_bert_output(_reference_index):
-					_reference = []
-					for _index in _reference_index:
-						# 2021/12/27 22:42:38 BERT模型无需分词, 直接输入整个句子即可
-						_text = [''.join(eval(reference_dataframe.loc[_index, 'content']))]
-						_output = self.tem.generate_bert_output(text=_text, tokenizer=bert_tokenizer, model=bert_model, max_length=bert_config['max_position_embeddings'])
-						_reference.append(_output)
-					# 2021/12/27 22:42:42 不要输出为列表
-					return torch.stack(_reference)
-				
-				# 2021/12/27 22:43:15 其实上面这个函数可以一行写完的
-				# _generate_bert_output = lambda _reference_index: torch.stack([bert_model(**bert_tokenizer(''.join(eval(reference_dataframe.loc[_index, 'content'])), return_tensors='pt', padding=True)).get(self.args.tem.bert_output) for _index in _reference_index])
-					
-				dataset_dataframe['reference'] = dataset_dataframe['reference_index'].map(_generate_bert_output)
+				# 所有题目检索到的段落去重后一次性批量编码, 每道题目的参考段落张量形状为(num_best, 1, hidden_size), 检索结果不足num_best时以零向量填补
+				reference_indices = sorted(set(_index for _reference_index in dataset_dataframe['reference_index'] for _index in _reference_index))
+				reference_output = _generate_bert_output(reference_dataframe.loc[reference_indices, 'content'].tolist())
+				reference_output = numpy.concatenate([reference_output, numpy.zeros((1, *reference_output.shape[1: ]), dtype=reference_output.dtype)])	# 最后一行零向量用于填补
+				reference_position = {_index: _position for _position, _index in enumerate(reference_indices)}
+				reference_index_matrix = pad_reference_index(reference_indices=[[reference_position[_index] for _index in _reference_index] for _reference_index in dataset_dataframe['reference_index']], num_best=self.args.num_best, padding_index=len(reference_indices))
+				dataset_dataframe['reference'] = list(reference_output[reference_index_matrix])
+				bert_cache.save(BERT_VECTOR_CACHE_PATH.format(self.args.document_embedding, self.tem.args.bert_output))
 				
 			else:
 				# 目前尚未完成其他词嵌入的使用
@@ -405,100 +330,15 @@ class Dataset(Dataset):
 		type			: 零一值表示概念题或情景题
 		label_judgment	: train或valid模式时生效, 零一值表示判断题的答案
 		option_id		: 20211216更新, 记录判断题对应的原选择题编号(ABCD)
+		
+		判断题形式的数据集不再把选择题数据表展开为四倍的行数, self.arrays仍为选择题数据表各字段的数组
+		第i条判断题数据是在其上建立的索引视图: 对应第i // 4道题的第i % 4个选项, 参考段落等字段不会被复制四份
 		"""		
 		self.choice_pipeline()
-		self.data = self.choice_to_judgment(choice_dataframe=self.data, id_column='id', choice_column='options', answer_column='label_choice')
-		
-	def token_to_id(self, max_length, token2id):
-		"""题目题干分词列表转编号"""
-		def _token_to_id(_tokens):
-			_ids = list(map(lambda _token: token2id.get(_token, token2id['UNK']), _tokens))
-			if len(_ids) >= max_length:
-				return _ids[: max_length]
-			else:
-				return _ids + [token2id['PAD']] * (max_length - len(_ids))
-		return _token_to_id
 		
-	def token_to_vector(self, max_length, token2vector):
-		"""20211218更新: 引入词向量对分词进行编码"""
-		unk_or_pad_vector = numpy.zeros((self.vector_size, ))
-		def _token_to_vector(_tokens):
-			_vectors = list(map(lambda _token: token2vector[_token] if _token in token2vector else unk_or_pad_vector[:], _tokens))
-			if len(_vectors) >= max_length:
-				_vectors = _vectors[: max_length]
-			else:
-				_vectors = _vectors + [unk_or_pad_vector[:] for _ in range(max_length - len(_vectors))]	# 注意这里复制列表就别用乘号了, 老老实实用循环免得出问题
-			return numpy.stack(_vectors)																# 2021/12/27 23:00:44 修正为stack拼接
-		return _token_to_vector
-	
-	def combine_option(self, max_length, token2emb, encode_as='id'):
-		"""题目选项分词列表转编号并合并"""		
-		if encode_as == 'id':
-			def _combine_option(_dataframe):
-				__token_to_id = self.token_to_id(max_length=max_length, token2id=token2emb)
-				_option_a, _option_b, _option_c, _option_d = _dataframe
-				return [__token_to_id(_option_a),
-						__token_to_id(_option_b),
-						__token_to_id(_option_c),
-						__token_to_id(_option_d)]
-		elif encode_as == 'vector':
-			def _combine_option(_dataframe):
-				__token_to_vector = self.token_to_vector(max_length=max_length, token2vector=token2emb)
-				_option_a, _option_b, _option_c, _option_d = _dataframe
-				return [__token_to_vector(_option_a),
-						__token_to_vector(_option_b),
-						__token_to_vector(_option_c),
-						__token_to_vector(_option_d)]		
-		else:
-			raise NotImplementedError
-
-		return _combine_option
-
-	
-	def generate_query_result(self, dictionary, similarity, sequence):
-		"""生成查询得分向量"""
-		def _generate_query_result(_dataframe):
-			_statement, _option_a, _option_b, _option_c, _option_d = _dataframe						# 提取用于查询文档的关键词: 题干与四个选项
-			_query_tokens = _statement + _option_a + _option_b + _option_c + _option_d				# 拼接题目和四个选项的分词
-			if self.args.filter_stopword:											
-				_query_tokens = filter_stopwords(tokens=_query_tokens, stopwords=self.stopwords)	# 筛除停用词
-			return self.grm.query(query_tokens=_query_tokens, 
-								  dictionary=dictionary, 
-								  similarity=similarity, 
-								  sequence=sequence)
-		return _generate_query_result
-
-
-	def find_reference_by_index(self, max_length, token2emb, reference_dataframe, encode_as='id'):
-		"""根据新生成的reference_index寻找对应的参考段落, 并转为编号形式"""
-		if encode_as == 'id':
-			
-			def _find_reference_by_index(_reference_index):
-				_reference = []
-				__token_to_id = self.token_to_id(max_length=max_length, token2id=token2emb)	
-				for _index in _reference_index:
-					_tokens = eval(reference_dataframe.loc[_index, 'content'])	# reference_index对应在reference_dataframe中的分词列表
-					_reference.append(__token_to_id(_tokens))
-				if len(_reference) < self.args.num_best:						# 2021/12/19 11:18:24 竟然Similarity可能返回的结果不足num_best, 也不是很能理解, 只能手动填补了
-					for _ in range(self.args.num_best - len(_reference)):
-						_reference.append([token2emb['UNK']] * max_length)		# 2021/12/19 11:25:16 填补为UNK
-				return numpy.stack(_reference)									# 2021/12/27 22:07:18 要转为数组形式
-				
-		elif encode_as == 'vector':
-			
-			def _find_reference_by_index(_reference_index):
-				_reference = []
-				__token_to_vector = self.token_to_vector(max_length=max_length, token2vector=token2emb)	
-				for _index in _reference_index:
-					_tokens = eval(reference_dataframe.loc[_index, 'content'])	# reference_index对应在reference_dataframe中的分词列表
-					_reference.append(__token_to_vector(_tokens))
-				if len(_reference) < self.args.num_best:						# 2021/12/19 11:18:24 竟然Similarity可能返回的结果不足num_best, 也不是很能理解, 只能手动填补了
-					for _ in range(self.args.num_best - len(_reference)):
-						_reference.append(numpy.zeros((self.vector_size, )))	# 2021/12/19 11:25:26 填补为零向量
-				return numpy.stack(_reference)									# 2021/12/27 22:07:18 要转为数组形式
-		else:
-			raise NotImplementedError
-		return _find_reference_by_index
+	def generate_query_result(self, dataframe, retrieval_table):
+		"""生成查询得分向量: 直接按题目编号查询预处理时批量生成的检索结果表"""
+		return retrieval_table.query_results(dataframe['id'].astype(str).tolist())
 
 
 	def fill_subject(self, index2subject):
@@ -524,43 +364,174 @@ class Dataset(Dataset):
 	def choice_to_judgment(self, choice_dataframe, id_column='id', choice_column='options', answer_column='label_choice'):
 		"""
 		20211124更新: 将选择题形式的dataframe转为判断题形式的dataframe
-		此处使用了dataframe的apply高阶用法, 使用result_type='expand'的模式来简化代码格式
+		判断题数据表的第i行对应选择题数据表第i // 4行的第i % 4个选项, 直接按行索引重复选择题数据表即可, 无需apply展开与merge连接
 		:param choice_dataframe		: 选择题形式的dataframe
-		:param id_column			: 题目编号所在的字段名, 用于表的连接
+		:param id_column			: 题目编号所在的字段名
 		:param choice_column		: 题目选项所在的字段名, 要求是一个长度为4的可迭代对象, 用于拆分
 		:param answer_column		: 题目答案所在的字段名, 要求是0-15的编码值
 		:return judgment_dataframe	: 判断题形式的dataframe
 		"""
-		# 左表是去除选项和答案的原数据表
-		left_dataframe_columns = choice_dataframe.columns.tolist()
-		left_dataframe_columns.remove(choice_column)
-		if self.mode.startswith('train') or self.mode.startswith('valid'):
-			left_dataframe_columns.remove(answer_column)
-		left_dataframe = choice_dataframe[left_dataframe_columns]
+		n_questions = choice_dataframe.shape[0]
+		question_index = numpy.repeat(numpy.arange(n_questions), TOTAL_OPTIONS)
+		option_index = numpy.tile(numpy.arange(TOTAL_OPTIONS), n_questions)
+		columns = [column for column in choice_dataframe.columns if column not in [choice_column, answer_column]]
+		judgment_dataframe = choice_dataframe[columns].iloc[question_index].reset_index(drop=True)		# 按行重复只复制对象的引用, 参考段落等数组不会被复制
+		choices = choice_dataframe[choice_column].tolist()
+		judgment_dataframe['option'] = [choices[_question_index][_option_index] for _question_index, _option_index in zip(question_index, option_index)]
+		if answer_column in choice_dataframe.columns:
+			judgment_dataframe['label_judgment'] = (choice_dataframe[answer_column].values.astype(int)[question_index] >> option_index) & 1	# 答案编码值的第i位即第i个选项的对错
+		judgment_dataframe['option_id'] = [INDEX2OPTION[_option_index] for _option_index in option_index]	# 20211216更新: 选项号需要记录进来
+		return judgment_dataframe
 
-		# 右表是由问题编号、单选项、判断真伪三个字段构成的数据表
-		if self.mode.startswith('train') or self.mode.startswith('valid'):
-			right_dataframe_columns = [id_column, 'option', 'label_judgment']
-			right_dataframe = pandas.concat([choice_dataframe[[id_column]].apply(lambda x: [x[0]] * 4, axis=1, result_type='expand').stack().reset_index(drop=True),									# 通过expand将一道题的id扩充为四道题
-											 choice_dataframe[[choice_column]].apply(lambda x: [x[0][0], x[0][1], x[0][2], x[0][3]], axis=1, result_type='expand').stack().reset_index(drop=True),		# 通过expand将一道题的四个选项扩充为四道题
-											 choice_dataframe[[answer_column]].apply(lambda x: decode_answer(x[0], result_type=int), axis=1, result_type='expand').stack().reset_index(drop=True)], 	# 使用result_type为int的decode_answer方法获得每个选项的对错值, 并扩充成四道题
-											 axis=1)
+	def generate_cache_key(self):
+		"""生成数据表缓存的键: 影响管道输出的配置字段与所有输入文件的指纹"""
+		config = {
+			'cache_version'			: self.cache_version,
+			'mode'					: self.mode,
+			'for_test'				: self.for_test,
+			'use_reference'			: self.args.use_reference,
+			'word_embedding'		: self.args.word_embedding,
+			'document_embedding'	: self.args.document_embedding,
+			'retrieval_model_name'	: self.args.retrieval_model_name,
+			'num_best'				: self.args.num_best,
+			'num_top_subject'		: self.args.num_top_subject,
+			'max_statement_length'	: self.args.max_statement_length,
+			'max_option_length'		: self.args.max_option_length,
+			'max_reference_length'	: self.args.max_reference_length,
+			'filter_stopword'		: self.args.filter_stopword,
+		}
+		if self.mode.startswith('train'):
+			filepaths = TRAINSET_PATHs[:]
+		elif self.mode.startswith('valid'):
+			filepaths = VALIDSET_PATHs[:]
 		else:
-			right_dataframe_columns = [id_column, 'option']
-			right_dataframe = pandas.concat([choice_dataframe[[id_column]].apply(lambda x: [x[0]] * 4, axis=1, result_type='expand').stack().reset_index(drop=True),									# 通过expand将一道题的id扩充为四道题
-											 choice_dataframe[[choice_column]].apply(lambda x: [x[0][0], x[0][1], x[0][2], x[0][3]], axis=1, result_type='expand').stack().reset_index(drop=True)],		# 通过expand将一道题的四个选项扩充为四道题
-											 axis=1)
-		right_dataframe.columns = right_dataframe_columns
-		right_dataframe['option_id'] = ['A', 'B', 'C', 'D'] * (right_dataframe.shape[0] // 4)	# 20211216更新: 选项号需要记录进来
+			filepaths = TESTSET_PATHs[:]
+		filepaths += [os.path.splitext(filepath)[0] + '.tks' for filepath in filepaths]
+		filepaths.append(REFERENCE_TOKEN2ID_PATH)
+		if self.args.use_reference:
+			filepaths += [REFERENCE_PATH, REFERENCE_ID_STORE_PATH, REFERENCE_DICTIONARY_PATH]
+			if self.args.retrieval_model_name in NEURAL_RETRIEVAL_MODEL_SUMMARY:
+				filepaths += [NEURAL_RETRIEVAL_MODEL_SUMMARY[self.args.retrieval_model_name]['model'], os.path.join(NEURAL_RETRIEVAL_MODEL_SUMMARY[self.args.retrieval_model_name]['index'], 'meta.json')]
+			elif self.args.retrieval_model_name in CASCADE_RETRIEVAL_MODEL_SUMMARY:
+				config['cascade'] = {'stages': [self.args.first_stage_cascade, self.args.second_stage_cascade], 'num_candidate': self.args.num_candidate_cascade}	# 级联检索的结果随两个阶段的模型与候选数变化
+				filepaths += self.grm.index_dependency_paths(model_name=self.args.retrieval_model_name, use_shard=False)
+			else:
+				for model_name in GENSIM_RETRIEVAL_MODEL_SUMMARY[self.args.retrieval_model_name]['sequence'] + [self.args.retrieval_model_name]:
+					filepaths += [GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['model'], GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['corpus']]
+			if self.args.use_ann and (RETRIEVAL_MODEL_SUMMARY[self.args.retrieval_model_name]['ann_index'] is not None or self.args.retrieval_model_name in CASCADE_RETRIEVAL_MODEL_SUMMARY):
+				config['ann'] = {'n_lists': self.args.n_lists_ann, 'n_subspaces': self.args.n_subspaces_ann, 'nprobe': self.args.nprobe_ann, 'rerank': self.args.rerank_ann}	# 近似检索的结果随参数变化
+			if self.args.use_shard:
+				config['shard'] = self.args.first_pass_shard			# 分片检索的结果随门类预测方式变化
+				shard_model_name = self.args.first_stage_cascade if self.args.retrieval_model_name in CASCADE_RETRIEVAL_MODEL_SUMMARY else self.args.retrieval_model_name	# 级联检索只有第一阶段分片
+				filepaths.append(os.path.join(SHARDED_INDEX_PATH.format(shard_model_name), 'meta.json'))
+		for embedding in [self.args.word_embedding, self.args.document_embedding]:
+			if embedding in GENSIM_EMBEDDING_MODEL_SUMMARY:
+				filepaths.append(GENSIM_EMBEDDING_MODEL_SUMMARY[embedding]['model'])
+				if embedding == self.args.word_embedding and GENSIM_EMBEDDING_MODEL_SUMMARY[embedding].get('oov_vocabulary') is not None:
+					filepaths.append(GENSIM_EMBEDDING_MODEL_SUMMARY[embedding]['oov_vocabulary'])	# 题库分词的编号随分词词频文件变化
+				if embedding == self.args.document_embedding:
+					config['seed_doc2vec'] = self.gem.args.seed_doc2vec		# 推断的文档向量随种子变化
+			elif embedding in BERT_MODEL_SUMMARY:
+				config['bert_output'] = self.args.bert_output if 'bert_output' in self.args else None
+				filepaths.append(BERT_MODEL_SUMMARY[embedding]['root'])
+		return generate_fingerprint(config=config, filepaths=filepaths)
+
+	def to_arrays(self, dataframe):
+		"""将数据表的每个字段转为一个连续的numpy数组: 字符串字段为字符串数组, 其余字段按行堆叠, 第一维是数据条数"""
 		
-		judgment_dataframe = left_dataframe.merge(right_dataframe, how='left', on=id_column).reset_index(drop=True)
-		return judgment_dataframe
+		def _to_numpy(_value):
+			if isinstance(_value, torch.Tensor):
+				return _value.detach().cpu().numpy()
+			if isinstance(_value, (list, tuple)) and len(_value) > 0 and isinstance(_value[0], (list, tuple, numpy.ndarray, torch.Tensor)):
+				return numpy.stack([_to_numpy(__value) for __value in _value])
+			return numpy.asarray(_value)
+		
+		arrays = {}
+		for column in dataframe.columns:
+			values = dataframe[column].tolist()
+			if len(values) > 0 and isinstance(values[0], str):
+				arrays[column] = numpy.array(values, dtype=str)
+			else:
+				arrays[column] = numpy.stack([_to_numpy(value) for value in values]) if len(values) > 0 else numpy.zeros((0, ))
+		return arrays
+
+	def save_cache(self, cache_path):
+		"""将各字段的numpy数组保存为npy文件: 写入临时目录后再重命名, 避免并发读取到不完整的缓存"""
+		temp_path = f'{cache_path}.{os.getpid()}.tmp'
+		os.makedirs(temp_path, exist_ok=True)
+		for column, array in self.arrays.items():
+			numpy.save(os.path.join(temp_path, f'{column}.npy'), array)
+		with open(os.path.join(temp_path, 'meta.json'), 'w', encoding='utf8') as f:
+			json.dump({'columns': list(self.arrays.keys())}, f)
+		try:
+			os.replace(temp_path, cache_path)
+		except OSError:
+			shutil.rmtree(temp_path, ignore_errors=True)			# 其他进程已经写入了相同的缓存
+	
+	def load_cache(self, cache_path):
+		"""加载数据表缓存: 各字段使用内存映射读取, 数据表的每行为一个数组视图"""
+		with open(os.path.join(cache_path, 'meta.json'), 'r', encoding='utf8') as f:
+			columns = json.load(f)['columns']
+		self.arrays = {column: numpy.load(os.path.join(cache_path, f'{column}.npy'), mmap_mode='r') for column in columns}
+
+	@property
+	def columns(self):
+		"""数据集每条数据的字段: 判断题形式的字段由选择题形式的字段推导得到"""
+		if self.pipeline == 'choice':
+			return list(self.arrays.keys())
+		columns = [column for column in self.arrays if column not in ['options', 'label_choice']]
+		columns.append('option')
+		if 'label_choice' in self.arrays:
+			columns.append('label_judgment')
+		columns.append('option_id')
+		return columns
+	
+	def to_dataframe(self):
+		"""按管道形式输出完整的数据表, 判断题形式需要展开, 仅用于导出或sklearn模型等需要完整数据表的场景: 数据表由self.arrays构造, 多维字段的每行为一个数组视图"""
+		data = {column: list(array) if array.ndim > 1 else numpy.array(array).tolist() for column, array in self.arrays.items()}
+		choice_dataframe = pandas.DataFrame(data, columns=list(self.arrays.keys()))
+		if self.pipeline == 'choice':
+			return choice_dataframe
+		return self.choice_to_judgment(choice_dataframe=choice_dataframe, id_column='id', choice_column='options', answer_column='label_choice')
+	
+	def judgment_labels(self, items=None):
+		"""
+		判断题形式的标签: 第item条数据对应第item // 4道题的第item % 4个选项, 标签为答案编码值的对应位
+		:param items	: 判断题形式的数据索引列表, 默认为全部数据
+		:return labels	: 零一值的int64数组
+		"""
+		if items is None:
+			items = numpy.arange(self.arrays['label_choice'].shape[0] * TOTAL_OPTIONS)
+		question_indices, option_indices = numpy.divmod(numpy.asarray(items, dtype=numpy.int64), TOTAL_OPTIONS)
+		return (self.arrays['label_choice'][question_indices].astype(numpy.int64) >> option_indices) & 1	# 答案编码值的第option_index位即该选项的对错
+	
+	def __getitems__(self, items):
+		"""
+		批量取数据: 按索引列表直接对各字段的数组切片, 不为每条数据构造Python对象
+		:param items	: 数据索引列表
+		:return batch	: 字段名到数组的字典, 数组第一维是批次大小
+		"""
+		items = numpy.asarray(items, dtype=numpy.int64)
+		if self.pipeline == 'choice':
+			return {column: self.arrays[column][items] for column in self.columns}
+		# 判断题形式: 第item条数据对应第item // 4道题的第item % 4个选项
+		question_indices, option_indices = numpy.divmod(items, TOTAL_OPTIONS)
+		batch = {column: self.arrays[column][question_indices] for column in self.arrays if column not in ['options', 'label_choice']}
+		batch['option'] = self.arrays['options'][question_indices, option_indices]
+		if 'label_choice' in self.arrays:
+			batch['label_judgment'] = self.judgment_labels(items)
+		batch['option_id'] = numpy.array([INDEX2OPTION[index] for index in range(TOTAL_OPTIONS)])[option_indices]
+		return batch
 
 	def __getitem__(self, item):
-		return self.data.loc[item, :]
+		if isinstance(item, (list, tuple, numpy.ndarray)):
+			return self.__getitems__(item)
+		return {column: array[0] for column, array in self.__getitems__([item]).items()}
 
 	def __len__(self):
-		return len(self.data)
+		if self.pipeline == 'choice':
+			return self.arrays['id'].shape[0]
+		return self.arrays['id'].shape[0] * TOTAL_OPTIONS
 
 
 
@@ -1,171 +1,578 @@
-# -*- coding: utf-8 -*- 
-# @author : caoyang
-# @email: caoyang@163.sufe.edu.cn
-# 词嵌入模型
-
-if __name__ == '__main__':
-	import sys
-	sys.path.append('../')
-
-import time
-import json
-import torch
-import gensim
-import pandas
-import pickle
-
-
-from copy import deepcopy
-from gensim.corpora import MmCorpus, Dictionary
-from gensim.models import Word2Vec, FastText, Doc2Vec, WordEmbeddingSimilarityIndex
-from gensim.models.doc2vec import TaggedDocument
-from gensim.similarities import SoftCosineSimilarity, SparseTermSimilarityMatrix
-
-from setting import *
-
-if PLATFORM == 'windows':
-	from transformers import BertTokenizer, BertModel
-
-from src.data_tools import load_stopwords, filter_stopwords
-from src.utils import timer
-
-class GensimEmbeddingModel:
-	"""gensim模块下的词嵌入模型"""
-	def __init__(self, args):
-		"""
-		:param args	: EmbeddingModelConfig配置
-		"""
-		self.args = deepcopy(args)
-		
-		if self.args.filter_stopword:
-			self.stopwords = load_stopwords(stopword_names=None)
-	
-	@timer
-	def build_word2vec_model(self, 
-							 corpus_import_path=REFERENCE_CORPUS_PATH,
-							 document_import_path=REFERENCE_DOCUMENT_PATH,
-							 model_export_path=REFERENCE_WORD2VEC_MODEL_PATH):
-		kwargs = {
-			'size'		: self.args.size_word2vec,
-			'min_count'	: self.args.min_count_word2vec,
-			'window'	: self.args.window_word2vec,
-			'workers'	: self.args.workers_word2vec,
-		}
-		return GensimEmbeddingModel.easy_build_model(model_name='word2vec',
-													 corpus_import_path=corpus_import_path,
-													 document_import_path=document_import_path,
-													 model_export_path=model_export_path,
-													 **kwargs)
-	@timer
-	def build_fasttext_model(self, 
-							 corpus_import_path=REFERENCE_CORPUS_PATH,
-							 document_import_path=REFERENCE_DOCUMENT_PATH,
-							 model_export_path=REFERENCE_WORD2VEC_MODEL_PATH):
-		kwargs = {
-			'size'		: self.args.size_fasttext,
-			'min_count'	: self.args.min_count_fasttext,
-			'window'	: self.args.window_fasttext,
-			'workers'	: self.args.workers_fasttext,
-		}
-		return GensimEmbeddingModel.easy_build_model(model_name='fasttext',
-													 corpus_import_path=corpus_import_path,
-													 document_import_path=document_import_path,
-													 model_export_path=model_export_path,
-													 **kwargs)
-	
-	@classmethod
-	def easy_build_model(cls,
-						 model_name,
-						 corpus_import_path,
-						 document_import_path,
-						 model_export_path,
-						 **kwargs):
-		"""
-		20211218更新: 
-		最近发现用corpus_file参数训练得到的模型词汇表全是索引而非分词
-		而且观察下来跟dictionary的索引还对不上, 非常的恼火, 只能改用sentences参数的写法了
-		"""
-		# model = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['class'])(corpus_file=corpus_import_path, **kwargs)
-		model = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['class'])(sentences=pickle.load(open(document_import_path, 'rb')), **kwargs)
-		if model_export_path is not None:
-			model.save(model_export_path)
-		return model
-	
-	@timer
-	def build_similarity(self, model_name):
-		"""构建模型的gensim相似度(Similarity)"""
-		model = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['class']).load(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['model'])
-		dictionary = Dictionary.load(REFERENCE_DICTIONARY_PATH)
-		corpus = MmCorpus(REFERENCE_CORPUS_PATH)
-		similarity_index = WordEmbeddingSimilarityIndex(model.wv)
-		similarity_matrix = SparseTermSimilarityMatrix(similarity_index, dictionary)
-		similarity = SoftCosineSimilarity(corpus, similarity_matrix, num_best=self.args.num_best)
-		return similarity
-
-	def query(self, query_tokens, dictionary, similarity):
-		"""
-		给定查询分词列表返回相似度匹配向量
-		:param query_tokens	: 需要查询的关键词分词列表
-		:param dictionary	: gensim字典
-		:param similarity	: gensim相似度
-		:param sequence		: 模型序列
-		:return result		: 文档中每个段落的匹配分值
-		"""
-		if self.args.filter_stopword:
-			filter_stopwords(tokens=query_tokens, stopwords=self.stopwords)
-		query_corpus = dictionary.doc2bow(query_tokens)
-		result = similarity[query_corpus]
-		return result
-
-	@timer
-	def build_doc2vec_model(self, 
-							corpus_import_path=REFERENCE_CORPUS_PATH, 
-							document_import_path=REFERENCE_DOCUMENT_PATH, 
-							model_export_path=REFERENCE_DOC2VEC_MODEL_PATH):
-		"""2021/12/27 14:21:10 构建Doc2Vec模型"""		
-		kwargs = {
-			'vector_size': self.args.size_doc2vec,
-			'min_count': self.args.min_count_doc2vec,
-			'window': self.args.window_doc2vec,
-			'workers': self.args.workers_doc2vec,
-		}
-		from gensim.test.utils import common_texts
-		documents = pickle.load(open(document_import_path, 'rb'))
-		tagged_documents = [TaggedDocument(document, [tag]) for tag, document in enumerate(documents)]
-		model = Doc2Vec(documents=tagged_documents, **kwargs)
-		# model = Doc2Vec(corpus_file=corpus_import_path, **kwargs)
-		if model_export_path is not None:
-			model.save(model_export_path)
-		return model
-
-	
-class TransformersEmbeddingModel:
-	"""transformers模块下的词嵌入模型"""
-	def __init__(self, args):
-		"""
-		:param args	: EmbeddingModelConfig配置
-		"""
-		self.args = deepcopy(args)		
-	
-	
-	@classmethod
-	@timer
-	def load_bert_model(cls, model_name='bert-base-chinese'):
-		assert model_name in BERT_MODEL_SUMMARY		
-		tokenizer = BertTokenizer(BERT_MODEL_SUMMARY[model_name]['vocab'])
-		model = BertModel.from_pretrained(BERT_MODEL_SUMMARY[model_name]['root'])
-		model.eval()
-		return tokenizer, model
-	
-	@classmethod
-	def load_bert_config(cls, model_name='bert-base-chinese'):
-		assert model_name in BERT_MODEL_SUMMARY		
-		config = json.load(open(BERT_MODEL_SUMMARY[model_name]['config'], 'r', encoding='utf8'))
-		return config
-	
-	def generate_bert_output(self, text, tokenizer, model, max_length=512):
-		encoded_input = tokenizer(text, return_tensors='pt', padding=True, truncation=True, max_length=max_length)
-		output = model(**encoded_input)
-		return output.get(self.args.bert_output)
-		
-	
+# -*- coding: utf-8 -*- 
+# @author : caoyang
+# @email: caoyang@163.sufe.edu.cn
+# 词嵌入模型
+
+if __name__ == '__main__':
+	import sys
+	sys.path.append('../')
+
+import os
+import time
+import json
+import numpy
+import torch
+import gensim
+import pandas
+import pickle
+import hashlib
+import logging
+import multiprocessing
+
+from copy import deepcopy
+from gensim.corpora import MmCorpus, Dictionary
+from gensim.models import Word2Vec, FastText, Doc2Vec, WordEmbeddingSimilarityIndex
+from gensim.models.doc2vec import TaggedDocument
+from gensim.similarities import SoftCosineSimilarity, SparseTermSimilarityMatrix
+
+from setting import *
+
+if PLATFORM == 'windows':
+	from transformers import BertTokenizer, BertModel
+
+from src.data_tools import load_stopwords, filter_stopwords, load_reference_document, load_preprocessed_dataframe, load_token2id, reference_document_to_line_sentence
+from src.retrieval_model import IVFPQIndex, SoftCosineIndex
+from src.retrieval_tools import corpus_to_csr, to_query_results, save_arrays, load_arrays
+from src.utils import timer
+
+class TaggedDocumentStream:
+	"""Doc2Vec的训练语料: 每次迭代都重新逐个段落读取文档, 以段落编号作为标签, 不在内存中保存整个文档"""
+	def __init__(self, document):
+		"""
+		:param document	: 可以重复迭代的段落分词列表, 如load_reference_document的返回值
+		"""
+		self.document = document
+	
+	def __len__(self):
+		return len(self.document)
+	
+	def __iter__(self):
+		for tag, paragraph in enumerate(self.document):
+			yield TaggedDocument(paragraph, [tag])
+
+
+# Doc2Vec批量推断的子进程中共享的模型, 由_initialize_doc2vec_worker以内存映射方式只读加载
+_doc2vec_model = None
+
+def _initialize_doc2vec_worker(model_path):
+	global _doc2vec_model
+	_doc2vec_model = Doc2Vec.load(model_path, mmap='r')
+
+# 逐个推断文档向量: 每个文档推断前用相同的种子重置模型的随机数生成器, 推断结果与文档的顺序及所在的进程无关
+# :param model		: Doc2Vec模型, 默认使用子进程中加载的模型
+# :param token_lists: 分词列表的列表
+# :param seed		: 随机数种子
+# :return vectors	: 形状为(len(token_lists), vector_size)的float32数组
+def infer_doc2vec_vectors(token_lists, seed=0, model=None):
+	model = _doc2vec_model if model is None else model
+	vectors = numpy.zeros((len(token_lists), model.vector_size), dtype=numpy.float32)
+	for i, tokens in enumerate(token_lists):
+		model.random = numpy.random.RandomState(seed)
+		vectors[i] = model.infer_vector(tokens)
+	return vectors
+
+
+class GensimEmbeddingModel:
+	"""gensim模块下的词嵌入模型"""
+	def __init__(self, args):
+		"""
+		:param args	: EmbeddingModelConfig配置
+		"""
+		self.args = deepcopy(args)
+		
+		if self.args.filter_stopword:
+			self.stopwords = load_stopwords(stopword_names=None)
+	
+	@timer
+	def build_word2vec_model(self, 
+							 corpus_import_path=REFERENCE_LINE_SENTENCE_PATH,
+							 document_import_path=REFERENCE_DOCUMENT_PATH,
+							 model_export_path=REFERENCE_WORD2VEC_MODEL_PATH):
+		kwargs = {
+			'size'		: self.args.size_word2vec,
+			'min_count'	: self.args.min_count_word2vec,
+			'window'	: self.args.window_word2vec,
+			'workers'	: self.args.workers_word2vec,
+		}
+		return GensimEmbeddingModel.easy_build_model(model_name='word2vec',
+													 corpus_import_path=corpus_import_path if self.args.use_corpus_file else None,
+													 document_import_path=document_import_path,
+													 model_export_path=model_export_path,
+													 **kwargs)
+	@timer
+	def build_fasttext_model(self, 
+							 corpus_import_path=REFERENCE_LINE_SENTENCE_PATH,
+							 document_import_path=REFERENCE_DOCUMENT_PATH,
+							 model_export_path=REFERENCE_WORD2VEC_MODEL_PATH):
+		kwargs = {
+			'size'		: self.args.size_fasttext,
+			'min_count'	: self.args.min_count_fasttext,
+			'window'	: self.args.window_fasttext,
+			'workers'	: self.args.workers_fasttext,
+		}
+		return GensimEmbeddingModel.easy_build_model(model_name='fasttext',
+													 corpus_import_path=corpus_import_path if self.args.use_corpus_file else None,
+													 document_import_path=document_import_path,
+													 model_export_path=model_export_path,
+													 **kwargs)
+	
+	@classmethod
+	def easy_build_model(cls,
+						 model_name,
+						 corpus_import_path,
+						 document_import_path,
+						 model_export_path,
+						 **kwargs):
+		"""
+		20211218更新: 
+		最近发现用corpus_file参数训练得到的模型词汇表全是索引而非分词
+		而且观察下来跟dictionary的索引还对不上, 非常的恼火, 只能改用sentences参数的写法了
+		后来发现原因是corpus_file传入的是词袋语料(REFERENCE_CORPUS_PATH), 而corpus_file要求的是LineSentence格式的文本文件
+		现在把参考书目文档导出为LineSentence格式的文本文件再用corpus_file训练, 每个worker线程各自读取文件中的一段
+		训练速度随workers扩展, 不受sentences参数只有一个生产者线程的限制, 也不需要把整个文档读入内存
+		:param model_name			: 模型名称, 即GENSIM_EMBEDDING_MODEL_SUMMARY的键
+		:param corpus_import_path	: LineSentence格式的语料文件, 不存在或早于参考书目文档时重新导出, 为None时改用sentences参数从参考书目文档流式读取
+		:param document_import_path	: 参考书目文档
+		:param model_export_path	: 模型保存路径, 为None时不保存
+		"""
+		if corpus_import_path is None:
+			model = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['class'])(sentences=load_reference_document(document_import_path), **kwargs)	# 参考书目文档可以重复迭代, 每轮训练都从磁盘流式读取
+		else:
+			GensimEmbeddingModel.prepare_corpus_file(corpus_import_path=corpus_import_path, document_import_path=document_import_path)
+			model = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['class'])(corpus_file=corpus_import_path, **kwargs)
+		if model_export_path is not None:
+			model.save(model_export_path)
+		return model
+	
+	@classmethod
+	def prepare_corpus_file(cls, corpus_import_path=REFERENCE_LINE_SENTENCE_PATH, document_import_path=REFERENCE_DOCUMENT_PATH):
+		"""LineSentence格式的语料文件不存在或早于参考书目文档(如增量更新之后)时重新导出"""
+		if not os.path.exists(corpus_import_path) or os.path.getmtime(corpus_import_path) < os.path.getmtime(document_import_path):
+			logging.warning(f'LineSentence格式的语料文件不存在或已过期, 重新导出: {corpus_import_path}')
+			reference_document_to_line_sentence(export_path=corpus_import_path, document_import_path=document_import_path)
+		return corpus_import_path
+
+	@timer
+	def build_ann_index(self, model_name='doc2vec', export_path=None, n_samples=1000):
+		"""
+		用Doc2Vec模型训练得到的段落向量构建IVF-PQ近似最近邻索引并保存, 同时用抽样的段落向量作为查询评估召回率
+		:param model_name	: 模型名称, 要求GENSIM_EMBEDDING_MODEL_SUMMARY中有ann_index字段
+		:param export_path	: 索引保存路径, 默认为GENSIM_EMBEDDING_MODEL_SUMMARY中的ann_index字段
+		:param n_samples	: 评估召回率时抽样的查询数
+		"""
+		if export_path is None:
+			export_path = GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['ann_index']
+		model = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['class']).load(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['model'])
+		docvecs = model.dv if hasattr(model, 'dv') else model.docvecs
+		matrix = numpy.asarray(docvecs.vectors if hasattr(docvecs, 'vectors') else docvecs.vectors_docs, dtype=numpy.float32)
+		ann_index = IVFPQIndex.from_matrix(matrix, 
+										   n_lists=self.args.n_lists_ann, 
+										   n_subspaces=self.args.n_subspaces_ann, 
+										   num_best=self.args.num_best, 
+										   nprobe=self.args.nprobe_ann, 
+										   rerank=self.args.rerank_ann)
+		samples = numpy.random.RandomState(0).choice(matrix.shape[0], min(n_samples, matrix.shape[0]), replace=False)
+		ann_index.recall = ann_index.evaluate_recall(matrix[numpy.sort(samples)])
+		logging.info(f'{model_name}模型近似最近邻索引的recall@{self.args.num_best}: {ann_index.recall} (nprobe={ann_index.nprobe}, rerank={ann_index.rerank})')
+		ann_index.save(export_path)
+		return ann_index
+
+	@timer
+	def build_similarity(self, model_name):
+		"""
+		加载模型的相似度索引: 默认加载预先构建的软余弦相似度索引, 缺失或早于模型与语料时重新构建
+		设置use_ann且模型有ann_index字段时加载近似最近邻索引, 查询时用infer_vector推断查询向量
+		"""
+		model = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['class']).load(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['model'])
+		ann_index_path = GENSIM_EMBEDDING_MODEL_SUMMARY[model_name].get('ann_index')
+		if self.args.use_ann and ann_index_path is not None:
+			if not os.path.exists(os.path.join(ann_index_path, 'meta.json')) or os.path.getmtime(os.path.join(ann_index_path, 'meta.json')) < os.path.getmtime(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['model']):
+				logging.warning(f'{model_name}模型的近似最近邻索引不存在或已过期, 重新构建: {ann_index_path}')
+				self.build_ann_index(model_name=model_name, export_path=ann_index_path)
+			similarity = IVFPQIndex.load(ann_index_path, num_best=self.args.num_best, nprobe=self.args.nprobe_ann, rerank=self.args.rerank_ann)
+			similarity.infer_vector = model.infer_vector		# 查询分词列表需要用模型推断为段落向量
+			return similarity
+		index_path = GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['index']
+		meta_path = os.path.join(index_path, 'meta.json')
+		if not os.path.exists(meta_path) or any(os.path.getmtime(meta_path) < os.path.getmtime(path) for path in [GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['model'], REFERENCE_CORPUS_PATH]):
+			logging.warning(f'{model_name}模型的软余弦相似度索引不存在或已过期, 重新构建: {index_path}')
+			return self.build_similarity_index(model_name=model_name, export_path=index_path, model=model)
+		return SoftCosineIndex.load(index_path, num_best=self.args.num_best)
+
+	@timer
+	def build_similarity_index(self, model_name, export_path=None, model=None):
+		"""
+		构建模型的软余弦相似度索引并保存: 分词相似度矩阵只在这里计算一次, 之后查询时以内存映射方式加载
+		:param model_name	: 模型名称
+		:param export_path	: 索引保存路径, 默认为GENSIM_EMBEDDING_MODEL_SUMMARY中的index字段
+		:param model		: 已经加载的模型, 默认从GENSIM_EMBEDDING_MODEL_SUMMARY中的model字段加载
+		"""
+		if export_path is None:
+			export_path = GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['index']
+		if model is None:
+			model = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['class']).load(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['model'])
+		dictionary = Dictionary.load(REFERENCE_DICTIONARY_PATH)
+		
+		# 按字典编号排列的词向量矩阵: 与gensim的WordEmbeddingSimilarityIndex一致, 只使用模型词汇表中的分词, 其余分词只与自身相似
+		keyedvectors = model.wv
+		vocabulary = keyedvectors.key_to_index if hasattr(keyedvectors, 'key_to_index') else keyedvectors.vocab
+		vectors = numpy.zeros((len(dictionary), keyedvectors.vector_size), dtype=numpy.float32)
+		for token, token_id in dictionary.token2id.items():
+			if token in vocabulary:
+				vectors[token_id] = keyedvectors[token]
+		term_similarity = SoftCosineIndex.build_term_similarity(vectors, 
+																nonzero_limit=self.args.nonzero_limit_term_similarity, 
+																threshold=self.args.threshold_term_similarity, 
+																exponent=self.args.exponent_term_similarity, 
+																approximate=self.args.approximate_term_similarity)
+		similarity = SoftCosineIndex.from_corpus(MmCorpus(REFERENCE_CORPUS_PATH), term_similarity=term_similarity, num_best=self.args.num_best)
+		similarity.save(export_path)
+		return similarity
+
+	def query(self, query_tokens, dictionary, similarity):
+		"""
+		给定查询分词列表返回相似度匹配向量
+		:param query_tokens	: 需要查询的关键词分词列表
+		:param dictionary	: gensim字典
+		:param similarity	: 相似度索引
+		:return result		: 文档中每个段落的匹配分值
+		"""
+		return self.batch_query(query_token_lists=[query_tokens], dictionary=dictionary, similarity=similarity)[0]
+
+	def batch_query(self, query_token_lists, dictionary, similarity, return_arrays=False):
+		"""
+		批量查询: 软余弦相似度索引将所有查询组成一个稀疏矩阵分块计算, 近似最近邻索引将所有查询的段落向量一次性检索
+		:param query_token_lists	: 查询分词列表的列表
+		:param dictionary			: gensim字典
+		:param similarity			: build_similarity的返回值
+		:param return_arrays		: 是否直接返回select_top_k形式的(indices, values)数组, 仅对软余弦相似度索引与近似最近邻索引有效
+		:return results				: 与query的返回值形式相同的结果列表, 每个查询一个
+		"""
+		if isinstance(similarity, (IVFPQIndex, SoftCosineIndex)):
+			indices, values = similarity.batch_query(self.build_query_matrix(query_token_lists=query_token_lists, dictionary=dictionary, similarity=similarity))
+			if return_arrays:
+				return indices, values
+			return to_query_results(indices, values)
+		if self.args.filter_stopword:
+			query_token_lists = [filter_stopwords(tokens=query_tokens, stopwords=self.stopwords) for query_tokens in query_token_lists]
+		return [similarity[dictionary.doc2bow(query_tokens)] for query_tokens in query_token_lists]
+
+	def build_query_matrix(self, query_token_lists, dictionary, similarity):
+		"""
+		将查询分词列表转为相似度索引的查询矩阵
+		:param query_token_lists	: 查询分词列表的列表
+		:param dictionary			: gensim字典
+		:param similarity			: build_similarity的返回值, 近似最近邻索引用infer_vector推断段落向量, 软余弦相似度索引使用词频向量
+		:return query_matrix		: 二维numpy数组或CSR矩阵, 每行一个查询
+		"""
+		if self.args.filter_stopword:
+			query_token_lists = [filter_stopwords(tokens=query_tokens, stopwords=self.stopwords) for query_tokens in query_token_lists]
+		if isinstance(similarity, IVFPQIndex):
+			return numpy.stack([numpy.asarray(similarity.infer_vector(query_tokens), dtype=numpy.float32) for query_tokens in query_token_lists])
+		return corpus_to_csr([dictionary.doc2bow(query_tokens) for query_tokens in query_token_lists], num_features=similarity.num_features)
+
+	@timer
+	def build_embedding_matrix(self, model_name, export_path=None, token2id_import_path=REFERENCE_TOKEN2ID_PATH):
+		"""
+		导出按token2id编号排列的词向量矩阵: 第i行为编号为i的分词的词向量, PAD, UNK与不在模型词汇表中的分词为零向量
+		有oov_vocabulary字段的模型(FastText)由字符n-gram计算不在模型词汇表中的分词的词向量, 并把oov_vocabulary中不在token2id中的分词(题库分词)依次追加在矩阵之后
+		所有分词的词向量只在这里计算一次, 数据集只需保存分词编号, 问答模型由该矩阵初始化词嵌入层, 之后不再需要n-gram计算
+		:param model_name			: 模型名称, 要求GENSIM_EMBEDDING_MODEL_SUMMARY中有matrix字段
+		:param export_path			: 矩阵保存路径, 默认为GENSIM_EMBEDDING_MODEL_SUMMARY中的matrix字段
+		:param token2id_import_path	: 分词编号文件
+		:return matrix				: 形状为(n_tokens + n_oov_tokens, vector_size)的数组, 存储类型为dtype_embedding_matrix
+		"""
+		summary = GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]
+		if export_path is None:
+			export_path = summary['matrix']
+		keyedvectors = eval(summary['class']).load(summary['model']).wv
+		vocabulary = keyedvectors.key_to_index if hasattr(keyedvectors, 'key_to_index') else keyedvectors.vocab
+		token2id = load_token2id(token2id_import_path)
+		oov_tokens = []
+		if summary.get('oov_vocabulary') is not None:
+			known_tokens = set(token2id)
+			for token in pandas.read_csv(summary['oov_vocabulary'], sep='\t', header=0, keep_default_na=False)['token']:	# 按词频降序追加
+				if token not in known_tokens:
+					known_tokens.add(token)
+					oov_tokens.append(token)
+		n_tokens = len(token2id)
+		matrix = numpy.zeros((n_tokens + len(oov_tokens), keyedvectors.vector_size), dtype=self.args.dtype_embedding_matrix)
+		n_found, n_ngram = 0, 0
+		for token, token_id in zip(list(token2id.keys()) + oov_tokens, list(token2id.values()) + list(range(n_tokens, n_tokens + len(oov_tokens)))):
+			if token in TOKEN2ID:
+				continue
+			if token in vocabulary:
+				matrix[token_id] = keyedvectors[token]
+				n_found += 1
+			elif summary.get('oov_vocabulary') is not None:
+				try:
+					matrix[token_id] = keyedvectors[token]								# 由字符n-gram的词向量计算
+					n_ngram += 1
+				except KeyError:														# 没有任何字符n-gram时保持零向量
+					pass
+		logging.info(f'{model_name}模型的词向量矩阵: {n_found}/{matrix.shape[0]}个分词在模型词汇表中, {n_ngram}个分词由字符n-gram计算, 追加{len(oov_tokens)}个题库分词')
+		save_arrays(export_path, 
+					arrays={'matrix': matrix, 'oov_tokens': numpy.array(oov_tokens, dtype=str)}, 
+					meta={'model_name': model_name, 'dtype': self.args.dtype_embedding_matrix, 'shape': list(matrix.shape), 'n_tokens': n_tokens})
+		return matrix
+
+	def load_embedding_matrix(self, model_name, return_oov_tokens=False):
+		"""
+		加载按token2id编号排列的词向量矩阵: 以内存映射方式只读加载, 矩阵缺失, 存储类型不一致或早于模型, 分词编号文件与oov_vocabulary时重新导出
+		:param model_name			: 模型名称
+		:param return_oov_tokens	: 是否同时返回追加在矩阵之后的分词数组, 第i个分词的编号为len(token2id) + i
+		"""
+		summary = GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]
+		export_path = summary['matrix']
+		meta_path = os.path.join(export_path, 'meta.json')
+		dependencies = [summary['model'], REFERENCE_TOKEN2ID_PATH] + ([summary['oov_vocabulary']] if summary.get('oov_vocabulary') is not None else [])
+		meta = None
+		if os.path.exists(meta_path) and all(os.path.getmtime(meta_path) >= os.path.getmtime(path) for path in dependencies):
+			arrays, meta = load_arrays(export_path, mmap_mode='r')
+		if meta is None or meta['dtype'] != self.args.dtype_embedding_matrix:
+			logging.warning(f'{model_name}模型的词向量矩阵不存在或已过期, 重新导出: {export_path}')
+			self.build_embedding_matrix(model_name=model_name, export_path=export_path)
+			arrays, meta = load_arrays(export_path, mmap_mode='r')
+		if return_oov_tokens:
+			return arrays['matrix'], arrays.get('oov_tokens', numpy.zeros((0, ), dtype=str))
+		return arrays['matrix']
+
+	@timer
+	def infer_vectors(self, token_lists, model_name='doc2vec', model=None, chunksize=256):
+		"""
+		批量推断文档向量: infer_workers_doc2vec大于1时分块在进程池中推断, 子进程以内存映射方式只读加载模型, 共享同一份模型参数
+		每个文档推断前都用seed_doc2vec重置随机数生成器, 并行与串行推断的结果一致
+		:param token_lists	: 分词列表的列表
+		:param model_name	: 模型名称, 即GENSIM_EMBEDDING_MODEL_SUMMARY的键
+		:param model		: 已经加载的模型, 只用于当前进程中推断, 默认从GENSIM_EMBEDDING_MODEL_SUMMARY中的model字段加载
+		:param chunksize	: 每个子进程任务推断的文档数
+		:return vectors		: 形状为(len(token_lists), vector_size)的float32数组
+		"""
+		model_path = GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['model']
+		n_workers = os.cpu_count() if self.args.infer_workers_doc2vec is None else self.args.infer_workers_doc2vec
+		chunks = [token_lists[i: i + chunksize] for i in range(0, len(token_lists), chunksize)]
+		if n_workers > 1 and len(chunks) > 1:
+			with multiprocessing.Pool(processes=min(n_workers, len(chunks)), initializer=_initialize_doc2vec_worker, initargs=(model_path, )) as pool:
+				results = pool.starmap(infer_doc2vec_vectors, [(chunk, self.args.seed_doc2vec) for chunk in chunks])	# starmap保证返回结果的顺序与分块顺序一致
+			return numpy.vstack(results)
+		model = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['class']).load(model_path, mmap='r') if model is None else model
+		return infer_doc2vec_vectors(token_lists, seed=self.args.seed_doc2vec, model=model)
+
+	def build_reference_vectors(self, model_name='doc2vec', document_import_path=REFERENCE_DOCUMENT_PATH, export_path=REFERENCE_DOC2VEC_VECTOR_PATH):
+		"""
+		参考书目文档每个段落的文档向量: 段落在训练时以段落编号为标签, 模型训练之后文档没有变化时直接使用模型中的段落向量
+		文档在模型训练之后有变化(如增量更新)时批量推断所有段落并保存, 之后以内存映射方式加载, 直到文档或模型再次变化
+		:param model_name			: 模型名称
+		:param document_import_path	: 参考书目文档
+		:param export_path			: 重新推断的段落向量保存路径
+		:return vectors				: 形状为(n_paragraphs, vector_size)的数组, 第i行为第i个段落的文档向量
+		"""
+		model_path = GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['model']
+		model = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]['class']).load(model_path, mmap='r')
+		docvecs = model.dv if hasattr(model, 'dv') else model.docvecs
+		vectors = docvecs.vectors if hasattr(docvecs, 'vectors') else docvecs.vectors_docs
+		document = load_reference_document(document_import_path)
+		if vectors.shape[0] == len(document) and os.path.getmtime(model_path) >= os.path.getmtime(document_import_path):
+			return vectors
+		meta_path = os.path.join(export_path, 'meta.json')
+		if os.path.exists(meta_path) and all(os.path.getmtime(meta_path) >= os.path.getmtime(path) for path in [model_path, document_import_path]):
+			return load_arrays(export_path, mmap_mode='r')[0]['vectors']
+		logging.warning(f'参考书目文档在{model_name}模型训练之后有变化, 重新推断所有段落的文档向量: {export_path}')
+		vectors = self.infer_vectors(list(document), model_name=model_name, model=model)
+		save_arrays(export_path, arrays={'vectors': vectors}, meta={'model_name': model_name, 'seed': self.args.seed_doc2vec})
+		return vectors
+
+	@timer
+	def build_doc2vec_model(self, 
+							corpus_import_path=REFERENCE_LINE_SENTENCE_PATH, 
+							document_import_path=REFERENCE_DOCUMENT_PATH, 
+							model_export_path=REFERENCE_DOC2VEC_MODEL_PATH):
+		"""
+		2021/12/27 14:21:10 构建Doc2Vec模型
+		use_corpus_file时用LineSentence格式的语料文件训练, 以行号作为段落标签, 与TaggedDocumentStream的段落编号一致, 否则从参考书目文档流式读取
+		"""
+		kwargs = {
+			'vector_size': self.args.size_doc2vec,
+			'min_count': self.args.min_count_doc2vec,
+			'window': self.args.window_doc2vec,
+			'workers': self.args.workers_doc2vec,
+		}
+		if self.args.use_corpus_file:
+			GensimEmbeddingModel.prepare_corpus_file(corpus_import_path=corpus_import_path, document_import_path=document_import_path)
+			model = Doc2Vec(corpus_file=corpus_import_path, **kwargs)
+		else:
+			model = Doc2Vec(documents=TaggedDocumentStream(load_reference_document(document_import_path)), **kwargs)
+		if model_export_path is not None:
+			model.save(model_export_path)
+		return model
+
+
+class BertVectorCache:
+	"""
+	BERT文档向量的磁盘缓存: 以文本的sha1摘要为键, 池化后的向量以float16矩阵保存, 加载时以内存映射方式只读加载
+	新编码的向量先保存在内存中, 调用save时与已有向量合并后整体写入
+	"""
+	def __init__(self, keys, vectors, meta=None):
+		"""
+		:param keys		: 形状为(n_texts, )的sha1摘要(十六进制)数组, dtype为S40
+		:param vectors	: 形状为(n_texts, d)的float16数组
+		:param meta		: 生成向量的配置, 包括模型名称, bert_output与最大长度, 配置不一致的缓存不能复用
+		"""
+		self.keys = keys
+		self.vectors = vectors
+		self.meta = {} if meta is None else dict(meta)
+		self.key2row = {key: row for row, key in enumerate(keys.tolist())}
+		self.new_keys = []
+		self.new_vectors = []
+
+	@classmethod
+	def hash_text(cls, text):
+		return hashlib.sha1(text.encode('utf8')).hexdigest().encode('ascii')
+
+	@classmethod
+	def load(cls, import_path, meta=None, mmap_mode='r'):
+		"""加载缓存: 缓存不存在或与meta不一致时返回空缓存"""
+		if os.path.exists(os.path.join(import_path, 'meta.json')):
+			arrays, _meta = load_arrays(import_path, mmap_mode=mmap_mode)
+			_meta.pop('arrays')
+			if meta is None or all(_meta.get(key) == value for key, value in meta.items()):
+				return cls(arrays['keys'], arrays['vectors'], meta=_meta)
+			logging.warning(f'BERT文档向量缓存的配置不一致, 重新缓存: {import_path}')
+		return cls(numpy.zeros((0, ), dtype='S40'), numpy.zeros((0, 0), dtype=numpy.float16), meta=meta)
+
+	def __len__(self):
+		return len(self.key2row)
+
+	def __contains__(self, key):
+		return key in self.key2row
+
+	def add(self, keys, vectors):
+		"""添加新编码的向量, keys中不能有已缓存的键"""
+		for key in keys:
+			self.key2row[key] = len(self.key2row)
+		self.new_keys.extend(keys)
+		self.new_vectors.append(numpy.asarray(vectors, dtype=numpy.float16))
+
+	def get(self, keys):
+		"""按键读取向量, 返回形状为(len(keys), d)的float32数组"""
+		rows = numpy.array([self.key2row[key] for key in keys], dtype=numpy.int64)
+		n_cached = self.keys.shape[0]
+		d = self.vectors.shape[1] if n_cached > 0 else (self.new_vectors[0].shape[1] if self.new_vectors else 0)
+		vectors = numpy.zeros((rows.shape[0], d), dtype=numpy.float32)
+		cached = rows < n_cached
+		if cached.any():
+			vectors[cached] = self.vectors[rows[cached]]
+		if not cached.all():
+			vectors[~cached] = numpy.vstack(self.new_vectors)[rows[~cached] - n_cached]
+		return vectors
+
+	def save(self, export_path):
+		"""将新编码的向量与已有向量合并后保存: 先读入内存再释放内存映射, 使旧文件可以被替换"""
+		if not self.new_keys:
+			return
+		keys = numpy.concatenate([numpy.asarray(self.keys), numpy.array(self.new_keys, dtype='S40')])
+		vectors = numpy.vstack(([numpy.asarray(self.vectors)] if self.keys.shape[0] > 0 else []) + self.new_vectors)
+		self.keys, self.vectors, self.new_keys, self.new_vectors = keys, vectors, [], []
+		save_arrays(export_path, arrays={'keys': self.keys, 'vectors': self.vectors}, meta=self.meta)
+
+
+class TransformersEmbeddingModel:
+	"""transformers模块下的词嵌入模型"""
+	def __init__(self, args):
+		"""
+		:param args	: EmbeddingModelConfig配置
+		"""
+		self.args = deepcopy(args)		
+	
+	
+	@classmethod
+	@timer
+	def load_bert_model(cls, model_name='bert-base-chinese'):
+		assert model_name in BERT_MODEL_SUMMARY		
+		tokenizer = BertTokenizer(BERT_MODEL_SUMMARY[model_name]['vocab'])
+		model = BertModel.from_pretrained(BERT_MODEL_SUMMARY[model_name]['root'])
+		model.eval()
+		return tokenizer, model
+	
+	@classmethod
+	def load_bert_config(cls, model_name='bert-base-chinese'):
+		assert model_name in BERT_MODEL_SUMMARY		
+		config = json.load(open(BERT_MODEL_SUMMARY[model_name]['config'], 'r', encoding='utf8'))
+		return config
+	
+	def generate_bert_output(self, text, tokenizer, model, max_length=512):
+		encoded_input = tokenizer(text, return_tensors='pt', padding=True, truncation=True, max_length=max_length)
+		output = model(**encoded_input)
+		return output.get(self.args.bert_output)
+
+	def pool_bert_output(self, output, attention_mask):
+		"""
+		将BERT模型的输出池化为每个文本一个向量: pooler_output直接使用, last_hidden_state对非填充位置取平均
+		:param output			: BertModel的输出
+		:param attention_mask	: 形状为(batch_size, seq_len)的掩码
+		:return pooled_output	: 形状为(batch_size, hidden_size)的张量
+		"""
+		if self.args.bert_output == 'pooler_output':
+			return output.get('pooler_output')
+		if self.args.bert_output == 'last_hidden_state':
+			mask = attention_mask.unsqueeze(-1).to(output.get('last_hidden_state').dtype)
+			return (output.get('last_hidden_state') * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+		raise NotImplementedError(f'不支持的BERT输出: {self.args.bert_output}')
+
+	def load_bert_cache(self, model_name='bert-base-chinese', max_length=512):
+		"""加载模型名称与bert_output对应的文档向量缓存"""
+		meta = {'model_name': model_name, 'bert_output': self.args.bert_output, 'max_length': max_length}
+		return BertVectorCache.load(BERT_VECTOR_CACHE_PATH.format(model_name, self.args.bert_output), meta=meta)
+
+	def encode_texts(self, texts, tokenizer, model, cache=None, max_length=512):
+		"""
+		批量编码文本为池化后的文档向量: 未缓存的文本去重后按长度排序, 每批文本长度接近使填充最少, 在inference_mode下编码不记录梯度
+		:param texts		: 文本列表
+		:param tokenizer	: BertTokenizer
+		:param model		: BertModel
+		:param cache		: BertVectorCache, 已缓存的文本直接读取, 新编码的向量会加入缓存(需要调用cache.save才能写入磁盘), 默认不使用缓存
+		:param max_length	: 截断的最大长度
+		:return vectors		: 形状为(len(texts), hidden_size)的float32数组, 与texts顺序一致
+		"""
+		cache = BertVectorCache(numpy.zeros((0, ), dtype='S40'), numpy.zeros((0, 0), dtype=numpy.float16)) if cache is None else cache
+		keys = [BertVectorCache.hash_text(text) for text in texts]
+		key2text = {key: text for key, text in zip(keys, texts) if key not in cache}
+		if key2text:
+			if self.args.n_threads_bert is not None:
+				torch.set_num_threads(self.args.n_threads_bert)
+			new_keys = sorted(key2text.keys(), key=lambda key: len(key2text[key]))
+			inference_mode = torch.inference_mode if hasattr(torch, 'inference_mode') else torch.no_grad
+			with inference_mode():
+				for start in range(0, len(new_keys), self.args.batch_size_bert):
+					batch_keys = new_keys[start: start + self.args.batch_size_bert]
+					encoded_input = tokenizer([key2text[key] for key in batch_keys], return_tensors='pt', padding=True, truncation=True, max_length=max_length)
+					output = model(**encoded_input)
+					cache.add(batch_keys, self.pool_bert_output(output, encoded_input['attention_mask']).float().numpy())
+			logging.info(f'BERT模型编码了{len(new_keys)}个文本, 缓存中共有{len(cache)}个文本')
+		return cache.get(keys)
+
+	@timer
+	def build_bert_cache(self, model_name='bert-base-chinese', filepaths=None, reference_path=REFERENCE_PATH):
+		"""
+		编码题库与参考书目文档的所有文本并写入文档向量缓存: 在预处理阶段调用一次, 之后生成数据集时直接读取缓存
+		文本与Dataset中的一致, 即题干, 选项与参考书目段落的分词列表拼接成的字符串
+		:param model_name		: 模型名称
+		:param filepaths		: 预处理后的题库文件, 默认为所有数据集划分的文件
+		:param reference_path	: 预处理后的参考书目文档
+		"""
+		if filepaths is None:
+			filepaths = sorted(set(filepath for _filepaths in DATASET_SPLIT_PATHs.values() for filepath in _filepaths))
+		tokenizer, model = self.load_bert_model(model_name=model_name)
+		max_length = self.load_bert_config(model_name=model_name)['max_position_embeddings']
+		cache = self.load_bert_cache(model_name=model_name, max_length=max_length)
+		texts = []
+		for filepath in filepaths:
+			if os.path.exists(filepath):
+				dataframe = load_preprocessed_dataframe(filepath, columns=['statement', 'option_a', 'option_b', 'option_c', 'option_d'])
+				texts.extend(''.join(tokens) for column in dataframe.columns for tokens in dataframe[column])
+		texts.extend(''.join(tokens) for tokens in load_preprocessed_dataframe(reference_path, columns=['content'])['content'])
+		self.encode_texts(texts, tokenizer=tokenizer, model=model, cache=cache, max_length=max_length)
+		cache.save(BERT_VECTOR_CACHE_PATH.format(model_name, self.args.bert_output))
+		return cache
+		
+	
@@ -17,20 +17,20 @@ from setting import *
 from src.graph_tools import *
 
 
-from src.data_tools import load_stopwords, filter_stopwords
+from src.data_tools import load_stopwords, filter_stopwords, load_preprocessed_dataframe
 from src.utils import load_args, timer
 
 
 # 2022/01/02 20:14:05 ƲͬĴ, ȥͣô, 浽TEMP_DIR
 @timer
 def plot_reference_wordcloud():
-	reference_dataframe = pandas.read_csv(REFERENCE_PATH, sep='\t', header=0)
+	reference_dataframe = load_preprocessed_dataframe(REFERENCE_PATH, columns=['law', 'content'])
 	stopwords = load_stopwords(stopword_names=None)
 	for law, group_dataframe in reference_dataframe.groupby(['law']):
 		group_dataframe = group_dataframe.reset_index(drop=True)
 		contents = []
 		for i in range(group_dataframe.shape[0]):
-			content = ' '.join(filter_stopwords(tokens=eval(group_dataframe.loc[i, 'content']), stopwords=stopwords))
+			content = ' '.join(filter_stopwords(tokens=group_dataframe.loc[i, 'content'], stopwords=stopwords))
 			contents.append(content)
 		text = '\n'.join(contents)
 		wordcloud = WordCloud().generate(text=text)
@@ -1,278 +1,1939 @@
-# -*- coding: utf-8 -*- 
-# @author : caoyang
-# @email: caoyang@163.sufe.edu.cn
-# 用于检索题目对应文档的模型
-
-if __name__ == '__main__':
-	import sys
-	sys.path.append('../')
-
-import time
-import numpy
-import jieba
-import pandas
-import gensim
-import pickle
-
-from copy import deepcopy
-from gensim.corpora import MmCorpus, Dictionary
-from gensim.similarities import Similarity
-
-from setting import *
-
-from src.data_tools import load_stopwords, filter_stopwords
-from src.utils import timer
-
-class GensimRetrievalModel:
-	"""gensim模块下的文档检索模型"""
-	def __init__(self, args, **kwargs):
-		"""
-		:param args	: EmbeddingModelConfig配置
-		"""
-		self.args = deepcopy(args)
-		
-		if self.args.filter_stopword:
-			self.stopwords = load_stopwords(stopword_names=None)
-	
-	@timer
-	def build_reference_corpus(self, 
-							   reference_path=REFERENCE_PATH, 
-							   dictionary_export_path=REFERENCE_DICTIONARY_PATH, 
-							   corpus_export_path=REFERENCE_CORPUS_PATH,
-							   document_export_path=REFERENCE_DOCUMENT_PATH):
-		"""
-		构建参考书目语料(corpus), 在gensim模块下指词频矩阵与字典
-		:param reference_path			: 预处理得到的参考书目CSV文件
-		:param dictionary_export_path	: gensim字典导出路径
-		:param corpus_export_path		: gensim语料导出路径
-		:param stopwords				: 停用词列表
-		:return corpus					: gensim模块下的语料, 即为分词词频矩阵
-		:return dictionary				: gensim模块下的字典, 即为分词索引
-		"""													
-		reference_dataframe = pandas.read_csv(reference_path, sep='\t', header=0, dtype=str)	# 读取处理后的参考书目CSV文件
-		reference_dataframe = reference_dataframe.fillna('')									# 参考书目的section字段存在缺失, 可使用空字符串填充
-		
-		# 将参考书目文档中的每一行段落的分词列表都存入document中
-		document = []
-		for i in range(reference_dataframe.shape[0]):
-			section = reference_dataframe.loc[i, 'section']
-			content = eval(reference_dataframe.loc[i, 'content'])
-			paragraph = jieba.lcut(section) + content 						# 要把小节名称作为文档段落内容: 因为数据预处理时把小节名称从文档段落中分离出来了
-			if self.args.filter_stopword:									# 过滤停用词一定程度上可以提升模型性能
-				paragraph = filter_stopwords(tokens=paragraph, stopwords=self.stopwords)
-			document.append(paragraph)
-		dictionary = Dictionary(document)									# 生成字典: 分词索引
-		corpus = [dictionary.doc2bow(paragraph) for paragraph in document]	# 生成语料: 分词词频矩阵
-		if dictionary is not None:
-			dictionary.save(dictionary_export_path)							# 保存生成的字典
-		if corpus_export_path is not None:
-			MmCorpus.serialize(corpus_export_path, corpus)					# 保存生成的语料
-		if document_export_path is not None:
-			pickle.dump(document, open(document_export_path, 'wb'))
-		return corpus, dictionary, document
-
-	@timer
-	def build_tfidf_model(self, 
-						  corpus_import_path=REFERENCE_CORPUS_PATH,
-						  model_export_path=REFERENCE_TFIDF_MODEL_PATH,
-						  corpus_export_path=REFERENCE_CORPUS_TFIDF_PATH):
-		"""构建TFIDF模型并利用TFIDF模型生成新的TFIDF指数权重矩阵"""
-		kwargs = {
-			'dictionary': None,
-			'normalize'	: True,
-			'smartirs'	: self.args.smartirs_tfidf,
-			'pivot'		: self.args.pivot_tfidf,
-			'slope'		: self.args.slope_tfidf,
-		}
-		return GensimRetrievalModel.easy_build_model(model_name='tfidf',
-													corpus_import_path=corpus_import_path,
-													model_export_path=model_export_path,
-													corpus_export_path=corpus_export_path,
-													**kwargs)
-	
-	@timer
-	def build_lsi_model(self, 
-						corpus_import_path=REFERENCE_CORPUS_TFIDF_PATH,
-						model_export_path=REFERENCE_LSI_MODEL_PATH,
-						corpus_export_path=REFERENCE_CORPUS_LSI_PATH):
-		"""构建LSI模型并利用LSI模型生成新的LSI指数权重矩阵"""
-
-		kwargs = {
-			'num_topics'	: self.args.num_topics_lsi,
-			'chunksize'		: 20000,
-			'decay'			: self.args.decay_lsi,						# 旧样本的衰减
-			'distributed'	: False,									# 分布式计算
-			'onepass'		: True,										# 设为False则使用每次传递多个的随机算法
-			'power_iters'	: self.args.power_iters_lsi,				# 提升power_iters会增加模型精确性, 但是性能会下降
-			'extra_samples'	: self.args.extra_samples_lsi,				# 除秩k外还可使用的样本数量, 可以提升精确性
-			'dtype'			: numpy.float64,
-		}
-		return GensimRetrievalModel.easy_build_model(model_name='lsi',
-													corpus_import_path=corpus_import_path,
-													model_export_path=model_export_path,
-													corpus_export_path=corpus_export_path,
-													**kwargs)
-	
-	@timer
-	def build_lda_model(self, 
-						corpus_import_path=REFERENCE_CORPUS_TFIDF_PATH,
-						model_export_path=REFERENCE_LDA_MODEL_PATH,
-						corpus_export_path=REFERENCE_CORPUS_LDA_PATH):
-		"""构建LDA模型并利用LDA模型生成新的LDA指数权重矩阵"""
-		kwargs = {
-			'num_topics'			: self.args.num_topics_lda,
-			'distributed'			: False,							# 分布式计算
-			'chunksize'				: 2000,
-			'passes'				: 1,								# 训练时每次传递的样本, 可能类似批训练的batchsize
-			'update_every'			: 1,								# Number of documents to be iterated through for each update. Set to 0 for batch learning, > 1 for online iterative learning.
-			'alpha'					: 'symmetric',						# topics的优先级, 默认symmetric是等权, asymmetric是降序, 也可以传入num_topics长度的优先级向量
-			'eta'					: None,								# 类似alpha的一个参数
-			'decay'					: self.args.decay_lda,				# 范围是0.5-1.0
-			'offset'				: 1.,
-			'eval_every'			: 10,
-			'iterations'			: self.args.iterations_lda,			# 最大迭代次数
-			'gamma_threshold'		: self.args.gamma_threshold_lda,	# gamma参数的最小变化值, 类似某种步长
-			'minimum_probability'	: self.args.minimum_probability_lda,# 小于该数值的topic会被过滤掉
-			'random_state'			: None,
-			'ns_conf'				: None,								# 只有在distributed为True时生效
-			'minimum_phi_value'		: .01,								# 只有在per_word_topics为True时生效
-			'per_word_topics'		: False,							# If True, the model also computes a list of topics, sorted in descending order of most likely topics for each word, along with their phi values multiplied by the feature length (i.e. word count).
-			'callbacks'				: None,								# 评估指标
-			'dtype'					: numpy.float32
-		}
-		return GensimRetrievalModel.easy_build_model(model_name='lda',
-													corpus_import_path=corpus_import_path,
-													model_export_path=model_export_path,
-													corpus_export_path=corpus_export_path,
-													**kwargs)
-	
-	@timer
-	def build_hdp_model(self, 
-						corpus_import_path=REFERENCE_CORPUS_TFIDF_PATH,
-						model_export_path=REFERENCE_HDP_MODEL_PATH,
-						corpus_export_path=REFERENCE_CORPUS_HDP_PATH):
-		"""构建HDP模型并利用HDP模型生成新的HDP指数权重矩阵"""
-		kwargs = {
-			'max_chunks'	: None,
-			'max_time'		: None,
-			'chunksize'		: 256,
-			'kappa'			: self.args.kappa_hdp,						# Learning parameter which acts as exponential decay factor to influence extent of learning from each batch.
-			'tau'			: self.args.tau_hdp,						# Learning parameter which down-weights early iterations of documents.
-			'K'				: self.args.K_hdp,							# Second level truncation level
-			'T'				: self.args.T_hdp,							# Top level truncation level
-			'alpha'			: 1,										# Second level concentration, 这个参数是跟topic优先度有关的, 默认平权
-			'gamma'			: 1,										# First level concentration, 这个参数也是跟topic优先度有关的, 默认平权
-			'eta'			: .01,										# The topic Dirichlet
-			'scale'			: 1.,										# Weights information from the mini-chunk of corpus to calculate rhot.
-			'var_converge'	: .0001,									# Lower bound on the right side of convergence. Used when updating variational parameters for a single document.
-			'outputdir'		: None,
-			'random_state'	: None,
-		}
-		return GensimRetrievalModel.easy_build_model(model_name='hdp',
-													corpus_import_path=corpus_import_path,
-													model_export_path=model_export_path,
-													corpus_export_path=corpus_export_path,
-													**kwargs)
-	
-	@timer
-	def build_logentropy_model(self,
-							   corpus_import_path=REFERENCE_CORPUS_TFIDF_PATH, 
-							   model_export_path=REFERENCE_LOGENTROPY_MODEL_PATH,
-							   corpus_export_path=REFERENCE_CORPUS_LOGENTROPY_PATH):
-		"""构建LogEntropy模型并利用ogEntropy模型生成新的LDA指数权重矩阵"""
-		kwargs = {
-			'normalize': True,
-		}
-		return GensimRetrievalModel.easy_build_model(model_name='logentropy',
-													corpus_import_path=corpus_import_path,
-													model_export_path=model_export_path,
-													corpus_export_path=corpus_export_path,
-													**kwargs)
-
-	@classmethod
-	def validate_corpus_import_path(cls, corpus_import_path, model_name):
-		"""检查模型构建函数的参数corpus_import_path的合法性"""
-		sequence_length = len(GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['sequence'])
-		if sequence_length == 1:
-			assert corpus_import_path == REFERENCE_CORPUS_PATH
-		elif sequence_length == 2:
-			assert corpus_import_path == GENSIM_RETRIEVAL_MODEL_SUMMARY[GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['sequence'][0]]['corpus']
-		else:
-			raise NotImplementedError('目前不考虑模型序列长度超过2的情形')
-	
-	@classmethod
-	def easy_build_model(cls,
-						 model_name,
-						 corpus_import_path,
-						 model_export_path=None,
-						 corpus_export_path=None,
-						 *args, **kwargs):
-		"""
-		20211210更新: 统一的模型构建方法
-		:param model_name	: 模型名称
-		:param corpus_import_path		: gensim语料导入路径
-		:param dictionary_import_path	: gensim字典导入路径
-		:param model_export_path		: 模型保存路径
-		"""
-		GensimRetrievalModel.validate_corpus_import_path(corpus_import_path=corpus_import_path, model_name=model_name)
-		corpus = MmCorpus(corpus_import_path)
-		
-		# 20211212更新: 意外发现LogEntropy模型的构造参数里没有id2word, 因此将setting.py中GENSIM_MODEL_SUMMARY里对应的dictionary字段修正为None
-		dictionary_import_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['dictionary']
-		if GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['dictionary'] is None:
-			model = eval(GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['class'])(corpus, **kwargs)	
-		else:
-			dictionary = Dictionary.load(dictionary_import_path)
-			model = eval(GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['class'])(corpus, id2word=dictionary, **kwargs)			
-		corpus = [model[doc] for doc in corpus]																# 转换为模型指数矩阵语料
-		if model_export_path is not None:
-			model.save(model_export_path)																	# 保存模型
-		if corpus_export_path is not None:
-			MmCorpus.serialize(corpus_export_path, corpus)													# 保存模型生成的新语料
-		return model, corpus
-
-	@classmethod
-	def load_sequence(cls, model_name):
-		"""加载模型序列"""
-		sequence = []
-		for _model_name in GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['sequence']:
-			load_function = eval(GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['class']).load
-			model_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['model']
-			model = load_function(model_path)
-			sequence.append(model)
-		return sequence
-
-	@timer
-	def build_similarity(self, model_name):
-		"""构建模型的gensim相似度(Similarity)"""
-		dictionary_import_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['dictionary']
-		if dictionary_import_path is None:
-			dictionary_import_path = REFERENCE_DICTIONARY_PATH
-		dictionary = Dictionary.load(dictionary_import_path)
-		corpus_import_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['corpus']
-		corpus = MmCorpus(corpus_import_path)
-		similarity = Similarity('gensim_similarity', corpus, num_features=len(dictionary), num_best=self.args.num_best)
-		return similarity
-
-	def query(self, query_tokens, dictionary, similarity, sequence):
-		"""
-		给定查询分词列表返回相似度匹配向量
-		:param query_tokens	: 需要查询的关键词分词列表
-		:param dictionary	: gensim字典
-		:param similarity	: gensim相似度
-		:param sequence		: 模型序列
-		:return result		: 文档中每个段落的匹配分值
-		"""
-		if self.args.filter_stopword:
-			filter_stopwords(tokens=query_tokens, stopwords=self.stopwords)
-		query_corpus = dictionary.doc2bow(query_tokens)
-		for model in sequence:
-			query_corpus = model[query_corpus]
-		result = similarity[query_corpus]
-		return result
-		
-
-class NeuralRetrieveModel:
-	"""基于神经网络模型的文档检索"""
-	pass
-
+# -*- coding: utf-8 -*- 
+# @author : caoyang
+# @email: caoyang@163.sufe.edu.cn
+# 用于检索题目对应文档的模型
+
+if __name__ == '__main__':
+	import sys
+	sys.path.append('../')
+
+import os
+import time
+import numpy
+import logging
+import jieba
+import pandas
+import gensim
+import pickle
+import torch
+
+from copy import deepcopy
+from scipy import sparse
+from gensim.corpora import MmCorpus, Dictionary
+from gensim.matutils import Sparse2Corpus
+from gensim.models import TfidfModel, LsiModel
+from gensim.utils import is_corpus, identity
+from torch.nn import Module, EmbeddingBag, Linear, functional as F
+
+from setting import *
+from config import EmbeddingModelConfig
+
+from src.data_tools import load_stopwords, filter_stopwords, load_preprocessed_dataframe, iterate_reference_paragraphs, export_token_stream, splice_token_store, load_reference_document, load_reference_subjects, TokenColumn
+from src.retrieval_tools import corpus_to_csr, normalize_rows, resize_columns, select_top_k, select_top_k_sparse, to_query_results, candidate_inner_products, vote_subjects, token_column_to_csr, scatter_rows, save_arrays, load_arrays, kmeans, assign_nearest
+from src.torch_tools import save_checkpoint
+from src.utils import load_args, timer
+
+class GensimRetrievalModel:
+	"""gensim模块下的文档检索模型"""
+	def __init__(self, args, **kwargs):
+		"""
+		:param args	: EmbeddingModelConfig配置
+		"""
+		self.args = deepcopy(args)
+		
+		if self.args.filter_stopword:
+			self.stopwords = load_stopwords(stopword_names=None)
+	
+	@timer
+	def build_reference_corpus(self, 
+							   reference_path=REFERENCE_PATH, 
+							   dictionary_export_path=REFERENCE_DICTIONARY_PATH, 
+							   corpus_export_path=REFERENCE_CORPUS_PATH,
+							   document_export_path=REFERENCE_DOCUMENT_PATH):
+		"""
+		构建参考书目语料(corpus), 在gensim模块下指词频矩阵与字典: 全程流式处理, 内存占用与参考书目的规模无关
+		先逐个段落分词并过滤停用词, 写入document_export_path的二进制列式存储, 之后字典与语料都从该存储中逐个段落读取构建
+		:param reference_path			: 预处理得到的参考书目CSV文件
+		:param dictionary_export_path	: gensim字典导出路径
+		:param corpus_export_path		: gensim语料导出路径
+		:param document_export_path		: 参考书目文档(过滤停用词后的段落分词列表)导出路径, 词嵌入模型训练时也会流式读取该文档
+		:return corpus					: gensim模块下的语料, 即为分词词频矩阵
+		:return dictionary				: gensim模块下的字典, 即为分词索引
+		:return document				: 参考书目文档, 可以重复迭代的段落分词列表
+		"""
+		paragraphs = iterate_reference_paragraphs(reference_path=reference_path, stopwords=self.stopwords if self.args.filter_stopword else None)	# 过滤停用词一定程度上可以提升模型性能
+		if document_export_path is not None:
+			export_token_stream(paragraphs, store_path=document_export_path, column='content')
+			document = load_reference_document(document_import_path=document_export_path)
+		else:
+			document = list(paragraphs)
+		dictionary = Dictionary()
+		dictionary.add_documents(document)									# 生成字典: 分词索引, 逐个段落增量添加
+		corpus = (dictionary.doc2bow(paragraph) for paragraph in document)	# 生成语料: 分词词频矩阵
+		if dictionary_export_path is not None:
+			dictionary.save(dictionary_export_path)							# 保存生成的字典
+		if corpus_export_path is not None:
+			MmCorpus.serialize(corpus_export_path, corpus)					# 流式保存生成的语料
+			corpus = MmCorpus(corpus_export_path)
+		else:
+			corpus = list(corpus)
+		return corpus, dictionary, document
+
+	@timer
+	def update_reference_corpus(self, 
+								keep_rows,
+								n_new,
+								reference_path=REFERENCE_PATH, 
+								dictionary_path=REFERENCE_DICTIONARY_PATH, 
+								corpus_path=REFERENCE_CORPUS_PATH,
+								document_path=REFERENCE_DOCUMENT_PATH):
+		"""
+		增量更新参考书目语料: 需要在src.data_tools.update_reference_csv之后调用, 参数为其返回值
+		字典中删除段落的文档频数被扣除, 新段落逐个添加, 原有分词编号保持不变(不调用compactify), 否则所有模型的特征维数都会错位
+		参考书目文档只追加新段落的分词列表, 词频矩阵直接由文档的分词编号构建, 不逐行调用doc2bow
+		:param keep_rows		: 原参考书目中保留的段落编号
+		:param n_new			: 追加在参考书目末尾的新段落数
+		:param reference_path	: 已经增量更新的参考书目CSV文件
+		:param dictionary_path	: gensim字典路径
+		:param corpus_path		: gensim语料路径
+		:param document_path	: 参考书目文档路径
+		:return matrix			: 形状为(段落数, 字典长度)的词频CSR矩阵, 与保存的语料相同
+		:return dictionary		: 更新后的gensim字典
+		:return document		: 更新后的参考书目文档
+		"""
+		document = load_reference_document(document_import_path=document_path)
+		assert isinstance(document, TokenColumn), '增量更新需要二进制列式存储的参考书目文档, 请先调用build_reference_corpus完整构建'
+		dictionary = Dictionary.load(dictionary_path)
+		for row in numpy.setdiff1d(numpy.arange(len(document)), keep_rows):
+			paragraph = document[row]
+			bow = dictionary.doc2bow(paragraph)
+			for token_id, count in bow:
+				dictionary.dfs[token_id] -= 1
+				if hasattr(dictionary, 'cfs'):
+					dictionary.cfs[token_id] -= count
+			dictionary.num_docs -= 1
+			dictionary.num_pos -= len(paragraph)
+			dictionary.num_nnz -= len(bow)
+		for token_id in [token_id for token_id, document_frequency in dictionary.dfs.items() if document_frequency <= 0]:
+			del dictionary.dfs[token_id]
+			if hasattr(dictionary, 'cfs'):
+				dictionary.cfs.pop(token_id, None)
+		paragraphs = list(iterate_reference_paragraphs(reference_path=reference_path, stopwords=self.stopwords if self.args.filter_stopword else None, start=len(keep_rows)))
+		assert len(paragraphs) == n_new, f'参考书目末尾的新段落数({len(paragraphs)})与n_new({n_new})不一致'
+		dictionary.add_documents(paragraphs)
+		splice_token_store(document_path, keep_rows=keep_rows, dataframe=pandas.DataFrame({'content': paragraphs}, columns=['content']))
+		document = load_reference_document(document_import_path=document_path)
+		matrix = token_column_to_csr(document, dictionary.token2id, num_features=len(dictionary))
+		dictionary.save(dictionary_path)
+		MmCorpus.serialize(corpus_path, Sparse2Corpus(matrix, documents_columns=False))
+		return matrix, dictionary, document
+
+	@timer
+	def build_tfidf_model(self, 
+						  corpus_import_path=REFERENCE_CORPUS_PATH,
+						  model_export_path=REFERENCE_TFIDF_MODEL_PATH,
+						  corpus_export_path=REFERENCE_CORPUS_TFIDF_PATH):
+		"""构建TFIDF模型并利用TFIDF模型生成新的TFIDF指数权重矩阵"""
+		kwargs = {
+			'dictionary': None,
+			'normalize'	: True,
+			'smartirs'	: self.args.smartirs_tfidf,
+			'pivot'		: self.args.pivot_tfidf,
+			'slope'		: self.args.slope_tfidf,
+		}
+		return GensimRetrievalModel.easy_build_model(model_name='tfidf',
+													corpus_import_path=corpus_import_path,
+													model_export_path=model_export_path,
+													corpus_export_path=corpus_export_path,
+													**kwargs)
+	
+	@timer
+	def build_lsi_model(self, 
+						corpus_import_path=REFERENCE_CORPUS_TFIDF_PATH,
+						model_export_path=REFERENCE_LSI_MODEL_PATH,
+						corpus_export_path=REFERENCE_CORPUS_LSI_PATH):
+		"""构建LSI模型并利用LSI模型生成新的LSI指数权重矩阵"""
+
+		kwargs = {
+			'num_topics'	: self.args.num_topics_lsi,
+			'chunksize'		: 20000,
+			'decay'			: self.args.decay_lsi,						# 旧样本的衰减
+			'distributed'	: False,									# 分布式计算
+			'onepass'		: True,										# 设为False则使用每次传递多个的随机算法
+			'power_iters'	: self.args.power_iters_lsi,				# 提升power_iters会增加模型精确性, 但是性能会下降
+			'extra_samples'	: self.args.extra_samples_lsi,				# 除秩k外还可使用的样本数量, 可以提升精确性
+			'dtype'			: numpy.float64,
+		}
+		return GensimRetrievalModel.easy_build_model(model_name='lsi',
+													corpus_import_path=corpus_import_path,
+													model_export_path=model_export_path,
+													corpus_export_path=corpus_export_path,
+													**kwargs)
+	
+	@timer
+	def build_lda_model(self, 
+						corpus_import_path=REFERENCE_CORPUS_TFIDF_PATH,
+						model_export_path=REFERENCE_LDA_MODEL_PATH,
+						corpus_export_path=REFERENCE_CORPUS_LDA_PATH):
+		"""构建LDA模型并利用LDA模型生成新的LDA指数权重矩阵"""
+		kwargs = {
+			'num_topics'			: self.args.num_topics_lda,
+			'distributed'			: False,							# 分布式计算
+			'chunksize'				: 2000,
+			'passes'				: 1,								# 训练时每次传递的样本, 可能类似批训练的batchsize
+			'update_every'			: 1,								# Number of documents to be iterated through for each update. Set to 0 for batch learning, > 1 for online iterative learning.
+			'alpha'					: 'symmetric',						# topics的优先级, 默认symmetric是等权, asymmetric是降序, 也可以传入num_topics长度的优先级向量
+			'eta'					: None,								# 类似alpha的一个参数
+			'decay'					: self.args.decay_lda,				# 范围是0.5-1.0
+			'offset'				: 1.,
+			'eval_every'			: 10,
+			'iterations'			: self.args.iterations_lda,			# 最大迭代次数
+			'gamma_threshold'		: self.args.gamma_threshold_lda,	# gamma参数的最小变化值, 类似某种步长
+			'minimum_probability'	: self.args.minimum_probability_lda,# 小于该数值的topic会被过滤掉
+			'random_state'			: None,
+			'ns_conf'				: None,								# 只有在distributed为True时生效
+			'minimum_phi_value'		: .01,								# 只有在per_word_topics为True时生效
+			'per_word_topics'		: False,							# If True, the model also computes a list of topics, sorted in descending order of most likely topics for each word, along with their phi values multiplied by the feature length (i.e. word count).
+			'callbacks'				: None,								# 评估指标
+			'dtype'					: numpy.float32
+		}
+		return GensimRetrievalModel.easy_build_model(model_name='lda',
+													corpus_import_path=corpus_import_path,
+													model_export_path=model_export_path,
+													corpus_export_path=corpus_export_path,
+													**kwargs)
+	
+	@timer
+	def build_hdp_model(self, 
+						corpus_import_path=REFERENCE_CORPUS_TFIDF_PATH,
+						model_export_path=REFERENCE_HDP_MODEL_PATH,
+						corpus_export_path=REFERENCE_CORPUS_HDP_PATH):
+		"""构建HDP模型并利用HDP模型生成新的HDP指数权重矩阵"""
+		kwargs = {
+			'max_chunks'	: None,
+			'max_time'		: None,
+			'chunksize'		: 256,
+			'kappa'			: self.args.kappa_hdp,						# Learning parameter which acts as exponential decay factor to influence extent of learning from each batch.
+			'tau'			: self.args.tau_hdp,						# Learning parameter which down-weights early iterations of documents.
+			'K'				: self.args.K_hdp,							# Second level truncation level
+			'T'				: self.args.T_hdp,							# Top level truncation level
+			'alpha'			: 1,										# Second level concentration, 这个参数是跟topic优先度有关的, 默认平权
+			'gamma'			: 1,										# First level concentration, 这个参数也是跟topic优先度有关的, 默认平权
+			'eta'			: .01,										# The topic Dirichlet
+			'scale'			: 1.,										# Weights information from the mini-chunk of corpus to calculate rhot.
+			'var_converge'	: .0001,									# Lower bound on the right side of convergence. Used when updating variational parameters for a single document.
+			'outputdir'		: None,
+			'random_state'	: None,
+		}
+		return GensimRetrievalModel.easy_build_model(model_name='hdp',
+													corpus_import_path=corpus_import_path,
+													model_export_path=model_export_path,
+													corpus_export_path=corpus_export_path,
+													**kwargs)
+	
+	@timer
+	def build_logentropy_model(self,
+							   corpus_import_path=REFERENCE_CORPUS_TFIDF_PATH, 
+							   model_export_path=REFERENCE_LOGENTROPY_MODEL_PATH,
+							   corpus_export_path=REFERENCE_CORPUS_LOGENTROPY_PATH):
+		"""构建LogEntropy模型并利用ogEntropy模型生成新的LDA指数权重矩阵"""
+		kwargs = {
+			'normalize': True,
+		}
+		return GensimRetrievalModel.easy_build_model(model_name='logentropy',
+													corpus_import_path=corpus_import_path,
+													model_export_path=model_export_path,
+													corpus_export_path=corpus_export_path,
+													**kwargs)
+
+	@timer
+	def build_bm25_model(self,
+						 corpus_import_path=REFERENCE_CORPUS_PATH,
+						 index_export_path=REFERENCE_BM25_INDEX_PATH):
+		"""构建BM25模型: BM25模型没有需要训练的参数, 直接在原始词频语料上构建倒排索引并保存"""
+		corpus = MmCorpus(corpus_import_path)
+		k1 = self.args.k1_bm25 if 'k1_bm25' in self.args else 1.2		# Dataset等使用其他配置时索引缺失也会在这里重新构建
+		b = self.args.b_bm25 if 'b_bm25' in self.args else .75
+		similarity = BM25Index.from_corpus(corpus, k1=k1, b=b, num_best=self.args.num_best)
+		if index_export_path is not None:
+			similarity.save(index_export_path)
+		return similarity
+
+	@classmethod
+	def validate_corpus_import_path(cls, corpus_import_path, model_name):
+		"""检查模型构建函数的参数corpus_import_path的合法性"""
+		sequence_length = len(GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['sequence'])
+		if sequence_length == 1:
+			assert corpus_import_path == REFERENCE_CORPUS_PATH
+		elif sequence_length == 2:
+			assert corpus_import_path == GENSIM_RETRIEVAL_MODEL_SUMMARY[GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['sequence'][0]]['corpus']
+		else:
+			raise NotImplementedError('目前不考虑模型序列长度超过2的情形')
+	
+	@classmethod
+	def easy_build_model(cls,
+						 model_name,
+						 corpus_import_path,
+						 model_export_path=None,
+						 corpus_export_path=None,
+						 *args, **kwargs):
+		"""
+		20211210更新: 统一的模型构建方法
+		:param model_name	: 模型名称
+		:param corpus_import_path		: gensim语料导入路径
+		:param dictionary_import_path	: gensim字典导入路径
+		:param model_export_path		: 模型保存路径
+		"""
+		GensimRetrievalModel.validate_corpus_import_path(corpus_import_path=corpus_import_path, model_name=model_name)
+		corpus = MmCorpus(corpus_import_path)
+		
+		# 20211212更新: 意外发现LogEntropy模型的构造参数里没有id2word, 因此将setting.py中GENSIM_MODEL_SUMMARY里对应的dictionary字段修正为None
+		dictionary_import_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['dictionary']
+		if GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['dictionary'] is None:
+			model = eval(GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['class'])(corpus, **kwargs)	
+		else:
+			dictionary = Dictionary.load(dictionary_import_path)
+			model = eval(GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['class'])(corpus, id2word=dictionary, **kwargs)			
+		corpus = [model[doc] for doc in corpus]																# 转换为模型指数矩阵语料
+		if model_export_path is not None:
+			model.save(model_export_path)																	# 保存模型
+		if corpus_export_path is not None:
+			MmCorpus.serialize(corpus_export_path, corpus)													# 保存模型生成的新语料
+		return model, corpus
+
+	@classmethod
+	def load_sequence(cls, model_name):
+		"""加载模型序列"""
+		sequence = []
+		for _model_name in GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['sequence']:
+			load_function = eval(GENSIM_RETRIEVAL_MODEL_SUMMARY[_model_name]['class']).load
+			model_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[_model_name]['model']
+			model = load_function(model_path)
+			sequence.append(model)
+		return sequence
+
+	@timer
+	def build_similarity_index(self, model_name, export_path=None):
+		"""
+		构建模型的相似度索引并保存: 在预处理阶段调用一次即可
+		:param model_name	: 模型名称
+		:param export_path	: 索引保存路径, 默认为GENSIM_RETRIEVAL_MODEL_SUMMARY中的index字段
+		"""
+		if export_path is None:
+			export_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['index']
+		if model_name == 'bm25':
+			return self.build_bm25_model(corpus_import_path=GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['corpus'], index_export_path=export_path)
+		corpus = MmCorpus(GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['corpus'])
+		similarity = SimilarityIndex.from_corpus(corpus, num_best=self.args.num_best)
+		similarity.save(export_path)
+		return similarity
+
+	@timer
+	def build_ann_index(self, model_name, export_path=None, n_samples=1000):
+		"""
+		构建稠密向量模型(LSI/LDA/HDP)的IVF-PQ近似最近邻索引并保存, 同时用抽样的参考书目段落作为查询评估召回率
+		:param model_name	: 模型名称, 要求GENSIM_RETRIEVAL_MODEL_SUMMARY中ann_index字段不为None
+		:param export_path	: 索引保存路径, 默认为GENSIM_RETRIEVAL_MODEL_SUMMARY中的ann_index字段
+		:param n_samples	: 评估召回率时抽样的查询数
+		"""
+		if export_path is None:
+			export_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['ann_index']
+		assert export_path is not None, f'{model_name}模型不支持近似最近邻索引'
+		matrix = self.build_similarity(model_name=model_name, use_ann=False).matrix
+		if sparse.issparse(matrix):
+			matrix = matrix.toarray()
+		ann_index = IVFPQIndex.from_matrix(matrix, 
+										   n_lists=self.args.n_lists_ann, 
+										   n_subspaces=self.args.n_subspaces_ann, 
+										   num_best=self.args.num_best, 
+										   nprobe=self.args.nprobe_ann, 
+										   rerank=self.args.rerank_ann)
+		samples = numpy.random.RandomState(0).choice(matrix.shape[0], min(n_samples, matrix.shape[0]), replace=False)
+		ann_index.recall = ann_index.evaluate_recall(matrix[numpy.sort(samples)])
+		logging.info(f'{model_name}模型近似最近邻索引的recall@{self.args.num_best}: {ann_index.recall} (nprobe={ann_index.nprobe}, rerank={ann_index.rerank})')
+		ann_index.save(export_path)
+		return ann_index
+
+	@timer
+	def build_similarity(self, model_name, use_ann=None):
+		"""
+		加载模型的相似度索引: 以内存映射方式只读加载预处理时保存的索引, 索引缺失或早于模型语料时重新构建
+		:param model_name	: 模型名称
+		:param use_ann		: 是否加载近似最近邻索引, 默认使用self.args.use_ann, 仅对ann_index字段不为None的模型生效
+		"""
+		use_ann = self.args.use_ann if use_ann is None else use_ann
+		index_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['index']
+		corpus_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['corpus']
+		if not os.path.exists(os.path.join(index_path, 'meta.json')) or os.path.getmtime(os.path.join(index_path, 'meta.json')) < os.path.getmtime(corpus_path):
+			logging.warning(f'{model_name}模型的相似度索引不存在或已过期, 重新构建: {index_path}')
+			self.build_similarity_index(model_name=model_name, export_path=index_path)
+		ann_index_path = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['ann_index']
+		if use_ann and ann_index_path is not None:
+			if not os.path.exists(os.path.join(ann_index_path, 'meta.json')) or os.path.getmtime(os.path.join(ann_index_path, 'meta.json')) < os.path.getmtime(os.path.join(index_path, 'meta.json')):
+				logging.warning(f'{model_name}模型的近似最近邻索引不存在或已过期, 重新构建: {ann_index_path}')
+				self.build_ann_index(model_name=model_name, export_path=ann_index_path)
+			return IVFPQIndex.load(ann_index_path, num_best=self.args.num_best, nprobe=self.args.nprobe_ann, rerank=self.args.rerank_ann)
+		similarity = eval(GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['index_class']).load(index_path, num_best=self.args.num_best)
+		return similarity
+
+	@timer
+	def update_retrieval_models(self, matrix, keep_rows, n_new, model_names=None):
+		"""
+		增量更新文档检索模型, 模型语料与相似度索引: 需要在update_reference_corpus之后调用, 新段落在语料末尾
+		- TFIDF与LogEntropy: 全局权重(逆文档频率与熵)依赖段落总数, 段落数变化时所有分词的权重都会改变, 因此由更新后的语料完整重建, 代价与对所有段落重新加权相同
+		- LSI: 字典没有新分词时用新段落在线更新(add_documents), 所有段落重新投影只需一次稀疏矩阵乘法; 字典有新分词时投影矩阵的维数改变, 完整重建
+		- LDA: 用新段落在线更新(update), 只推断新段落的主题分布, 原有段落沿用之前的主题分布, 训练之后新出现的分词被忽略
+		- HDP: 在线更新处理完训练时的段落数后即停止, 无法继续学习新段落, 因此完整重建
+		- BM25: 由更新后的词频矩阵重新构建倒排索引
+		删除的段落无法从LSI, LDA, HDP模型中剔除, 改动较多时仍应完整重建; 近似最近邻索引, 分片索引与检索结果表会因早于相似度索引而自动重建
+		:param matrix		: update_reference_corpus返回的词频矩阵
+		:param keep_rows	: 原参考书目中保留的段落编号
+		:param n_new		: 追加在参考书目末尾的新段落数
+		:param model_names	: 需要更新的模型名称, 默认为GENSIM_RETRIEVAL_MODEL_SUMMARY中的所有模型, 依赖的模型(如LSI依赖TFIDF)会一并更新
+		"""
+		if model_names is None:
+			model_names = list(GENSIM_RETRIEVAL_MODEL_SUMMARY.keys())
+		model_names = [model_name for model_name, summary in GENSIM_RETRIEVAL_MODEL_SUMMARY.items() if model_name in model_names or any(model_name in GENSIM_RETRIEVAL_MODEL_SUMMARY[_model_name]['sequence'][: -1] for _model_name in model_names)]
+		matrices = {}
+		for model_name in model_names:
+			sequence = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]['sequence']
+			input_matrix = matrices[sequence[-2]] if len(sequence) == 2 else matrix
+			matrices[model_name] = self.update_retrieval_model(model_name=model_name, input_matrix=input_matrix, keep_rows=keep_rows, n_new=n_new)
+		return matrices
+
+	def update_retrieval_model(self, model_name, input_matrix, keep_rows, n_new):
+		"""
+		增量更新单个文档检索模型, 见update_retrieval_models
+		:param model_name	: 模型名称
+		:param input_matrix	: 模型的输入语料, 即更新后的词频矩阵或TFIDF矩阵
+		:return output_matrix	: 模型生成的新语料, BM25模型返回None
+		"""
+		summary = GENSIM_RETRIEVAL_MODEL_SUMMARY[model_name]
+		n_documents = input_matrix.shape[0]
+		kept_rows, new_rows = numpy.arange(n_documents - n_new), numpy.arange(n_documents - n_new, n_documents)
+		if summary['index_class'] == 'BM25Index':
+			similarity = BM25Index.from_matrix(input_matrix, k1=self.args.k1_bm25 if 'k1_bm25' in self.args else 1.2, b=self.args.b_bm25 if 'b_bm25' in self.args else .75, num_best=self.args.num_best)
+			similarity.save(summary['index'])
+			return None
+		model = eval(summary['class']).load(summary['model'])
+		
+		def _load_kept_rows():		# 原有段落在模型语料中的结果
+			return corpus_to_csr(MmCorpus(summary['corpus']), dtype=numpy.float64)[keep_rows]
+		
+		def _rebuild():				# 由更新后的输入语料完整重建模型, 输入语料已经在依赖的模型更新时保存
+			corpus_import_path = REFERENCE_CORPUS_PATH if len(summary['sequence']) == 1 else GENSIM_RETRIEVAL_MODEL_SUMMARY[summary['sequence'][0]]['corpus']
+			_model, _corpus = getattr(self, f'build_{model_name}_model')(corpus_import_path=corpus_import_path, model_export_path=None, corpus_export_path=None)
+			return _model, corpus_to_csr(_corpus, dtype=numpy.float64)
+		
+		if isinstance(model, (gensim.models.TfidfModel, gensim.models.LogEntropyModel, gensim.models.HdpModel)):
+			model, output_matrix = _rebuild()
+		elif isinstance(model, LsiModel):
+			if model.num_terms < input_matrix.shape[1]:
+				logging.info(f'{model_name}模型: 字典新增{input_matrix.shape[1] - model.num_terms}个分词, 完整重建')
+				model, output_matrix = _rebuild()
+			else:
+				if n_new > 0:
+					model.add_documents(Sparse2Corpus(input_matrix[new_rows], documents_columns=False))
+				output_matrix = sparse.csr_matrix(input_matrix @ model.projection.u[:, :model.num_topics])		# 与LsiModel.__getitem__相同: 段落向量左乘投影矩阵的转置
+				output_matrix.data[numpy.abs(output_matrix.data) <= 1e-9] = 0		# 与gensim.matutils.full2sparse一致, 去掉接近零的项
+				output_matrix.eliminate_zeros()
+		elif isinstance(model, gensim.models.LdaModel):
+			new_corpus = Sparse2Corpus(resize_columns(input_matrix[new_rows], model.num_terms), documents_columns=False)
+			if n_new > 0:
+				model.update(new_corpus)
+			new_matrix = corpus_to_csr(model[new_corpus], dtype=numpy.float64) if n_new > 0 else sparse.csr_matrix((0, 1), dtype=numpy.float64)
+			output_matrix = scatter_rows([kept_rows, new_rows], [_load_kept_rows(), new_matrix])
+		else:
+			raise NotImplementedError(f'{model_name}模型不支持增量更新')
+		
+		# 先保存模型与语料, 再保存相似度索引, 保证索引不早于语料
+		model.save(summary['model'])
+		MmCorpus.serialize(summary['corpus'], Sparse2Corpus(output_matrix, documents_columns=False))
+		similarity = SimilarityIndex.from_matrix(output_matrix, num_best=self.args.num_best)
+		similarity.save(summary['index'])
+		return output_matrix
+
+	def retrieval_table_path(self, split, model_name):
+		"""检索结果表的路径: 检索结果只取决于题目文本, 检索模型, num_best, filter_stopword以及是否使用近似检索与分片检索, 级联检索还取决于两个阶段的模型与候选数"""
+		if model_name in CASCADE_RETRIEVAL_MODEL_SUMMARY:
+			use_ann = self.args.use_ann
+			suffix = f'_{self.args.first_stage_cascade}{self.args.second_stage_cascade}{self.args.num_candidate_cascade}'
+		else:
+			use_ann = self.args.use_ann and RETRIEVAL_MODEL_SUMMARY[model_name]['ann_index'] is not None
+			suffix = ''
+		suffix += f'_ann{self.args.nprobe_ann}x{self.args.rerank_ann}' if use_ann else ''
+		if self.args.use_shard:
+			suffix += f'_shard{self.args.num_top_subject}{self.args.first_pass_shard}'
+		return RETRIEVAL_TABLE_PATH.format(split, model_name, self.args.num_best, int(self.args.filter_stopword), suffix)
+
+	@timer
+	def build_retrieval_table(self, split, model_name, export_path=None):
+		"""
+		对数据集的一个划分中的所有题目批量检索并保存结果表: 在预处理阶段调用一次, 之后所有需要检索结果的地方直接查表
+		:param split		: 数据集划分名称, 即DATASET_SPLIT_PATHs的键
+		:param model_name	: 检索模型名称, 即RETRIEVAL_MODEL_SUMMARY的键, 稠密检索模型交由NeuralRetrieveModel查询
+		:param export_path	: 结果表保存路径, 默认为retrieval_table_path的返回值
+		"""
+		if export_path is None:
+			export_path = self.retrieval_table_path(split=split, model_name=model_name)
+		retrieval_model = self.dispatch(model_name=model_name)
+		dictionary_path = RETRIEVAL_MODEL_SUMMARY[model_name]['dictionary']
+		dictionary = Dictionary.load(REFERENCE_DICTIONARY_PATH if dictionary_path is None else dictionary_path)	# logentropy模型的dictionary字段是None
+		if isinstance(retrieval_model, CascadeRetrievalModel):
+			similarity = retrieval_model.build_similarity(model_name=model_name, use_shard=self.args.use_shard)		# 级联检索只在第一阶段分片召回
+		else:
+			similarity = self.build_sharded_similarity(model_name=model_name) if self.args.use_shard else retrieval_model.build_similarity(model_name=model_name)
+		sequence = retrieval_model.load_sequence(model_name=model_name)
+		columns = ['id', 'statement', 'option_a', 'option_b', 'option_c', 'option_d', 'subject']
+		dataframe = pandas.concat([load_preprocessed_dataframe(filepath, columns=columns) for filepath in DATASET_SPLIT_PATHs[split]]).reset_index(drop=True)
+		query_token_lists = [statement + option_a + option_b + option_c + option_d for statement, option_a, option_b, option_c, option_d 
+							 in zip(dataframe['statement'], dataframe['option_a'], dataframe['option_b'], dataframe['option_c'], dataframe['option_d'])]	# 拼接题目和四个选项的分词
+		shards = self.route_subjects(query_token_lists=query_token_lists, subjects=dataframe['subject'].tolist()) if self.args.use_shard else None
+		indices, values = retrieval_model.batch_query(query_token_lists=query_token_lists, dictionary=dictionary, similarity=similarity, sequence=sequence, return_arrays=True, shards=shards)
+		retrieval_table = RetrievalTable(question_ids=dataframe['id'].astype(str).values, paragraph_indices=indices, scores=values)
+		retrieval_table.save(export_path, meta={'split': split, 'model_name': model_name, 'num_best': self.args.num_best, 'filter_stopword': bool(self.args.filter_stopword), 'use_shard': bool(self.args.use_shard)})
+		return retrieval_table
+
+	def load_retrieval_table(self, split, model_name):
+		"""加载检索结果表: 结果表缺失, 或早于题库文件与相似度索引时重新构建"""
+		table_path = self.retrieval_table_path(split=split, model_name=model_name)
+		dependency_paths = DATASET_SPLIT_PATHs[split] + self.index_dependency_paths(model_name=model_name)
+		meta_path = os.path.join(table_path, 'meta.json')
+		if not os.path.exists(meta_path) or any(not os.path.exists(path) or os.path.getmtime(meta_path) < os.path.getmtime(path) for path in dependency_paths):
+			logging.warning(f'{split}划分在{model_name}模型下的检索结果表不存在或已过期, 重新构建: {table_path}')
+			return self.build_retrieval_table(split=split, model_name=model_name, export_path=table_path)
+		return RetrievalTable.load(table_path)
+
+	def index_dependency_paths(self, model_name, use_shard=None):
+		"""
+		检索结果依赖的索引文件: 相似度索引, 以及使用时的近似最近邻索引与分片索引, 级联检索依赖两个阶段各自的索引
+		:param model_name	: 模型名称, 即RETRIEVAL_MODEL_SUMMARY或GENSIM_EMBEDDING_MODEL_SUMMARY的键
+		:param use_shard	: 是否使用分片索引, 默认为配置中的use_shard, 级联检索只有第一阶段分片
+		:return paths		: 索引的meta.json路径列表
+		"""
+		use_shard = self.args.use_shard if use_shard is None else use_shard
+		if model_name in CASCADE_RETRIEVAL_MODEL_SUMMARY:
+			return self.index_dependency_paths(model_name=self.args.first_stage_cascade, use_shard=use_shard) + self.index_dependency_paths(model_name=self.args.second_stage_cascade, use_shard=False)
+		if model_name in GENSIM_EMBEDDING_MODEL_SUMMARY:
+			summary = GENSIM_EMBEDDING_MODEL_SUMMARY[model_name]
+			index_path = summary['ann_index'] if self.args.use_ann and summary.get('ann_index') is not None else summary['index']	# 使用近似最近邻索引时不加载软余弦相似度索引
+			return [os.path.join(index_path, 'meta.json')]
+		paths = [os.path.join(RETRIEVAL_MODEL_SUMMARY[model_name]['index'], 'meta.json')]
+		if self.args.use_ann and RETRIEVAL_MODEL_SUMMARY[model_name]['ann_index'] is not None:
+			paths.append(os.path.join(RETRIEVAL_MODEL_SUMMARY[model_name]['ann_index'], 'meta.json'))
+		if use_shard:
+			paths.append(os.path.join(SHARDED_INDEX_PATH.format(model_name), 'meta.json'))
+		return paths
+
+	def dispatch(self, model_name):
+		"""模型名称对应的检索模型: 稠密检索模型交由NeuralRetrieveModel查询, 级联检索交由CascadeRetrievalModel查询, 其余模型为自身"""
+		if model_name in NEURAL_RETRIEVAL_MODEL_SUMMARY:
+			return NeuralRetrieveModel(args=self.args)
+		if model_name in CASCADE_RETRIEVAL_MODEL_SUMMARY:
+			return CascadeRetrievalModel(args=self.args)
+		return self
+
+	@timer
+	def build_sharded_index(self, model_name, export_path=None):
+		"""
+		构建按法律门类分片的相似度索引并保存
+		:param model_name	: 模型名称, 即RETRIEVAL_MODEL_SUMMARY的键, 级联检索没有自身的索引, 使用第一阶段模型的分片索引
+		:param export_path	: 索引保存路径, 默认为SHARDED_INDEX_PATH
+		"""
+		if export_path is None:
+			export_path = SHARDED_INDEX_PATH.format(model_name)
+		retrieval_model = self.dispatch(model_name=model_name)
+		similarity = self.build_similarity(model_name=model_name, use_ann=False) if retrieval_model is self else retrieval_model.build_similarity(model_name=model_name)
+		assert hasattr(similarity, 'take'), f'{model_name}模型的相似度索引不支持分片'
+		sharded_index = ShardedIndex.from_index(similarity, shard_labels=load_reference_subjects(REFERENCE_PATH), num_best=self.args.num_best)
+		sharded_index.save(export_path)
+		return sharded_index
+
+	def build_sharded_similarity(self, model_name):
+		"""加载按法律门类分片的相似度索引: 索引缺失或早于未分片的相似度索引时重新构建"""
+		index_path = SHARDED_INDEX_PATH.format(model_name)
+		meta_path = os.path.join(index_path, 'meta.json')
+		dependency_path = os.path.join(RETRIEVAL_MODEL_SUMMARY[model_name]['index'], 'meta.json')
+		if not os.path.exists(meta_path) or not os.path.exists(dependency_path) or os.path.getmtime(meta_path) < os.path.getmtime(dependency_path):
+			logging.warning(f'{model_name}模型的分片索引不存在或已过期, 重新构建: {index_path}')
+			return self.build_sharded_index(model_name=model_name, export_path=index_path)
+		return ShardedIndex.load(index_path, num_best=self.args.num_best)
+
+	def route_subjects(self, query_token_lists, subjects=None):
+		"""
+		确定每道题目检索的法律门类: 有subject标签的题目只检索该门类, 其余题目先用first_pass_shard模型检索, 再按Dataset.fill_subject的方式加权投票选出num_top_subject个门类
+		:param query_token_lists	: 查询分词列表的列表
+		:param subjects				: 每道题目的subject标签, 缺失值为nan, 默认全部缺失
+		:return shards				: 形状为(n_queries, num_top_subject)的门类编号, 即ShardedIndex的分片编号, 不足的位置填充0
+		"""
+		shards = numpy.zeros((len(query_token_lists), self.args.num_top_subject), dtype=numpy.int64)
+		known = numpy.array([isinstance(subject, str) for subject in subjects], dtype=bool) if subjects is not None else numpy.zeros((len(query_token_lists), ), dtype=bool)
+		for i in numpy.flatnonzero(known):
+			shards[i, 0] = SUBJECT2INDEX[subjects[i]]
+		unknown = numpy.flatnonzero(~known)
+		if unknown.shape[0] > 0:
+			model_name = self.args.first_pass_shard
+			retrieval_model = self.dispatch(model_name=model_name)
+			dictionary_path = RETRIEVAL_MODEL_SUMMARY[model_name]['dictionary']
+			dictionary = Dictionary.load(REFERENCE_DICTIONARY_PATH if dictionary_path is None else dictionary_path)
+			indices, _ = retrieval_model.batch_query(query_token_lists=[query_token_lists[i] for i in unknown], 
+													 dictionary=dictionary, 
+													 similarity=retrieval_model.build_similarity(model_name=model_name), 
+													 sequence=retrieval_model.load_sequence(model_name=model_name), 
+													 return_arrays=True)
+			shards[unknown] = vote_subjects(indices, paragraph_subjects=load_reference_subjects(REFERENCE_PATH), k=self.args.num_top_subject)
+		return shards
+
+	def query(self, query_tokens, dictionary, similarity, sequence):
+		"""
+		给定查询分词列表返回相似度匹配向量
+		:param query_tokens	: 需要查询的关键词分词列表
+		:param dictionary	: gensim字典
+		:param similarity	: 相似度索引
+		:param sequence		: 模型序列
+		:return result		: 文档中每个段落的匹配分值
+		"""
+		if self.args.filter_stopword:
+			query_tokens = filter_stopwords(tokens=query_tokens, stopwords=self.stopwords)
+		query_corpus = dictionary.doc2bow(query_tokens)
+		for model in sequence:
+			if isinstance(model, (gensim.models.LdaModel, gensim.models.HdpModel)):
+				num_terms = model.num_terms if hasattr(model, 'num_terms') else model.m_W
+				query_corpus = [(token_id, weight) for token_id, weight in query_corpus if token_id < num_terms]	# 增量更新后字典中可能有模型训练之后才出现的分词
+			query_corpus = model[query_corpus]
+		result = similarity[query_corpus]
+		return result
+	
+	def batch_query(self, query_token_lists, dictionary, similarity, sequence, return_arrays=False, shards=None):
+		"""
+		批量查询: 所有查询组成一个稀疏矩阵, 整体经过模型序列转换后与相似度索引做一次分块矩阵乘法
+		:param query_token_lists	: 查询分词列表的列表
+		:param dictionary			: gensim字典
+		:param similarity			: 相似度索引
+		:param sequence				: 模型序列
+		:param return_arrays		: 是否直接返回select_top_k形式的(indices, values)数组
+		:param shards				: 相似度索引为ShardedIndex时每个查询检索的分片编号, 即route_subjects的返回值, 默认检索所有分片
+		:return results				: 与query的返回值形式相同的结果列表, 每个查询一个
+		"""
+		query_matrix = self.build_query_matrix(query_token_lists=query_token_lists, dictionary=dictionary, sequence=sequence)
+		indices, values = similarity.batch_query(query_matrix) if shards is None else similarity.batch_query(query_matrix, shards=shards)
+		if return_arrays:
+			return indices, values
+		return to_query_results(indices, values)
+
+	def build_query_matrix(self, query_token_lists, dictionary, sequence):
+		"""
+		将查询分词列表转为相似度索引的查询矩阵: 所有查询组成一个稀疏矩阵, 整体经过模型序列转换
+		:param query_token_lists	: 查询分词列表的列表
+		:param dictionary			: gensim字典
+		:param sequence				: 模型序列
+		:return query_matrix		: CSR矩阵或二维numpy数组, 每行一个查询
+		"""
+		if self.args.filter_stopword:
+			query_token_lists = [filter_stopwords(tokens=query_tokens, stopwords=self.stopwords) for query_tokens in query_token_lists]
+		query_matrix = corpus_to_csr([dictionary.doc2bow(query_tokens) for query_tokens in query_token_lists], num_features=len(dictionary))
+		return GensimRetrievalModel.transform_query_matrix(query_matrix=query_matrix, sequence=sequence)
+	
+	@classmethod
+	def transform_query_matrix(cls, query_matrix, sequence):
+		"""
+		将查询矩阵整体经过模型序列转换
+		TFIDF模型(默认的权重与归一化方式)与LSI模型可以直接用矩阵运算完成, 其他模型仍逐条调用gensim模型转换
+		:param query_matrix	: 形状为(n_queries, n_features)的CSR矩阵
+		:param sequence		: 模型序列
+		:return query_matrix: 转换后的CSR矩阵或二维numpy数组
+		"""
+		for model in sequence:
+			if isinstance(model, TfidfModel) and not model.smartirs and model.pivot is None and model.wlocal is identity and model.normalize in [True, gensim.matutils.unitvec]:
+				# 权重为词频乘以逆文档频率, 再按行归一化, 未登录词的权重为零
+				idfs = numpy.zeros((query_matrix.shape[1], ), dtype=numpy.float64)
+				for token_id, idf in model.idfs.items():
+					if token_id < idfs.shape[0]:
+						idfs[token_id] = idf
+				query_matrix = sparse.csr_matrix(query_matrix, dtype=numpy.float64).multiply(idfs[None, :]).tocsr()
+				query_matrix = normalize_rows(query_matrix)
+				query_matrix.data[numpy.abs(query_matrix.data) <= 1e-12] = 0	# 与gensim一致, 过滤过小的权重
+				query_matrix.eliminate_zeros()
+			elif isinstance(model, LsiModel):
+				# 未缩放的LSI主题向量即为查询向量在左奇异向量上的投影
+				projection = model.projection.u[:, :model.num_topics]
+				query_matrix = resize_columns(sparse.csr_matrix(query_matrix, dtype=projection.dtype), projection.shape[0])
+				query_matrix = numpy.asarray(query_matrix @ projection)
+			else:
+				if not sparse.issparse(query_matrix):
+					query_matrix = sparse.csr_matrix(query_matrix)
+				if isinstance(model, (gensim.models.LdaModel, gensim.models.HdpModel)):
+					query_matrix = resize_columns(query_matrix, model.num_terms if hasattr(model, 'num_terms') else model.m_W)	# 增量更新后字典中可能有模型训练之后才出现的分词
+				query_corpus = model[Sparse2Corpus(query_matrix, documents_columns=False)]
+				query_matrix = corpus_to_csr(list(query_corpus), dtype=numpy.float64)
+		return query_matrix
+
+
+class SimilarityIndex:
+	"""余弦相似度索引: 参考书目文档的每个段落向量按行归一化后存为矩阵, 查询时分块计算矩阵乘积并逐行选出前num_best个结果"""
+	def __init__(self, matrix, num_best=None, block_size=1024):
+		"""
+		:param matrix		: 形状为(n_documents, num_features)的CSR矩阵或二维numpy数组, 要求已按行归一化
+		:param num_best		: 每个查询返回的结果数, 为None时返回全部文档的得分
+		:param block_size	: 批量查询时每块的查询数
+		"""
+		self.matrix = matrix
+		self.num_best = num_best
+		self.block_size = block_size
+	
+	@classmethod
+	def from_corpus(cls, corpus, num_best=None, density_threshold=.3, **kwargs):
+		"""
+		从gensim语料构建相似度索引: 与gensim一致, 非零元比例超过density_threshold时使用稠密矩阵, 否则使用稀疏矩阵
+		:param corpus			: gensim语料
+		:param num_best			: 每个查询返回的结果数
+		:param density_threshold: 稠密矩阵的非零元比例阈值
+		"""
+		return cls.from_matrix(corpus_to_csr(corpus), num_best=num_best, density_threshold=density_threshold, **kwargs)
+	
+	@classmethod
+	def from_matrix(cls, matrix, num_best=None, density_threshold=.3, **kwargs):
+		"""由形状为(n_documents, num_features)的CSR矩阵构建相似度索引, 参数与from_corpus相同"""
+		matrix = normalize_rows(sparse.csr_matrix(matrix, dtype=numpy.float32))
+		width = matrix.indices.max() + 1 if matrix.nnz > 0 else 1	# 只保留到最大的非零特征编号, 主题模型的特征维数远小于字典长度, 多余的全零列无需存储
+		matrix = resize_columns(matrix, width)
+		if matrix.nnz > density_threshold * matrix.shape[0] * matrix.shape[1]:
+			matrix = matrix.toarray()
+		return cls(matrix, num_best=num_best, **kwargs)
+	
+	def save(self, export_path):
+		"""
+		保存索引: 稀疏矩阵分别保存data, indices, indptr三个数组, 稠密矩阵直接保存为一个数组
+		:param export_path	: 索引保存的文件夹路径
+		"""
+		if sparse.issparse(self.matrix):
+			arrays = {'data': self.matrix.data, 'indices': self.matrix.indices, 'indptr': self.matrix.indptr}
+			meta = {'format': 'csr', 'shape': list(self.matrix.shape)}
+		else:
+			arrays = {'matrix': self.matrix}
+			meta = {'format': 'dense', 'shape': list(self.matrix.shape)}
+		save_arrays(export_path, arrays=arrays, meta=meta)
+	
+	@classmethod
+	def load(cls, import_path, num_best=None, mmap_mode='r', **kwargs):
+		"""
+		加载索引: 默认以内存映射方式只读加载, 多个进程可以共享同一份索引
+		:param import_path	: 索引保存的文件夹路径
+		:param num_best		: 每个查询返回的结果数
+		:param mmap_mode	: numpy.load的mmap_mode参数
+		"""
+		arrays, meta = load_arrays(import_path, mmap_mode=mmap_mode)
+		if meta['format'] == 'csr':
+			matrix = sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=tuple(meta['shape']), copy=False)
+		else:
+			matrix = arrays['matrix']
+		return cls(matrix, num_best=num_best, **kwargs)
+	
+	@property
+	def num_features(self):
+		return self.matrix.shape[1]
+	
+	def __len__(self):
+		return self.matrix.shape[0]
+	
+	def __getitem__(self, query):
+		"""兼容gensim的Similarity: 输入一条查询或一个查询语料, 返回[(文档编号, 得分), ...]形式的结果, num_best为None时返回得分向量"""
+		_is_corpus, query = is_corpus(query)
+		query_matrix = corpus_to_csr(query if _is_corpus else [query], dtype=numpy.float64)
+		if self.num_best is None:
+			scores = self.get_similarities(query_matrix)
+			return scores if _is_corpus else scores[0]
+		results = to_query_results(*self.batch_query(query_matrix))
+		return results if _is_corpus else results[0]
+	
+	def get_similarities(self, query_matrix):
+		"""
+		计算查询与所有文档的余弦相似度
+		:param query_matrix	: 形状为(n_queries, n_features)的CSR矩阵或二维numpy数组, 查询向量会先归一化, 再截断或填充到索引的特征维数
+		:return scores		: 形状为(n_queries, n_documents)的得分矩阵
+		"""
+		query_matrix = resize_columns(normalize_rows(query_matrix), self.num_features)
+		if sparse.issparse(query_matrix):
+			query_matrix = query_matrix.astype(numpy.float32)
+			if sparse.issparse(self.matrix):
+				return (self.matrix @ query_matrix.T).T.toarray()
+			return numpy.asarray((query_matrix @ self.matrix.T))
+		query_matrix = query_matrix.astype(numpy.float32)
+		if sparse.issparse(self.matrix):
+			return numpy.asarray((self.matrix @ query_matrix.T).T)
+		return numpy.dot(self.matrix, query_matrix.T).T
+	
+	def get_candidate_similarities(self, query_matrix, candidates):
+		"""计算每个查询与各自的候选文档的余弦相似度, 形状与candidates相同, 用于级联检索的第二阶段重排"""
+		query_matrix = resize_columns(normalize_rows(query_matrix), self.num_features)
+		return candidate_inner_products(self.matrix, query_matrix.astype(numpy.float32), candidates)
+	
+	def get_block_similarities(self, query_matrix, start, end):
+		"""计算查询与第start至end个文档的余弦相似度, 形状为(n_queries, end - start)"""
+		return SimilarityIndex(self.matrix[start: end]).get_similarities(query_matrix)
+	
+	def take(self, rows):
+		"""取出指定的文档组成新的索引"""
+		return SimilarityIndex(self.matrix[rows], num_best=self.num_best, block_size=self.block_size)
+	
+	def batch_query(self, query_matrix, num_best=None):
+		"""
+		分块批量查询, 每块计算得分矩阵后逐行选出前num_best个结果
+		:param query_matrix	: 形状为(n_queries, n_features)的CSR矩阵或二维numpy数组
+		:param num_best		: 每个查询返回的结果数, 默认使用self.num_best
+		:return indices		: 形状为(n_queries, num_best)的文档编号, 不足的位置填充-1
+		:return values		: 形状为(n_queries, num_best)的得分
+		"""
+		num_best = self.num_best if num_best is None else num_best
+		num_best = min(num_best, len(self))
+		indices = numpy.full((query_matrix.shape[0], num_best), -1, dtype=numpy.int64)
+		values = numpy.zeros((query_matrix.shape[0], num_best), dtype=numpy.float32)
+		for start in range(0, query_matrix.shape[0], self.block_size):
+			end = min(start + self.block_size, query_matrix.shape[0])
+			scores = self.get_similarities(query_matrix[start: end])
+			indices[start: end], values[start: end] = select_top_k(scores, k=num_best)
+		return indices, values
+
+
+class BM25Index:
+	"""
+	BM25倒排索引: 每个词项的倒排列表按文档编号升序存放文档编号与该词项在文档中的BM25得分
+	查询时只访问查询词项的倒排列表: 一批查询与倒排列表组成的稀疏矩阵相乘, 计算量只与被访问的倒排列表长度有关, 与文档数无关
+	没有使用MaxScore/WAND等基于得分上界的剪枝: 稀疏矩阵乘法已经只累加被访问的倒排列表, 逐个查询剪枝在Python中反而更慢
+	"""
+	def __init__(self, indptr, documents, impacts, n_documents, num_best=None, k1=1.2, b=.75):
+		"""
+		:param indptr		: 形状为(n_terms + 1, )的数组, 第t个词项的倒排列表为documents[indptr[t]: indptr[t + 1]]
+		:param documents	: 所有倒排列表中的文档编号, 每个倒排列表内升序
+		:param impacts		: 与documents对应的词项在文档中的BM25得分
+		:param n_documents	: 文档数
+		:param num_best		: 每个查询返回的结果数, 为None时返回全部文档的得分
+		:param k1			: BM25模型的k1参数值, 仅用于记录
+		:param b			: BM25模型的b参数值, 仅用于记录
+		"""
+		self.indptr = indptr
+		self.documents = documents
+		self.impacts = impacts
+		self.n_documents = n_documents
+		self.num_best = num_best
+		self.k1 = k1
+		self.b = b
+	
+	@classmethod
+	def from_corpus(cls, corpus, k1=1.2, b=.75, num_best=None):
+		"""
+		从原始词频语料构建倒排索引
+		idf使用log(1 + (N - df + 0.5) / (df + 0.5)), 保证每一项得分非负
+		:param corpus	: gensim原始词频语料
+		:param k1		: BM25模型的k1参数值
+		:param b		: BM25模型的b参数值
+		:param num_best	: 每个查询返回的结果数
+		"""
+		return cls.from_matrix(corpus_to_csr(corpus, dtype=numpy.float64), k1=k1, b=b, num_best=num_best)
+	
+	@classmethod
+	def from_matrix(cls, matrix, k1=1.2, b=.75, num_best=None):
+		"""由形状为(n_documents, n_terms)的原始词频CSR矩阵构建倒排索引, 参数与from_corpus相同"""
+		matrix = sparse.csr_matrix(matrix, dtype=numpy.float64, copy=True)
+		n_documents, n_terms = matrix.shape
+		document_lengths = numpy.asarray(matrix.sum(axis=1)).ravel()
+		average_length = document_lengths.mean() if n_documents > 0 and document_lengths.mean() > 0 else 1.
+		document_frequencys = numpy.bincount(matrix.indices, minlength=n_terms)
+		idfs = numpy.log(1. + (n_documents - document_frequencys + .5) / (document_frequencys + .5))
+		
+		# 每个非零元的BM25得分: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+		row_lengths = numpy.repeat(document_lengths, numpy.diff(matrix.indptr))
+		term_frequencys = matrix.data
+		matrix.data = idfs[matrix.indices] * term_frequencys * (k1 + 1) / (term_frequencys + k1 * (1 - b + b * row_lengths / average_length))
+		
+		# 转为按词项存储的倒排列表
+		matrix = matrix.tocsc()
+		matrix.sort_indices()
+		return cls(indptr=matrix.indptr.astype(numpy.int64), 
+				   documents=matrix.indices.astype(numpy.int32), 
+				   impacts=matrix.data.astype(numpy.float32), 
+				   n_documents=n_documents, 
+				   num_best=num_best, 
+				   k1=k1, 
+				   b=b)
+	
+	def save(self, export_path):
+		"""保存倒排索引"""
+		arrays = {'indptr': self.indptr, 'documents': self.documents, 'impacts': self.impacts}
+		meta = {'n_documents': self.n_documents, 'k1': self.k1, 'b': self.b}
+		save_arrays(export_path, arrays=arrays, meta=meta)
+	
+	@classmethod
+	def load(cls, import_path, num_best=None, mmap_mode='r'):
+		"""加载倒排索引: 默认以内存映射方式只读加载"""
+		arrays, meta = load_arrays(import_path, mmap_mode=mmap_mode)
+		arrays.pop('upper_bounds', None)		# 旧版本的索引还保存了不再使用的词项得分上界
+		return cls(num_best=num_best, n_documents=meta['n_documents'], k1=meta['k1'], b=meta['b'], **arrays)
+	
+	@property
+	def num_features(self):
+		return self.indptr.shape[0] - 1
+	
+	def __len__(self):
+		return self.n_documents
+	
+	@property
+	def inverted_matrix(self):
+		"""倒排列表组成的形状为(n_terms, n_documents)的CSR矩阵: 第一次访问时构建并缓存, 避免每次查询都重新检查数百万个非零元"""
+		if getattr(self, '_inverted_matrix', None) is None:
+			self._inverted_matrix = sparse.csr_matrix((self.impacts, self.documents, self.indptr), shape=(self.num_features, self.n_documents))
+		return self._inverted_matrix
+	
+	@property
+	def document_matrix(self):
+		"""按文档存储的形状为(n_documents, n_terms)的CSR得分矩阵: 第一次访问时由倒排列表转置并缓存, 用于逐个候选文档计算得分"""
+		if getattr(self, '_document_matrix', None) is None:
+			self._document_matrix = self.inverted_matrix.T.tocsr()
+		return self._document_matrix
+	
+	def __getitem__(self, query):
+		"""兼容gensim的Similarity: 输入一条查询或一个查询语料, 返回[(文档编号, 得分), ...]形式的结果, num_best为None时返回得分向量"""
+		_is_corpus, query = is_corpus(query)
+		query_matrix = corpus_to_csr(query if _is_corpus else [query], dtype=numpy.float64)
+		if self.num_best is None:
+			scores = self.get_similarities(query_matrix)
+			return scores if _is_corpus else scores[0]
+		results = to_query_results(*self.batch_query(query_matrix))
+		return results if _is_corpus else results[0]
+	
+	def get_similarities(self, query_matrix):
+		"""计算查询与所有文档的BM25得分, 形状为(n_queries, n_documents)"""
+		query_matrix = resize_columns(sparse.csr_matrix(query_matrix), self.num_features)
+		return (query_matrix @ self.inverted_matrix).toarray()
+	
+	def get_candidate_similarities(self, query_matrix, candidates):
+		"""计算每个查询与各自的候选文档的BM25得分, 形状与candidates相同, 用于级联检索的第二阶段重排"""
+		query_matrix = resize_columns(sparse.csr_matrix(query_matrix), self.num_features)
+		return candidate_inner_products(self.document_matrix, query_matrix, candidates)
+	
+	def get_block_similarities(self, query_matrix, start, end):
+		"""
+		计算查询与第start至end个文档的BM25得分, 形状为(n_queries, end - start)
+		倒排列表内文档编号升序, 每个查询词项的倒排列表中落在[start, end)的部分是连续的一段, 由二分查找截取, 不访问其他文档
+		"""
+		query_matrix = resize_columns(sparse.csr_matrix(query_matrix), self.num_features)
+		terms = numpy.unique(query_matrix.indices)
+		lows, highs = numpy.asarray(self.indptr[terms]), numpy.asarray(self.indptr[terms + 1])
+		for i, (low, high) in enumerate(zip(lows.tolist(), highs.tolist())):
+			documents = self.documents[low: high]
+			lows[i], highs[i] = low + numpy.searchsorted(documents, start), low + numpy.searchsorted(documents, end)
+		lengths = highs - lows
+		positions = numpy.repeat(lows - numpy.cumsum(lengths) + lengths, lengths) + numpy.arange(lengths.sum())		# 截取的各段倒排列表在documents中的位置
+		indptr = numpy.zeros((terms.shape[0] + 1, ), dtype=numpy.int64)
+		indptr[1: ] = numpy.cumsum(lengths)
+		block_matrix = sparse.csr_matrix((numpy.asarray(self.impacts[positions]), numpy.asarray(self.documents[positions]) - start, indptr), shape=(terms.shape[0], end - start))
+		return (query_matrix[:, terms] @ block_matrix).toarray().astype(numpy.float32)
+	
+	def take(self, rows):
+		"""取出指定的文档组成新的倒排索引, 第i个文档为原索引的第rows[i]个文档"""
+		matrix = self.document_matrix[numpy.asarray(rows, dtype=numpy.int64)].tocsc()
+		matrix.sort_indices()
+		return BM25Index(indptr=matrix.indptr.astype(numpy.int64), 
+						 documents=matrix.indices.astype(numpy.int32), 
+						 impacts=matrix.data.astype(numpy.float32), 
+						 n_documents=matrix.shape[0], 
+						 num_best=self.num_best, 
+						 k1=self.k1, 
+						 b=self.b)
+	
+	def batch_query(self, query_matrix, num_best=None, block_size=256):
+		"""
+		批量查询: 查询词频矩阵分块与倒排列表(词项 × 文档的CSR矩阵)相乘, 只累加查询词项的倒排列表中出现的文档, 再逐行选出得分最高的文档
+		:param query_matrix	: 形状为(n_queries, n_features)的词频CSR矩阵
+		:param num_best		: 每个查询返回的结果数, 默认使用self.num_best
+		:param block_size	: 每块的查询数, 控制稀疏得分矩阵的内存占用
+		:return indices		: 形状为(n_queries, num_best)的文档编号, 不足的位置填充-1
+		:return values		: 形状为(n_queries, num_best)的得分
+		"""
+		num_best = self.num_best if num_best is None else num_best
+		num_best = min(num_best, len(self))
+		query_matrix = resize_columns(sparse.csr_matrix(query_matrix), self.num_features)
+		inverted_matrix = self.inverted_matrix
+		indices = numpy.full((query_matrix.shape[0], num_best), -1, dtype=numpy.int64)
+		values = numpy.zeros((query_matrix.shape[0], num_best), dtype=numpy.float32)
+		for start in range(0, query_matrix.shape[0], block_size):
+			end = min(start + block_size, query_matrix.shape[0])
+			indices[start: end], values[start: end] = select_top_k_sparse(query_matrix[start: end] @ inverted_matrix, k=num_best)
+		return indices, values
+
+
+class IVFPQIndex:
+	"""
+	倒排文件与乘积量化(IVF-PQ)的近似最近邻索引, 用于稠密向量(LSI/LDA/HDP主题向量, Doc2Vec段落向量)的余弦相似度检索
+	向量归一化后用k-means粗量化器划分为n_lists个倒排列表, 每个向量与所属中心的残差再切分为n_subspaces段, 每段用一个码本量化为一个字节
+	查询时只访问与查询最接近的nprobe个倒排列表, 用查表法估计内积, 再对估计得分最高的rerank个候选用原始向量精确重排
+	倒排列表的选择, 候选的筛选与最终结果都按内积(有符号)最大选择, 与DenseIndex一致, 而不是像gensim一样按绝对值选择
+	"""
+	def __init__(self, centroids, codebooks, codes, list_indptr, list_ids, vectors, num_best=None, nprobe=8, rerank=128):
+		"""
+		:param centroids	: 形状为(n_lists, d)的粗量化中心
+		:param codebooks	: 形状为(n_subspaces, n_codewords, d_sub)的乘积量化码本, d_sub * n_subspaces不小于d, 不足部分用零填充
+		:param codes		: 形状为(n, n_subspaces)的uint8编码, 按倒排列表顺序存放
+		:param list_indptr	: 形状为(n_lists + 1, )的数组, 第l个倒排列表为codes[list_indptr[l]: list_indptr[l + 1]]
+		:param list_ids		: 形状为(n, )的数组, 倒排列表中每个位置对应的文档编号
+		:param vectors		: 形状为(n, d)的归一化原始向量, 用于精确重排与召回率评估
+		:param num_best		: 每个查询返回的结果数, 为None时返回全部文档的得分
+		:param nprobe		: 查询时访问的倒排列表数, 越大召回率越高, 速度越慢
+		:param rerank		: 精确重排的候选数, 为0时直接使用乘积量化的估计得分
+		"""
+		self.centroids = centroids
+		self.codebooks = codebooks
+		self.codes = codes
+		self.list_indptr = list_indptr
+		self.list_ids = list_ids
+		self.vectors = vectors
+		self.num_best = num_best
+		self.nprobe = nprobe
+		self.rerank = rerank
+		self.recall = None		# 构建时评估的召回率, 见evaluate_recall
+	
+	@classmethod
+	def from_matrix(cls, matrix, n_lists=None, n_subspaces=16, n_codewords=256, n_iterations=20, seed=0, **kwargs):
+		"""
+		从稠密向量矩阵构建索引
+		:param matrix		: 形状为(n, d)的稠密向量矩阵, 会先按行归一化
+		:param n_lists		: 倒排列表数, 默认为4 * sqrt(n)
+		:param n_subspaces	: 乘积量化的子空间数
+		:param n_codewords	: 每个子空间的码本大小, 不超过256以便用一个字节编码
+		:param n_iterations	: k-means的迭代次数
+		:param seed			: 随机种子
+		"""
+		vectors = normalize_rows(numpy.asarray(matrix, dtype=numpy.float32))
+		n, d = vectors.shape
+		n_lists = max(1, min(n, int(4 * numpy.sqrt(n)) if n_lists is None else n_lists))
+		n_subspaces = max(1, min(n_subspaces, d))
+		n_codewords = max(1, min(n_codewords, 256, n))
+		
+		# 粗量化: 每个向量归入最近的中心所在的倒排列表
+		centroids, labels = kmeans(vectors, n_clusters=n_lists, n_iterations=n_iterations, seed=seed)
+		
+		# 乘积量化: 残差按子空间切分后分别聚类
+		subspace_size = -(-d // n_subspaces)
+		residuals = numpy.zeros((n, subspace_size * n_subspaces), dtype=numpy.float32)
+		residuals[:, : d] = vectors - centroids[labels]
+		residuals = residuals.reshape(n, n_subspaces, subspace_size)
+		codebooks = numpy.zeros((n_subspaces, n_codewords, subspace_size), dtype=numpy.float32)
+		codes = numpy.zeros((n, n_subspaces), dtype=numpy.uint8)
+		for j in range(n_subspaces):
+			codebook, _ = kmeans(residuals[:, j, :], n_clusters=n_codewords, n_iterations=n_iterations, seed=seed + j + 1)
+			codebooks[j, : codebook.shape[0]] = codebook
+			codes[:, j] = assign_nearest(residuals[:, j, :], codebook)
+		
+		# 按倒排列表重排编码, 使每个倒排列表在内存中连续
+		list_ids = numpy.argsort(labels, kind='stable')
+		list_indptr = numpy.zeros((centroids.shape[0] + 1, ), dtype=numpy.int64)
+		list_indptr[1: ] = numpy.cumsum(numpy.bincount(labels, minlength=centroids.shape[0]))
+		return cls(centroids=centroids, 
+				   codebooks=codebooks, 
+				   codes=codes[list_ids], 
+				   list_indptr=list_indptr, 
+				   list_ids=list_ids, 
+				   vectors=vectors, 
+				   **kwargs)
+	
+	def save(self, export_path):
+		"""保存索引"""
+		arrays = {
+			'centroids'		: self.centroids, 
+			'codebooks'		: self.codebooks, 
+			'codes'			: self.codes, 
+			'list_indptr'	: self.list_indptr, 
+			'list_ids'		: self.list_ids, 
+			'vectors'		: self.vectors,
+		}
+		save_arrays(export_path, arrays=arrays, meta={'nprobe': self.nprobe, 'rerank': self.rerank, 'recall': self.recall})
+	
+	@classmethod
+	def load(cls, import_path, num_best=None, nprobe=None, rerank=None, mmap_mode='r'):
+		"""加载索引: 默认以内存映射方式只读加载, nprobe与rerank为None时使用构建时记录的值"""
+		arrays, meta = load_arrays(import_path, mmap_mode=mmap_mode)
+		ann_index = cls(num_best=num_best, 
+						nprobe=meta['nprobe'] if nprobe is None else nprobe, 
+						rerank=meta['rerank'] if rerank is None else rerank, 
+						**arrays)
+		ann_index.recall = meta.get('recall')
+		return ann_index
+	
+	@property
+	def num_features(self):
+		return self.vectors.shape[1]
+	
+	def __len__(self):
+		return self.vectors.shape[0]
+	
+	def __getitem__(self, query):
+		"""兼容gensim的Similarity: 输入一条查询或一个查询语料, 返回[(文档编号, 得分), ...]形式的结果, num_best为None时返回精确得分向量"""
+		_is_corpus, query = is_corpus(query)
+		query_matrix = corpus_to_csr(query if _is_corpus else [query], dtype=numpy.float64)
+		if self.num_best is None:
+			scores = self.get_similarities(query_matrix)
+			return scores if _is_corpus else scores[0]
+		results = to_query_results(*self.batch_query(query_matrix))
+		return results if _is_corpus else results[0]
+	
+	def prepare_query(self, query_matrix):
+		"""查询向量归一化后截断或填充到索引的特征维数, 转为稠密的float32数组"""
+		query_matrix = resize_columns(normalize_rows(query_matrix), self.num_features)
+		if sparse.issparse(query_matrix):
+			query_matrix = query_matrix.toarray()
+		return numpy.asarray(query_matrix, dtype=numpy.float32)
+	
+	def get_similarities(self, query_matrix):
+		"""精确计算查询与所有文档的余弦相似度, 形状为(n_queries, n_documents)"""
+		return self.prepare_query(query_matrix) @ self.vectors.T
+	
+	def get_candidate_similarities(self, query_matrix, candidates):
+		"""计算每个查询与各自的候选文档的精确余弦相似度, 形状与candidates相同, 用于级联检索的第二阶段重排"""
+		return candidate_inner_products(self.vectors, self.prepare_query(query_matrix), candidates)
+	
+	def batch_query(self, query_matrix, num_best=None):
+		"""
+		批量近似查询
+		:param query_matrix	: 形状为(n_queries, n_features)的CSR矩阵或二维numpy数组
+		:param num_best		: 每个查询返回的结果数, 默认使用self.num_best
+		:return indices		: 形状为(n_queries, num_best)的文档编号, 不足的位置填充-1
+		:return values		: 形状为(n_queries, num_best)的得分
+		"""
+		num_best = self.num_best if num_best is None else num_best
+		num_best = min(num_best, len(self))
+		queries = self.prepare_query(query_matrix)
+		n_queries = queries.shape[0]
+		n_subspaces, n_codewords, subspace_size = self.codebooks.shape
+		nprobe = max(1, min(self.nprobe, self.centroids.shape[0]))
+		
+		# 粗量化得分与每个子空间的查表: 查询与文档的内积 = 查询与中心的内积 + 查询与残差的内积
+		coarse_scores = queries @ self.centroids.T
+		probes = numpy.argpartition(-coarse_scores, nprobe - 1, axis=1)[:, : nprobe]
+		padded_queries = numpy.zeros((n_queries, n_subspaces * subspace_size), dtype=numpy.float32)
+		padded_queries[:, : queries.shape[1]] = queries
+		tables = numpy.einsum('qmd,mkd->qmk', padded_queries.reshape(n_queries, n_subspaces, subspace_size), self.codebooks)
+		
+		indices = numpy.full((n_queries, num_best), -1, dtype=numpy.int64)
+		values = numpy.zeros((n_queries, num_best), dtype=numpy.float32)
+		subspaces = numpy.arange(n_subspaces)
+		for i in range(n_queries):
+			starts, ends = self.list_indptr[probes[i]], self.list_indptr[probes[i] + 1]
+			sizes = ends - starts
+			if sizes.sum() == 0:
+				continue
+			positions = numpy.concatenate([numpy.arange(start, end) for start, end in zip(starts, ends)])
+			estimates = numpy.repeat(coarse_scores[i, probes[i]], sizes) + tables[i][subspaces[None, :], self.codes[positions]].sum(axis=1)
+			if self.rerank > 0:
+				# 对估计得分最高的rerank个候选用原始向量精确计算得分
+				n_rerank = min(max(self.rerank, num_best), positions.shape[0])
+				shortlist = numpy.argpartition(-estimates, n_rerank - 1)[: n_rerank] if n_rerank < positions.shape[0] else numpy.arange(positions.shape[0])
+				candidates = self.list_ids[positions[shortlist]]
+				scores = self.vectors[candidates] @ queries[i]
+			else:
+				candidates = self.list_ids[positions]
+				scores = estimates
+			_indices, _values = select_top_k(scores[None, :], k=num_best, by_magnitude=False)
+			valid = _indices[0] >= 0
+			indices[i, : valid.sum()] = candidates[_indices[0][valid]]
+			values[i, : valid.sum()] = _values[0][valid]
+		return indices, values
+	
+	def evaluate_recall(self, query_matrix, num_best=None):
+		"""
+		评估近似查询相对精确查询的召回率
+		:param query_matrix	: 形状为(n_queries, n_features)的查询矩阵
+		:param num_best		: 评估的结果数, 默认使用self.num_best
+		:return recall		: 近似查询前num_best个结果中属于精确查询前num_best个结果的比例的均值
+		"""
+		num_best = self.num_best if num_best is None else num_best
+		approximate_indices, _ = self.batch_query(query_matrix, num_best=num_best)
+		exact_indices, _ = select_top_k(self.get_similarities(query_matrix), k=min(num_best, len(self)), by_magnitude=False)
+		recalls = []
+		for approximate, exact in zip(approximate_indices, exact_indices):
+			exact = exact[exact >= 0]
+			if exact.shape[0] > 0:
+				recalls.append(numpy.intersect1d(approximate[approximate >= 0], exact).shape[0] / exact.shape[0])
+		return float(numpy.mean(recalls)) if recalls else 1.
+
+
+class SoftCosineIndex:
+	"""
+	软余弦相似度索引: 查询x与文档y的相似度为x^T S y / sqrt(x^T S x * y^T S y), 其中S是由词向量构建的稀疏分词相似度矩阵
+	与gensim中SoftCosineSimilarity的计算方式一致, 区别在于S只构建一次并与文档矩阵一起保存, 查询时批量计算
+	"""
+	def __init__(self, documents, term_similarity, document_norms, num_best=None, block_size=256):
+		"""
+		:param documents		: 形状为(n_documents, n_terms)的CSR词频矩阵
+		:param term_similarity	: 形状为(n_terms, n_terms)的对称CSR分词相似度矩阵, 对角线为1
+		:param document_norms	: 形状为(n_documents, )的数组, 即sqrt(y^T S y)
+		:param num_best			: 每个查询返回的结果数, 为None时返回全部文档的得分
+		:param block_size		: 批量查询时每块的查询数
+		"""
+		self.documents = documents
+		self.term_similarity = term_similarity
+		self.document_norms = document_norms
+		self.num_best = num_best
+		self.block_size = block_size
+	
+	@classmethod
+	def build_term_similarity(cls, vectors, nonzero_limit=100, threshold=0., exponent=2., approximate=False, block_size=256):
+		"""
+		分块计算每个分词余弦相似度最高的nonzero_limit个分词, 构建稀疏分词相似度矩阵, 与gensim中WordEmbeddingSimilarityIndex的相似度定义一致
+		:param vectors			: 形状为(n_terms, d)的词向量矩阵, 第i行是字典中编号为i的分词的词向量, 没有词向量的分词为零向量
+		:param nonzero_limit	: 每个分词保留的最相似分词数(不含自身)
+		:param threshold		: 余弦相似度不超过该值的分词对不保留
+		:param exponent			: 保留的余弦相似度取该次幂
+		:param approximate		: 是否用IVF-PQ近似最近邻索引查找最相似的分词
+		:param block_size		: 精确计算时每块的分词数
+		:return term_similarity	: 形状为(n_terms, n_terms)的对称CSR矩阵, 对角线为1, 两个方向的相似度取较大值
+		"""
+		vectors = normalize_rows(numpy.asarray(vectors, dtype=numpy.float32))
+		n_terms = vectors.shape[0]
+		valid_terms = numpy.flatnonzero(numpy.abs(vectors).sum(axis=1) > 0)
+		k = min(nonzero_limit, max(valid_terms.shape[0] - 1, 0))
+		rows, columns, values = [], [], []
+		if k > 0 and approximate:
+			ann_index = IVFPQIndex.from_matrix(vectors[valid_terms], num_best=k + 1)
+			for start in range(0, valid_terms.shape[0], block_size):
+				indices, scores = ann_index.batch_query(vectors[valid_terms[start: start + block_size]])
+				_rows = numpy.repeat(valid_terms[start: start + block_size], indices.shape[1])
+				_columns = numpy.where(indices >= 0, valid_terms[numpy.maximum(indices, 0)], -1).ravel()
+				keep = (_columns >= 0) & (_columns != _rows) & (scores.ravel() > threshold)
+				rows.append(_rows[keep])
+				columns.append(_columns[keep])
+				values.append(scores.ravel()[keep])
+		elif k > 0:
+			valid_vectors = vectors[valid_terms]
+			for start in range(0, valid_terms.shape[0], block_size):
+				scores = vectors[valid_terms[start: start + block_size]] @ valid_vectors.T
+				scores[numpy.arange(scores.shape[0]), numpy.arange(start, start + scores.shape[0])] = -numpy.inf	# 排除分词自身
+				indices = numpy.argpartition(-scores, k - 1, axis=1)[:, : k]
+				_scores = numpy.take_along_axis(scores, indices, axis=1).ravel()
+				_rows = numpy.repeat(valid_terms[start: start + block_size], k)
+				_columns = valid_terms[indices].ravel()
+				keep = _scores > threshold
+				rows.append(_rows[keep])
+				columns.append(_columns[keep])
+				values.append(_scores[keep])
+		if rows:
+			rows, columns, values = numpy.concatenate(rows), numpy.concatenate(columns), numpy.concatenate(values)
+		else:
+			rows, columns, values = numpy.zeros((0, ), dtype=numpy.int64), numpy.zeros((0, ), dtype=numpy.int64), numpy.zeros((0, ), dtype=numpy.float32)
+		term_similarity = sparse.csr_matrix((numpy.power(values, exponent).astype(numpy.float32), (rows, columns)), shape=(n_terms, n_terms))
+		term_similarity = term_similarity.maximum(term_similarity.T).tolil()
+		term_similarity.setdiag(1.)
+		return term_similarity.tocsr()
+	
+	@classmethod
+	def from_corpus(cls, corpus, term_similarity, num_best=None, block_size=256):
+		"""
+		从gensim语料与分词相似度矩阵构建索引
+		:param corpus			: gensim语料(词频)
+		:param term_similarity	: build_term_similarity的返回值
+		"""
+		documents = resize_columns(corpus_to_csr(corpus), term_similarity.shape[0])
+		document_norms = numpy.zeros((documents.shape[0], ), dtype=numpy.float32)
+		for start in range(0, documents.shape[0], 4096):
+			block = documents[start: start + 4096]
+			document_norms[start: start + 4096] = numpy.asarray((block @ term_similarity).multiply(block).sum(axis=1)).ravel()
+		document_norms = numpy.sqrt(numpy.maximum(document_norms, 0))
+		return cls(documents=documents, term_similarity=term_similarity, document_norms=document_norms, num_best=num_best, block_size=block_size)
+	
+	def save(self, export_path):
+		"""保存索引: 文档矩阵与分词相似度矩阵分别保存CSR的三个数组"""
+		arrays = {
+			'documents_data'			: self.documents.data, 
+			'documents_indices'			: self.documents.indices, 
+			'documents_indptr'			: self.documents.indptr, 
+			'term_similarity_data'		: self.term_similarity.data, 
+			'term_similarity_indices'	: self.term_similarity.indices, 
+			'term_similarity_indptr'	: self.term_similarity.indptr,
+			'document_norms'			: self.document_norms,
+		}
+		save_arrays(export_path, arrays=arrays, meta={'documents_shape': list(self.documents.shape), 'term_similarity_shape': list(self.term_similarity.shape)})
+	
+	@classmethod
+	def load(cls, import_path, num_best=None, mmap_mode='r', **kwargs):
+		"""加载索引: 默认以内存映射方式只读加载"""
+		arrays, meta = load_arrays(import_path, mmap_mode=mmap_mode)
+		documents = sparse.csr_matrix((arrays['documents_data'], arrays['documents_indices'], arrays['documents_indptr']), shape=tuple(meta['documents_shape']), copy=False)
+		term_similarity = sparse.csr_matrix((arrays['term_similarity_data'], arrays['term_similarity_indices'], arrays['term_similarity_indptr']), shape=tuple(meta['term_similarity_shape']), copy=False)
+		return cls(documents=documents, term_similarity=term_similarity, document_norms=arrays['document_norms'], num_best=num_best, **kwargs)
+	
+	@property
+	def num_features(self):
+		return self.term_similarity.shape[0]
+	
+	def __len__(self):
+		return self.documents.shape[0]
+	
+	def __getitem__(self, query):
+		"""兼容gensim的SoftCosineSimilarity: 输入一条查询或一个查询语料, 返回[(文档编号, 得分), ...]形式的结果, num_best为None时返回得分向量"""
+		_is_corpus, query = is_corpus(query)
+		query_matrix = corpus_to_csr(query if _is_corpus else [query], num_features=self.num_features)
+		if self.num_best is None:
+			scores = self.get_similarities(query_matrix)
+			return scores if _is_corpus else scores[0]
+		results = to_query_results(*self.batch_query(query_matrix))
+		return results if _is_corpus else results[0]
+	
+	def get_similarities(self, query_matrix):
+		"""计算查询与所有文档的软余弦相似度, 形状为(n_queries, n_documents)"""
+		query_matrix = resize_columns(sparse.csr_matrix(query_matrix, dtype=numpy.float32), self.num_features)
+		projected = query_matrix @ self.term_similarity
+		query_norms = numpy.sqrt(numpy.maximum(numpy.asarray(projected.multiply(query_matrix).sum(axis=1)).ravel(), 0))
+		scores = numpy.asarray((projected @ self.documents.T).todense())
+		query_norms[query_norms == 0] = 1.		# 与gensim一致, 范数为零时不做归一化
+		document_norms = numpy.where(self.document_norms == 0, 1., self.document_norms)
+		return numpy.clip(scores / query_norms[:, None] / document_norms[None, :], -1., 1.)
+	
+	def get_candidate_similarities(self, query_matrix, candidates):
+		"""计算每个查询与各自的候选文档的软余弦相似度, 形状与candidates相同, 用于级联检索的第二阶段重排"""
+		query_matrix = resize_columns(sparse.csr_matrix(query_matrix, dtype=numpy.float32), self.num_features)
+		projected = query_matrix @ self.term_similarity
+		query_norms = numpy.sqrt(numpy.maximum(numpy.asarray(projected.multiply(query_matrix).sum(axis=1)).ravel(), 0))
+		scores = candidate_inner_products(self.documents, projected, candidates)
+		query_norms[query_norms == 0] = 1.
+		document_norms = numpy.asarray(self.document_norms)[numpy.maximum(candidates, 0)]
+		document_norms[document_norms == 0] = 1.
+		return numpy.clip(scores / query_norms[:, None] / document_norms, -1., 1.)
+	
+	def get_block_similarities(self, query_matrix, start, end):
+		"""计算查询与第start至end个文档的软余弦相似度, 形状为(n_queries, end - start)"""
+		return SoftCosineIndex(self.documents[start: end], self.term_similarity, self.document_norms[start: end]).get_similarities(query_matrix)
+	
+	def take(self, rows):
+		"""取出指定的文档组成新的索引, 分词相似度矩阵共用"""
+		return SoftCosineIndex(self.documents[rows], self.term_similarity, numpy.asarray(self.document_norms)[rows], num_best=self.num_best, block_size=self.block_size)
+	
+	def batch_query(self, query_matrix, num_best=None):
+		"""
+		分块批量查询
+		:param query_matrix	: 形状为(n_queries, n_terms)的CSR矩阵
+		:param num_best		: 每个查询返回的结果数, 默认使用self.num_best
+		:return indices		: 形状为(n_queries, num_best)的文档编号, 不足的位置填充-1
+		:return values		: 形状为(n_queries, num_best)的得分
+		"""
+		num_best = self.num_best if num_best is None else num_best
+		query_matrix = sparse.csr_matrix(query_matrix)
+		indices, values = [], []
+		for start in range(0, query_matrix.shape[0], self.block_size):
+			_indices, _values = select_top_k(self.get_similarities(query_matrix[start: start + self.block_size]), k=num_best)
+			indices.append(_indices)
+			values.append(_values)
+		if not indices:
+			k = min(num_best, len(self))
+			return numpy.zeros((0, k), dtype=numpy.int64), numpy.zeros((0, k), dtype=numpy.float32)
+		return numpy.vstack(indices), numpy.vstack(values)
+
+
+class DenseIndex:
+	"""
+	稠密向量的最大内积检索索引: 段落向量以float16或int8(每行一个缩放系数)存储
+	查询时按段落分块计算矩阵乘积, 每块用argpartition选出前num_best个候选再与已有结果合并, 得分矩阵的内存占用只与块大小有关
+	"""
+	def __init__(self, matrix, scales=None, num_best=None, block_size=65536, query_block_size=1024):
+		"""
+		:param matrix			: 形状为(n_documents, num_features)的float16或int8数组
+		:param scales			: 形状为(n_documents, )的int8量化缩放系数, float16存储时为None
+		:param num_best			: 每个查询返回的结果数
+		:param block_size		: 每块参与矩阵乘法的段落数
+		:param query_block_size	: 批量查询时每块的查询数
+		"""
+		self.matrix = matrix
+		self.scales = scales
+		self.num_best = num_best
+		self.block_size = block_size
+		self.query_block_size = query_block_size
+
+	@classmethod
+	def quantize(cls, matrix, dtype='float16'):
+		"""
+		量化段落向量矩阵
+		:param matrix	: 形状为(n_documents, num_features)的浮点数组
+		:param dtype	: float16直接转换, int8按行对称量化, 即每行除以最大绝对值的1/127后取整
+		:return matrix	: 量化后的数组
+		:return scales	: int8量化的缩放系数, float16时为None
+		"""
+		if dtype == 'float16':
+			return numpy.asarray(matrix, dtype=numpy.float16), None
+		if dtype == 'int8':
+			scales = numpy.abs(matrix).max(axis=1).astype(numpy.float32) / 127. if matrix.shape[1] > 0 else numpy.ones((matrix.shape[0], ), dtype=numpy.float32)
+			scales[scales == 0] = 1.
+			return numpy.round(matrix / scales[:, None]).astype(numpy.int8), scales
+		raise NotImplementedError(f'不支持的存储类型: {dtype}')
+
+	@classmethod
+	def from_matrix(cls, matrix, dtype='float16', **kwargs):
+		"""由浮点的段落向量矩阵构建索引"""
+		matrix, scales = cls.quantize(matrix, dtype=dtype)
+		return cls(matrix, scales=scales, **kwargs)
+
+	def save(self, export_path):
+		"""保存索引: int8存储时另外保存缩放系数"""
+		arrays = {'matrix': self.matrix}
+		if self.scales is not None:
+			arrays['scales'] = self.scales
+		save_arrays(export_path, arrays=arrays, meta={'dtype': str(self.matrix.dtype), 'shape': list(self.matrix.shape)})
+
+	@classmethod
+	def load(cls, import_path, num_best=None, mmap_mode='r', **kwargs):
+		"""加载索引: 默认以内存映射方式只读加载"""
+		arrays, meta = load_arrays(import_path, mmap_mode=mmap_mode)
+		return cls(arrays['matrix'], scales=arrays.get('scales'), num_best=num_best, **kwargs)
+
+	@property
+	def num_features(self):
+		return self.matrix.shape[1]
+
+	def __len__(self):
+		return self.matrix.shape[0]
+
+	def __getitem__(self, query):
+		"""输入一个或一组查询向量, 返回[(文档编号, 得分), ...]形式的结果, num_best为None时返回得分向量"""
+		query_matrix = numpy.asarray(query, dtype=numpy.float32)
+		_is_batch = query_matrix.ndim == 2
+		query_matrix = query_matrix if _is_batch else query_matrix[None, :]
+		if self.num_best is None:
+			scores = self.get_similarities(query_matrix)
+			return scores if _is_batch else scores[0]
+		results = to_query_results(*self.batch_query(query_matrix))
+		return results if _is_batch else results[0]
+
+	def get_block_similarities(self, query_matrix, start, end):
+		"""计算查询与第start至end个段落的内积, 形状为(n_queries, end - start)"""
+		block = numpy.asarray(self.matrix[start: end], dtype=numpy.float32)
+		scores = query_matrix @ block.T
+		if self.scales is not None:
+			scores *= self.scales[start: end][None, :]
+		return scores
+
+	def get_similarities(self, query_matrix):
+		"""计算查询与所有段落的内积, 形状为(n_queries, n_documents)"""
+		return self.get_block_similarities(numpy.asarray(query_matrix, dtype=numpy.float32), 0, len(self))
+
+	def get_candidate_similarities(self, query_matrix, candidates):
+		"""计算每个查询与各自的候选文档的内积, 形状与candidates相同, 用于级联检索的第二阶段重排"""
+		scores = candidate_inner_products(self.matrix, numpy.asarray(query_matrix, dtype=numpy.float32), candidates)
+		if self.scales is not None:
+			scores *= numpy.asarray(self.scales)[numpy.maximum(candidates, 0)]
+		return scores
+
+	def take(self, rows):
+		"""取出指定的段落组成新的索引"""
+		return DenseIndex(numpy.asarray(self.matrix[rows]), scales=None if self.scales is None else numpy.asarray(self.scales)[rows], num_best=self.num_best, block_size=self.block_size, query_block_size=self.query_block_size)
+
+	def batch_query(self, query_matrix, num_best=None):
+		"""
+		分块的最大内积检索
+		:param query_matrix	: 形状为(n_queries, num_features)的查询向量, 全零的查询没有结果
+		:param num_best		: 每个查询返回的结果数, 默认使用self.num_best
+		:return indices		: 形状为(n_queries, num_best)的文档编号, 按得分降序排列, 不足的位置填充-1
+		:return values		: 形状为(n_queries, num_best)的得分
+		"""
+		num_best = min(self.num_best if num_best is None else num_best, len(self))
+		query_matrix = numpy.asarray(query_matrix, dtype=numpy.float32)
+		indices = numpy.full((query_matrix.shape[0], num_best), -1, dtype=numpy.int64)
+		values = numpy.zeros((query_matrix.shape[0], num_best), dtype=numpy.float32)
+		if num_best == 0:
+			return indices, values
+		for query_start in range(0, query_matrix.shape[0], self.query_block_size):
+			query_end = min(query_start + self.query_block_size, query_matrix.shape[0])
+			queries = query_matrix[query_start: query_end]
+			best_indices = numpy.zeros((queries.shape[0], 0), dtype=numpy.int64)
+			best_values = numpy.zeros((queries.shape[0], 0), dtype=numpy.float32)
+			for start in range(0, len(self), self.block_size):
+				scores = self.get_block_similarities(queries, start, min(start + self.block_size, len(self)))
+				candidates = numpy.argpartition(-scores, min(num_best, scores.shape[1]) - 1, axis=1)[:, :num_best]
+				best_indices = numpy.hstack([best_indices, candidates + start])
+				best_values = numpy.hstack([best_values, numpy.take_along_axis(scores, candidates, axis=1)])
+				if best_values.shape[1] > num_best:		# 与之前各块的结果合并后只保留前num_best个
+					candidates = numpy.argpartition(-best_values, num_best - 1, axis=1)[:, :num_best]
+					best_indices = numpy.take_along_axis(best_indices, candidates, axis=1)
+					best_values = numpy.take_along_axis(best_values, candidates, axis=1)
+			order = numpy.lexsort((best_indices, -best_values), axis=1)		# 得分降序, 得分相同时编号小的在前
+			valid = queries.any(axis=1)
+			indices[query_start: query_end][valid] = numpy.take_along_axis(best_indices, order, axis=1)[valid]
+			values[query_start: query_end][valid] = numpy.take_along_axis(best_values, order, axis=1)[valid]
+		return indices, values
+
+
+class ShardedIndex:
+	"""
+	按法律门类分片的相似度索引: 参考书目段落按所属门类重新排列, 每个门类是基础索引中连续的一段, 即一个分片
+	查询时每道题目只计算指定门类的分片, 各分片的前num_best个结果合并后再选出前num_best个, 计算量只与相关门类的段落数有关
+	基础索引需要实现take与get_block_similarities, 目前为SimilarityIndex, SoftCosineIndex, DenseIndex与BM25Index
+	"""
+	def __init__(self, index, document_ids, shard_indptr, num_best=None):
+		"""
+		:param index		: 按分片重新排列后的基础索引
+		:param document_ids	: 形状为(n_documents, )的数组, 基础索引的第i行对应原参考书目文档的第document_ids[i]个段落
+		:param shard_indptr	: 形状为(n_shards + 1, )的数组, 第s个分片为基础索引的第shard_indptr[s]至shard_indptr[s + 1]行
+		:param num_best		: 每个查询返回的结果数
+		"""
+		self.index = index
+		self.document_ids = document_ids
+		self.shard_indptr = shard_indptr
+		self.num_best = num_best
+		self.by_magnitude = not isinstance(index, DenseIndex)		# 稠密检索按内积最大选择结果, 其余与gensim一致按绝对值选择
+
+	@classmethod
+	def from_index(cls, index, shard_labels, num_best=None):
+		"""
+		由未分片的索引构建
+		:param index		: 基础索引
+		:param shard_labels	: 形状为(n_documents, )的每个段落所属的分片编号, 即SUBJECT2INDEX的值
+		:param num_best		: 每个查询返回的结果数
+		"""
+		shard_labels = numpy.asarray(shard_labels, dtype=numpy.int64)
+		document_ids = numpy.argsort(shard_labels, kind='stable')
+		shard_indptr = numpy.zeros((int(shard_labels.max()) + 2 if shard_labels.shape[0] > 0 else 1, ), dtype=numpy.int64)
+		shard_indptr[1: ] = numpy.cumsum(numpy.bincount(shard_labels, minlength=shard_indptr.shape[0] - 1))
+		return cls(index.take(document_ids), document_ids=document_ids, shard_indptr=shard_indptr, num_best=num_best)
+
+	def save(self, export_path):
+		"""保存索引: 分片信息保存在export_path中, 基础索引保存在其中的index文件夹"""
+		save_arrays(export_path, arrays={'document_ids': self.document_ids, 'shard_indptr': self.shard_indptr}, meta={'index_class': type(self.index).__name__})
+		self.index.save(os.path.join(export_path, 'index'))
+
+	@classmethod
+	def load(cls, import_path, num_best=None, mmap_mode='r', **kwargs):
+		"""加载索引: 默认以内存映射方式只读加载"""
+		arrays, meta = load_arrays(import_path, mmap_mode=mmap_mode)
+		index = eval(meta['index_class']).load(os.path.join(import_path, 'index'), num_best=num_best, mmap_mode=mmap_mode, **kwargs)
+		return cls(index, document_ids=arrays['document_ids'], shard_indptr=arrays['shard_indptr'], num_best=num_best)
+
+	@property
+	def num_features(self):
+		return self.index.num_features
+
+	@property
+	def n_shards(self):
+		return self.shard_indptr.shape[0] - 1
+
+	def __len__(self):
+		return len(self.index)
+
+	def get_similarities(self, query_matrix):
+		"""计算查询与所有段落的得分, 按原参考书目文档的段落顺序排列, 形状为(n_queries, n_documents)"""
+		scores = numpy.zeros((query_matrix.shape[0], len(self)), dtype=numpy.float32)
+		scores[:, self.document_ids] = self.index.get_block_similarities(query_matrix, 0, len(self))
+		return scores
+
+	def batch_query(self, query_matrix, num_best=None, shards=None):
+		"""
+		分片批量查询
+		:param query_matrix	: 形状为(n_queries, num_features)的查询矩阵, 与基础索引的查询形式相同
+		:param num_best		: 每个查询返回的结果数, 默认使用self.num_best
+		:param shards		: 形状为(n_queries, n_selected)的每个查询检索的分片编号, 不存在的分片(如0)会被忽略, 默认检索所有分片
+		:return indices		: 形状为(n_queries, num_best)的原参考书目文档段落编号, 不足的位置填充-1
+		:return values		: 形状为(n_queries, num_best)的得分
+		"""
+		num_best = min(self.num_best if num_best is None else num_best, len(self))
+		n_queries = query_matrix.shape[0]
+		if shards is None:
+			shards = numpy.tile(numpy.arange(self.n_shards), (n_queries, 1))
+		shards = numpy.array(shards, dtype=numpy.int64).reshape(n_queries, -1)
+		for column in range(1, shards.shape[1]):
+			shards[(shards[:, column: column + 1] == shards[:, : column]).any(axis=1), column] = -1		# 同一查询重复指定的分片只检索一次
+
+		# 每个查询在每个选中的分片中的局部结果放在candidate_indices与candidate_values的对应列中
+		fill_value = 0. if self.by_magnitude else -numpy.inf		# 没有结果的位置在合并时不会被选中
+		candidate_indices = numpy.full((n_queries, shards.shape[1] * num_best), -1, dtype=numpy.int64)
+		candidate_values = numpy.full((n_queries, shards.shape[1] * num_best), fill_value, dtype=numpy.float32)
+		for shard in numpy.unique(shards):
+			if shard < 0 or shard >= self.n_shards or self.shard_indptr[shard] == self.shard_indptr[shard + 1]:
+				continue
+			start, end = self.shard_indptr[shard], self.shard_indptr[shard + 1]
+			rows, columns = numpy.nonzero(shards == shard)
+			_indices, _values = select_top_k(self.index.get_block_similarities(query_matrix[rows], start, end), k=num_best, by_magnitude=self.by_magnitude)
+			slots = columns[:, None] * num_best + numpy.arange(_indices.shape[1])[None, :]
+			valid = _indices >= 0
+			candidate_indices[rows[:, None], slots] = numpy.where(valid, self.document_ids[start + numpy.maximum(_indices, 0)], -1)
+			candidate_values[rows[:, None], slots] = numpy.where(valid, _values, fill_value)
+
+		# 合并各分片的局部结果
+		order, values = select_top_k(candidate_values, k=num_best, by_magnitude=self.by_magnitude)
+		indices = numpy.where(order >= 0, numpy.take_along_axis(candidate_indices, numpy.maximum(order, 0), axis=1), -1)
+		return indices, values
+
+
+class RetrievalTable:
+	"""
+	离线预计算的检索结果表: 每道题目一行, 第r列即排名为r的(question_id, rank, paragraph_index, score)记录
+	题目编号按字典序排列, 查表时用二分查找定位行号, 所有检索工作在预处理后都变成数组索引
+	"""
+	def __init__(self, question_ids, paragraph_indices, scores):
+		"""
+		:param question_ids			: 形状为(n_questions, )的题目编号字符串数组
+		:param paragraph_indices	: 形状为(n_questions, num_best)的参考书目段落编号, 不足num_best的位置填充-1
+		:param scores				: 形状为(n_questions, num_best)的得分
+		"""
+		order = numpy.argsort(question_ids, kind='stable')
+		if numpy.any(order[1: ] < order[: -1]):		# 加载时已经有序, 无需重排
+			question_ids, paragraph_indices, scores = question_ids[order], paragraph_indices[order], scores[order]
+		self.question_ids = question_ids
+		self.paragraph_indices = paragraph_indices
+		self.scores = scores
+	
+	def save(self, export_path, meta=None):
+		"""保存结果表: 段落编号与得分分别压缩为int32与float32"""
+		arrays = {
+			'question_ids'		: self.question_ids.astype(str), 
+			'paragraph_indices'	: self.paragraph_indices.astype(numpy.int32), 
+			'scores'			: self.scores.astype(numpy.float32),
+		}
+		save_arrays(export_path, arrays=arrays, meta={} if meta is None else meta)
+	
+	@classmethod
+	def load(cls, import_path, mmap_mode='r'):
+		"""加载结果表: 默认以内存映射方式只读加载"""
+		arrays, meta = load_arrays(import_path, mmap_mode=mmap_mode)
+		return cls(**arrays)
+	
+	def __len__(self):
+		return self.question_ids.shape[0]
+	
+	def lookup(self, question_ids):
+		"""
+		查询一组题目的检索结果
+		:param question_ids	: 题目编号列表
+		:return indices		: 形状为(n, num_best)的段落编号, 不足的位置填充-1
+		:return values		: 形状为(n, num_best)的得分
+		"""
+		question_ids = numpy.asarray(question_ids, dtype=str)
+		rows = numpy.searchsorted(self.question_ids, question_ids)
+		rows = numpy.minimum(rows, len(self) - 1)
+		missing = self.question_ids[rows] != question_ids
+		assert not missing.any(), f'检索结果表中没有以下题目: {question_ids[missing][: 10].tolist()}'
+		return numpy.asarray(self.paragraph_indices[rows], dtype=numpy.int64), numpy.asarray(self.scores[rows])
+	
+	def query_results(self, question_ids):
+		"""查询一组题目的检索结果, 返回形式与GensimRetrievalModel.query相同"""
+		return to_query_results(*self.lookup(question_ids))
+
+
+class DenseEncoder(Module):
+	"""
+	稠密检索的编码器: 题目与参考书目段落共用同一个编码器(双塔共享参数)
+	分词编号经加权的词向量求和(EmbeddingBag)后线性投影, 再按L2归一化, 两个输出向量的内积即为余弦相似度
+	"""
+	def __init__(self, n_tokens, d_embedding, d_output=None):
+		"""
+		:param n_tokens		: 分词数, 即字典长度
+		:param d_embedding	: 词向量维数
+		:param d_output		: 输出维数, 默认与词向量维数相同
+		"""
+		super(DenseEncoder, self).__init__()
+		self.d_output = d_embedding if d_output is None else d_output
+		self.embedding = EmbeddingBag(n_tokens, d_embedding, mode='sum')
+		self.projection = Linear(d_embedding, self.d_output, bias=False)
+		self.register_buffer('token_weights', torch.ones(n_tokens))
+
+	@classmethod
+	def from_word_vectors(cls, vectors, token_weights, d_output=None):
+		"""
+		由按字典编号排列的词向量与分词权重初始化编码器: 输出维数与词向量维数相同时投影层初始化为单位矩阵, 否则为随机投影
+		:param vectors			: 形状为(n_tokens, d_embedding)的词向量矩阵
+		:param token_weights	: 形状为(n_tokens, )的分词权重
+		:param d_output			: 输出维数
+		"""
+		encoder = cls(vectors.shape[0], vectors.shape[1], d_output=d_output)
+		with torch.no_grad():
+			encoder.embedding.weight.copy_(torch.from_numpy(numpy.asarray(vectors, dtype=numpy.float32)))
+			encoder.token_weights.copy_(torch.from_numpy(numpy.asarray(token_weights, dtype=numpy.float32)))
+			if encoder.d_output == vectors.shape[1]:
+				encoder.projection.weight.copy_(torch.eye(vectors.shape[1]))
+		return encoder
+
+	def forward(self, ids, offsets):
+		"""
+		:param ids		: 所有文本的分词编号拼接成的一维LongTensor
+		:param offsets	: 每个文本在ids中的起始位置
+		:return output	: 形状为(n_texts, d_output)的单位向量, 空文本为零向量
+		"""
+		output = self.embedding(ids, offsets, per_sample_weights=self.token_weights[ids])
+		return F.normalize(self.projection(output), dim=1)
+
+
+class NeuralRetrieveModel:
+	"""
+	基于神经网络模型的文档检索: 稠密双塔检索
+	参考书目段落在预处理时离线编码并以float16/int8矩阵保存, 题目在查询时在线编码, 再对段落矩阵做分块的最大内积检索
+	查询接口与GensimRetrievalModel一致, 其中模型序列为只包含编码器的列表
+	"""
+	def __init__(self, args, **kwargs):
+		"""
+		:param args	: RetrievalModelConfig配置
+		"""
+		self.args = deepcopy(args)
+
+		if self.args.filter_stopword:
+			self.stopwords = load_stopwords(stopword_names=None)
+
+	@timer
+	def build_encoder(self, model_name='neural', export_path=None):
+		"""
+		由gensim词向量初始化编码器并保存: 词向量按字典编号排列, 分词权重与gensim的TfidfModel默认的逆文档频率一致, 即log2(段落数 / 文档频数)
+		:param model_name	: 模型名称
+		:param export_path	: 编码器保存路径, 默认为NEURAL_RETRIEVAL_MODEL_SUMMARY中的model字段
+		"""
+		summary = NEURAL_RETRIEVAL_MODEL_SUMMARY[model_name]
+		if export_path is None:
+			export_path = summary['model']
+		embedding_model_name = summary['embedding'] if self.args.embedding_neural is None else self.args.embedding_neural
+		keyedvectors = eval(GENSIM_EMBEDDING_MODEL_SUMMARY[embedding_model_name]['class']).load(GENSIM_EMBEDDING_MODEL_SUMMARY[embedding_model_name]['model']).wv
+		vocabulary = keyedvectors.key_to_index if hasattr(keyedvectors, 'key_to_index') else keyedvectors.vocab
+		dictionary = Dictionary.load(summary['dictionary'])
+		vectors = numpy.zeros((len(dictionary), keyedvectors.vector_size), dtype=numpy.float32)
+		for token, token_id in dictionary.token2id.items():
+			if token in vocabulary:
+				vectors[token_id] = keyedvectors[token]
+		token_weights = numpy.zeros((len(dictionary), ), dtype=numpy.float32)
+		for token_id, document_frequency in dictionary.dfs.items():
+			token_weights[token_id] = numpy.log2(dictionary.num_docs / document_frequency)
+		encoder = DenseEncoder.from_word_vectors(vectors, token_weights, d_output=self.args.d_output_neural)
+		os.makedirs(os.path.dirname(export_path), exist_ok=True)
+		save_checkpoint(encoder, export_path, n_tokens=vectors.shape[0], d_embedding=vectors.shape[1], d_output=encoder.d_output, embedding=embedding_model_name)
+		return encoder
+
+	def is_encoder_stale(self, model_name='neural'):
+		"""编码器是否需要重新初始化: 编码器缺失, 早于字典, 或分词数少于字典长度(增量更新参考书目后字典会新增分词)"""
+		summary = NEURAL_RETRIEVAL_MODEL_SUMMARY[model_name]
+		if not os.path.exists(summary['model']):
+			return True
+		if os.path.exists(summary['dictionary']) and os.path.getmtime(summary['model']) < os.path.getmtime(summary['dictionary']):
+			return True
+		return torch.load(summary['model'], map_location='cpu')['n_tokens'] < len(Dictionary.load(summary['dictionary']))
+
+	@classmethod
+	def load_sequence(cls, model_name='neural'):
+		"""加载模型序列, 即只包含编码器的列表"""
+		checkpoint = torch.load(NEURAL_RETRIEVAL_MODEL_SUMMARY[model_name]['model'], map_location='cpu')
+		encoder = DenseEncoder(checkpoint['n_tokens'], checkpoint['d_embedding'], d_output=checkpoint['d_output'])
+		encoder.load_state_dict(checkpoint['model'])
+		encoder.eval()
+		return [encoder]
+
+	@classmethod
+	def tokens_to_ids(cls, token_lists, dictionary):
+		"""
+		将分词列表转为EmbeddingBag的输入形式, 不在字典中的分词直接丢弃
+		:return ids		: 所有分词列表的字典编号拼接成的一维数组
+		:return offsets	: 形状为(n + 1, )的偏移量, 第i个分词列表为ids[offsets[i]: offsets[i + 1]]
+		"""
+		id_lists = [[token_id for token_id in dictionary.doc2idx(tokens) if token_id >= 0] for tokens in token_lists]
+		offsets = numpy.zeros((len(id_lists) + 1, ), dtype=numpy.int64)
+		offsets[1: ] = numpy.cumsum([len(_ids) for _ids in id_lists])
+		ids = numpy.fromiter((token_id for _ids in id_lists for token_id in _ids), dtype=numpy.int64, count=offsets[-1])
+		return ids, offsets
+
+	@classmethod
+	def encode(cls, encoder, ids, offsets, batch_size=4096):
+		"""
+		分批编码, 不计算梯度
+		:param encoder		: DenseEncoder
+		:param ids			: tokens_to_ids返回的分词编号
+		:param offsets		: tokens_to_ids返回的偏移量
+		:param batch_size	: 每批编码的文本数
+		:return vectors		: 形状为(n, d_output)的float32数组
+		"""
+		n_texts = offsets.shape[0] - 1
+		vectors = numpy.zeros((n_texts, encoder.d_output), dtype=numpy.float32)
+		with torch.no_grad():
+			for start in range(0, n_texts, batch_size):
+				end = min(start + batch_size, n_texts)
+				_ids = torch.from_numpy(numpy.asarray(ids[offsets[start]: offsets[end]], dtype=numpy.int64))
+				_offsets = torch.from_numpy(numpy.asarray(offsets[start: end] - offsets[start], dtype=numpy.int64))
+				vectors[start: end] = encoder(_ids, _offsets).numpy()
+		return vectors
+
+	@timer
+	def build_similarity_index(self, model_name='neural', export_path=None, batch_size=65536):
+		"""
+		离线编码参考书目文档的所有段落并构建最大内积检索索引: 在预处理阶段调用一次即可
+		二进制列式存储的文档直接把分词表映射为字典编号, 按块编码并量化, 不还原分词列表
+		:param model_name	: 模型名称
+		:param export_path	: 索引保存路径, 默认为NEURAL_RETRIEVAL_MODEL_SUMMARY中的index字段
+		:param batch_size	: 每块编码的段落数
+		"""
+		summary = NEURAL_RETRIEVAL_MODEL_SUMMARY[model_name]
+		if export_path is None:
+			export_path = summary['index']
+		encoder = self.load_sequence(model_name=model_name)[0]
+		dictionary = Dictionary.load(summary['dictionary'])
+		document = load_reference_document(summary['document'])
+		if isinstance(document, TokenColumn):
+			token2id = numpy.array([dictionary.token2id.get(token, -1) for token in document.vocabulary.tolist()], dtype=numpy.int64)	# 文档分词表到字典编号的映射
+		n_paragraphs = len(document)
+		matrix, scales = [], []
+		for start in range(0, n_paragraphs, batch_size):
+			end = min(start + batch_size, n_paragraphs)
+			if isinstance(document, TokenColumn):
+				ids = token2id[numpy.asarray(document.ids[document.offsets[start]: document.offsets[end]])]
+				kept = numpy.concatenate([[0], numpy.cumsum(ids >= 0)])
+				offsets = kept[numpy.asarray(document.offsets[start: end + 1]) - document.offsets[start]]
+				ids = ids[ids >= 0]
+			else:
+				ids, offsets = self.tokens_to_ids(document[start: end], dictionary)
+			_matrix, _scales = DenseIndex.quantize(self.encode(encoder, ids, offsets), dtype=self.args.dtype_neural)
+			matrix.append(_matrix)
+			scales.append(_scales)
+		matrix = numpy.vstack(matrix) if matrix else DenseIndex.quantize(numpy.zeros((0, encoder.d_output), dtype=numpy.float32), dtype=self.args.dtype_neural)[0]
+		scales = numpy.concatenate(scales) if scales and scales[0] is not None else None
+		similarity = DenseIndex(matrix, scales=scales, num_best=self.args.num_best, block_size=self.args.block_size_neural)
+		similarity.save(export_path)
+		return similarity
+
+	@timer
+	def build_similarity(self, model_name='neural'):
+		"""
+		加载段落向量索引: 以内存映射方式只读加载预处理时保存的索引, 编码器缺失或过期时重新初始化, 索引缺失或早于编码器与参考书目语料时重新构建
+		:param model_name	: 模型名称
+		"""
+		summary = NEURAL_RETRIEVAL_MODEL_SUMMARY[model_name]
+		if self.is_encoder_stale(model_name=model_name):
+			logging.warning(f'{model_name}模型的编码器不存在或早于字典, 重新构建: {summary["model"]}')
+			self.build_encoder(model_name=model_name, export_path=summary['model'])
+		index_path = summary['index']
+		meta_path = os.path.join(index_path, 'meta.json')
+		if not os.path.exists(meta_path) or any(os.path.exists(path) and os.path.getmtime(meta_path) < os.path.getmtime(path) for path in [summary['model'], REFERENCE_CORPUS_PATH]):
+			logging.warning(f'{model_name}模型的段落向量索引不存在或已过期, 重新构建: {index_path}')
+			self.build_similarity_index(model_name=model_name, export_path=index_path)
+		return eval(summary['index_class']).load(index_path, num_best=self.args.num_best, block_size=self.args.block_size_neural)
+
+	def query(self, query_tokens, dictionary, similarity, sequence):
+		"""
+		给定查询分词列表返回相似度匹配结果, 参数与GensimRetrievalModel.query相同
+		:param sequence	: 模型序列, 即load_sequence返回的只包含编码器的列表
+		"""
+		return self.batch_query(query_token_lists=[query_tokens], dictionary=dictionary, similarity=similarity, sequence=sequence)[0]
+
+	def batch_query(self, query_token_lists, dictionary, similarity, sequence, return_arrays=False, shards=None):
+		"""
+		批量查询: 所有查询一次性编码后与段落向量矩阵做分块的最大内积检索, 参数与GensimRetrievalModel.batch_query相同
+		:param sequence	: 模型序列, 即load_sequence返回的只包含编码器的列表
+		"""
+		query_matrix = self.build_query_matrix(query_token_lists=query_token_lists, dictionary=dictionary, sequence=sequence)
+		indices, values = similarity.batch_query(query_matrix) if shards is None else similarity.batch_query(query_matrix, shards=shards)
+		if return_arrays:
+			return indices, values
+		return to_query_results(indices, values)
+
+	def build_query_matrix(self, query_token_lists, dictionary, sequence):
+		"""将查询分词列表编码为形状为(n_queries, d_output)的查询向量矩阵, 参数与GensimRetrievalModel.build_query_matrix相同"""
+		if self.args.filter_stopword:
+			query_token_lists = [filter_stopwords(tokens=query_tokens, stopwords=self.stopwords) for query_tokens in query_token_lists]
+		ids, offsets = self.tokens_to_ids(query_token_lists, dictionary)
+		return self.encode(sequence[0], ids, offsets)
+
+
+
+class CascadeRetrievalModel:
+	"""
+	两阶段级联检索: 全库扫描代价较低的第一阶段模型(如tfidf, bm25)召回num_candidate个候选段落, 较重的第二阶段模型只对这些候选重新打分并返回前num_best个
+	第二阶段的计算量只与num_candidate有关, 软余弦, LSI, doc2vec等较慢的相似度在查询时也可以使用
+	查询接口与GensimRetrievalModel一致, 其中相似度索引与模型序列都是(第一阶段, 第二阶段)的二元组
+	在RETRIEVAL_MODEL_SUMMARY中注册为cascade, 由GensimRetrievalModel.dispatch分派
+	"""
+	def __init__(self, args, embedding_args=None, **kwargs):
+		"""
+		:param args				: RetrievalModelConfig配置, 其中first_stage_cascade与second_stage_cascade为两个阶段的模型名称, num_candidate_cascade为候选数
+		:param embedding_args	: 阶段模型为gensim词嵌入模型时使用的EmbeddingModelConfig配置, 默认加载命令行参数, 与args同名的参数与args保持一致
+		"""
+		self.args = deepcopy(args)
+		self.stages = [self.args.first_stage_cascade, self.args.second_stage_cascade]
+		self.num_candidate = max(self.args.num_candidate_cascade, self.args.num_best)
+		self.models = [self.load_model(model_name=model_name, args=self.args, embedding_args=embedding_args) for model_name in self.stages]
+		self.latency = {'first_stage': 0., 'second_stage': 0., 'n_queries': 0}		# 最近一次批量查询两个阶段各自的耗时(秒)
+
+	@classmethod
+	def load_model(cls, model_name, args, embedding_args=None):
+		"""模型名称对应的检索模型"""
+		if model_name in NEURAL_RETRIEVAL_MODEL_SUMMARY:
+			return NeuralRetrieveModel(args=args)
+		if model_name in GENSIM_RETRIEVAL_MODEL_SUMMARY:
+			return GensimRetrievalModel(args=args)
+		if model_name in GENSIM_EMBEDDING_MODEL_SUMMARY:
+			from src.embedding_model import GensimEmbeddingModel		# src.embedding_model依赖本模块, 只能在这里导入
+			embedding_args = deepcopy(load_args(Config=EmbeddingModelConfig) if embedding_args is None else embedding_args)
+			for key in vars(embedding_args):
+				if key in args:
+					embedding_args.__setattr__(key, args.__getattribute__(key))		# num_best, use_ann, filter_stopword等公共配置与级联检索保持一致
+			return GensimEmbeddingModel(args=embedding_args)
+		raise NotImplementedError(f'未知的检索模型: {model_name}')
+
+	@timer
+	def build_similarity_index(self, model_name='cascade'):
+		"""构建两个阶段的相似度索引并保存, 稠密检索模型的编码器缺失时先初始化"""
+		for model, stage in zip(self.models, self.stages):
+			if isinstance(model, NeuralRetrieveModel) and not os.path.exists(NEURAL_RETRIEVAL_MODEL_SUMMARY[stage]['model']):
+				model.build_encoder(model_name=stage)
+			model.build_similarity_index(model_name=stage)
+
+	def build_similarity(self, model_name='cascade', use_shard=False):
+		"""
+		加载两个阶段的相似度索引
+		:param model_name	: 模型名称, 即CASCADE_RETRIEVAL_MODEL_SUMMARY的键
+		:param use_shard	: 第一阶段是否使用按法律门类分片的相似度索引, 第二阶段只对候选打分, 不需要分片
+		"""
+		if use_shard:
+			first_stage_similarity = GensimRetrievalModel(args=self.args).build_sharded_similarity(model_name=self.stages[0])
+		else:
+			first_stage_similarity = self.models[0].build_similarity(model_name=self.stages[0])
+		return first_stage_similarity, self.models[1].build_similarity(model_name=self.stages[1])
+
+	def load_sequence(self, model_name='cascade'):
+		"""加载两个阶段的模型序列, 词嵌入模型没有模型序列"""
+		return tuple(model.load_sequence(model_name=stage) if hasattr(model, 'load_sequence') else None for model, stage in zip(self.models, self.stages))
+
+	def build_query_matrix(self, stage, query_token_lists, dictionary, similarity, sequence):
+		"""第stage个阶段的查询矩阵"""
+		model = self.models[stage]
+		if hasattr(model, 'load_sequence'):
+			return model.build_query_matrix(query_token_lists=query_token_lists, dictionary=dictionary, sequence=sequence[stage])
+		return model.build_query_matrix(query_token_lists=query_token_lists, dictionary=dictionary, similarity=similarity[stage])
+
+	def query(self, query_tokens, dictionary, similarity, sequence):
+		"""给定查询分词列表返回相似度匹配结果, 参数与GensimRetrievalModel.query相同"""
+		return self.batch_query(query_token_lists=[query_tokens], dictionary=dictionary, similarity=similarity, sequence=sequence)[0]
+
+	def batch_query(self, query_token_lists, dictionary, similarity, sequence, return_arrays=False, shards=None, block_size=256):
+		"""
+		批量级联查询, 两个阶段的耗时记录在self.latency中
+		:param query_token_lists	: 查询分词列表的列表
+		:param dictionary			: gensim字典
+		:param similarity			: build_similarity的返回值
+		:param sequence				: load_sequence的返回值
+		:param return_arrays		: 是否直接返回select_top_k形式的(indices, values)数组
+		:param shards				: 第一阶段相似度索引为ShardedIndex时每个查询检索的分片编号, 即GensimRetrievalModel.route_subjects的返回值, 默认检索所有分片
+		:param block_size			: 第二阶段每块重排的查询数, 控制候选向量占用的内存
+		:return results				: 与GensimRetrievalModel.query的返回值形式相同的结果列表, 每个查询一个
+		"""
+		start_time = time.time()
+		query_matrix = self.build_query_matrix(0, query_token_lists=query_token_lists, dictionary=dictionary, similarity=similarity, sequence=sequence)
+		if shards is None:
+			candidates, _ = similarity[0].batch_query(query_matrix, num_best=self.num_candidate)
+		else:
+			candidates, _ = similarity[0].batch_query(query_matrix, num_best=self.num_candidate, shards=shards)
+		first_stage_time = time.time() - start_time
+
+		start_time = time.time()
+		query_matrix = self.build_query_matrix(1, query_token_lists=query_token_lists, dictionary=dictionary, similarity=similarity, sequence=sequence)
+		num_best = min(self.args.num_best, candidates.shape[1])
+		indices = numpy.full((candidates.shape[0], num_best), -1, dtype=numpy.int64)
+		values = numpy.zeros((candidates.shape[0], num_best), dtype=numpy.float32)
+		for start in range(0, candidates.shape[0], block_size):
+			_candidates = candidates[start: start + block_size]
+			scores = similarity[1].get_candidate_similarities(query_matrix[start: start + block_size], _candidates)
+			order = numpy.lexsort((_candidates, -scores, _candidates < 0), axis=1)[:, : num_best]		# 有候选的位置在前, 得分降序, 得分相同时编号小的在前
+			indices[start: start + block_size] = numpy.take_along_axis(_candidates, order, axis=1)
+			values[start: start + block_size] = numpy.take_along_axis(scores, order, axis=1)
+		values[indices < 0] = 0
+		second_stage_time = time.time() - start_time
+
+		self.latency = {'first_stage': first_stage_time, 'second_stage': second_stage_time, 'n_queries': len(query_token_lists)}
+		logging.info(f'级联检索{len(query_token_lists)}个查询: 第一阶段{self.stages[0]}召回{self.num_candidate}个候选耗时{round(first_stage_time, 4)}秒, 第二阶段{self.stages[1]}重排耗时{round(second_stage_time, 4)}秒')
+		if return_arrays:
+			return indices, values
+		return to_query_results(indices, values)
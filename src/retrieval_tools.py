@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+# @author : caoyang
+# @email: caoyang@163.sufe.edu.cn
+# 文档检索相关工具
+
+if __name__ == '__main__':
+	import sys
+	sys.path.append('../')
+
+import os
+import json
+import numpy
+import shutil
+
+from scipy import sparse
+from gensim.matutils import corpus2csc
+
+from setting import *
+
+
+# 将gensim语料转为CSR稀疏矩阵, 每行是一篇文档
+# :param corpus			: gensim语料, 即(编号, 权重)二元组列表的可迭代对象
+# :param num_features	: 矩阵列数, 默认由语料推断
+# :param dtype			: 矩阵数据类型
+# :return matrix		: 形状为(n_documents, num_features)的CSR矩阵
+def corpus_to_csr(corpus, num_features=None, dtype=numpy.float32):
+	matrix = corpus2csc(corpus, num_terms=num_features, dtype=dtype).T.tocsr()
+	if num_features is not None and matrix.shape[1] < num_features:
+		matrix.resize((matrix.shape[0], num_features))		# 语料为空或末尾编号缺失时推断的列数会偏少
+	return matrix
+
+
+# 按行进行L2归一化, 零向量保持不变
+# :param matrix	: CSR稀疏矩阵或二维numpy数组
+# :return matrix: 归一化后的新矩阵, 类型与输入一致
+def normalize_rows(matrix):
+	if sparse.issparse(matrix):
+		matrix = matrix.tocsr(copy=True)
+		norms = numpy.sqrt(numpy.asarray(matrix.multiply(matrix).sum(axis=1), dtype=numpy.float64).ravel())
+		norms[norms == 0] = 1.
+		matrix.data = (matrix.data / numpy.repeat(norms, numpy.diff(matrix.indptr))).astype(matrix.dtype)
+		return matrix
+	norms = numpy.linalg.norm(matrix.astype(numpy.float64), axis=1, keepdims=True)
+	norms[norms == 0] = 1.
+	return (matrix / norms).astype(matrix.dtype)
+
+
+# 将矩阵的列数截断或用零填充到指定值
+# :param matrix			: CSR稀疏矩阵或二维numpy数组
+# :param num_features	: 目标列数
+def resize_columns(matrix, num_features):
+	if matrix.shape[1] == num_features:
+		return matrix
+	if sparse.issparse(matrix):
+		if matrix.shape[1] > num_features:
+			return matrix[:, :num_features].tocsr()
+		matrix = matrix.tocsr(copy=True)
+		matrix.resize((matrix.shape[0], num_features))
+		return matrix
+	if matrix.shape[1] > num_features:
+		return matrix[:, :num_features]
+	return numpy.hstack([matrix, numpy.zeros((matrix.shape[0], num_features - matrix.shape[1]), dtype=matrix.dtype)])
+
+
+# 逐行选出绝对值最大的k个得分, 与gensim中Similarity的num_best逻辑一致: 先按绝对值截取, 去掉绝对值不超过eps的项, 再按得分降序排列
+# :param scores			: 形状为(n_queries, n_documents)的得分矩阵
+# :param k				: 每行保留的结果数
+# :param eps			: 绝对值不超过该值的得分视为零, 不会出现在结果中
+# :param by_magnitude	: 为False时直接选出得分最大的k个, 即最大内积检索的逻辑, 此时只有负无穷的得分不会出现在结果中
+# :return indices		: 形状为(n_queries, k)的文档索引, 不足k个的位置填充-1
+# :return values		: 形状为(n_queries, k)的得分, 不足k个的位置填充0
+def select_top_k(scores, k, eps=1e-9, by_magnitude=True):
+	n_queries, n_documents = scores.shape
+	k = min(k, n_documents)
+	if not by_magnitude:
+		eps = -numpy.inf
+	magnitudes = numpy.abs(scores) if by_magnitude else scores
+	if k < n_documents:
+		candidates = numpy.argpartition(-magnitudes, k - 1, axis=1)[:, :k]
+	else:
+		candidates = numpy.tile(numpy.arange(n_documents), (n_queries, 1))
+	candidate_values = numpy.take_along_axis(scores, candidates, axis=1)
+	valid = numpy.take_along_axis(magnitudes, candidates, axis=1) > eps
+	order = numpy.lexsort((candidates, -candidate_values, ~valid), axis=1)		# 有效项在前, 得分降序, 得分相同时编号小的在前
+	indices = numpy.take_along_axis(candidates, order, axis=1)
+	values = numpy.take_along_axis(candidate_values, order, axis=1)
+	valid = numpy.take_along_axis(valid, order, axis=1)
+	indices[~valid] = -1
+	values[~valid] = 0
+	return indices, values
+
+
+# 稀疏得分矩阵的select_top_k: 只处理每行的非零项, 计算量与非零项数有关, 与文档数无关, 结果与对稠密得分矩阵调用select_top_k一致
+# :param matrix	: 形状为(n_queries, n_documents)的CSR得分矩阵
+# :param k		: 每行保留的结果数
+# :param eps	: 绝对值不超过该值的得分视为零, 不会出现在结果中
+# :return indices	: 形状为(n_queries, k)的文档索引, 不足k个的位置填充-1
+# :return values	: 形状为(n_queries, k)的得分, 不足k个的位置填充0
+def select_top_k_sparse(matrix, k, eps=1e-9):
+	matrix = sparse.csr_matrix(matrix)
+	n_queries, n_documents = matrix.shape
+	k = min(k, n_documents)
+	indices = numpy.full((n_queries, k), -1, dtype=numpy.int64)
+	values = numpy.zeros((n_queries, k), dtype=matrix.dtype)
+	for i in range(n_queries):
+		data, columns = matrix.data[matrix.indptr[i]: matrix.indptr[i + 1]], matrix.indices[matrix.indptr[i]: matrix.indptr[i + 1]]
+		valid = numpy.abs(data) > eps
+		data, columns = data[valid], columns[valid]
+		if data.shape[0] > k:															# 先按绝对值截取前k项
+			top = numpy.argpartition(-numpy.abs(data), k - 1)[: k]
+			data, columns = data[top], columns[top]
+		order = numpy.lexsort((columns, -data))											# 得分降序, 得分相同时编号小的在前
+		indices[i, : order.shape[0]] = columns[order]
+		values[i, : order.shape[0]] = data[order]
+	return indices, values
+
+# 将select_top_k的输出转为query的结果形式, 即每个查询一个[(文档编号, 得分), ...]列表
+def to_query_results(indices, values):
+	results = []
+	for _indices, _values in zip(indices.tolist(), values.tolist()):
+		results.append([(index, value) for index, value in zip(_indices, _values) if index >= 0])
+	return results
+
+
+# 根据检索结果对法律门类加权投票, 与Dataset.fill_subject的加权方式相同: 排名为r(从0开始)的段落使其所属门类的得分加1 / (r + 1)
+# :param indices			: 形状为(n_queries, n_results)的段落编号, 小于0的位置表示没有结果
+# :param paragraph_subjects	: 形状为(n_documents, )的每个段落所属的门类编号, 即SUBJECT2INDEX的值
+# :param k					: 每个查询返回的门类数
+# :return subjects			: 形状为(n_queries, k)的门类编号, 按得分降序排列, 得分相同时编号小的在前, 不足k个的位置填充0
+def vote_subjects(indices, paragraph_subjects, k):
+	n_queries, n_results = indices.shape
+	n_subjects = int(paragraph_subjects.max()) + 1 if paragraph_subjects.shape[0] > 0 else 1
+	valid = indices >= 0
+	weights = numpy.broadcast_to(1. / numpy.arange(1, n_results + 1), indices.shape)
+	scores = numpy.zeros((n_queries, n_subjects), dtype=numpy.float64)
+	numpy.add.at(scores, (numpy.nonzero(valid)[0], paragraph_subjects[indices[valid]]), weights[valid])
+	subjects, _ = select_top_k(scores, k=k)
+	subjects = numpy.maximum(subjects, 0)
+	if subjects.shape[1] < k:
+		subjects = numpy.hstack([subjects, numpy.zeros((n_queries, k - subjects.shape[1]), dtype=subjects.dtype)])
+	return subjects
+
+
+# 计算每个查询与各自的候选文档的内积: 只取出候选文档所在的行, 计算量与文档总数无关
+# :param matrix			: 形状为(n_documents, num_features)的CSR矩阵或二维numpy数组
+# :param query_matrix	: 形状为(n_queries, num_features)的CSR矩阵或二维numpy数组
+# :param candidates		: 形状为(n_queries, n_candidates)的候选文档编号, 小于0的位置表示没有候选
+# :return scores		: 形状为(n_queries, n_candidates)的内积, 没有候选的位置为0
+def candidate_inner_products(matrix, query_matrix, candidates):
+	n_queries, n_candidates = candidates.shape
+	rows = numpy.maximum(candidates, 0).ravel()
+	if sparse.issparse(matrix):
+		query_rows = numpy.repeat(numpy.arange(n_queries), n_candidates)
+		query_matrix = sparse.csr_matrix(query_matrix)[query_rows] if sparse.issparse(query_matrix) else numpy.asarray(query_matrix)[query_rows]
+		scores = numpy.asarray(sparse.csr_matrix(matrix)[rows].multiply(query_matrix).sum(axis=1), dtype=numpy.float32).reshape(n_queries, n_candidates)
+	else:
+		query_matrix = query_matrix.toarray() if sparse.issparse(query_matrix) else query_matrix
+		documents = numpy.asarray(matrix[rows], dtype=numpy.float32).reshape(n_queries, n_candidates, -1)
+		scores = numpy.einsum('qcd,qd->qc', documents, numpy.asarray(query_matrix, dtype=numpy.float32))
+	scores[candidates < 0] = 0
+	return scores
+
+
+# 将二进制列式存储的分词列表字段直接转为词频CSR矩阵: 与逐行调用Dictionary.doc2bow的结果相同, 不在字典中的分词直接丢弃
+# :param column			: 分词列表字段, 即src.data_tools中的TokenColumn
+# :param token2id		: 分词到编号的字典, 如gensim字典的token2id
+# :param num_features	: 矩阵列数, 即字典长度
+# :return matrix		: 形状为(len(column), num_features)的int64类型CSR矩阵
+def token_column_to_csr(column, token2id, num_features):
+	lookup = numpy.array([token2id.get(token, -1) for token in column.vocabulary.tolist()], dtype=numpy.int64)
+	ids = lookup[numpy.asarray(column.ids)] if lookup.shape[0] > 0 else numpy.zeros((0, ), dtype=numpy.int64)
+	rows = numpy.repeat(numpy.arange(len(column)), numpy.diff(numpy.asarray(column.offsets)))
+	kept = ids >= 0
+	matrix = sparse.csr_matrix((numpy.ones((int(kept.sum()), ), dtype=numpy.int64), (rows[kept], ids[kept])), shape=(len(column), num_features))
+	matrix.sum_duplicates()		# 同一段落中重复的分词合并为词频
+	return matrix
+
+
+# 按行号合并若干个矩阵: 第i个矩阵的各行依次放到结果的rows_list[i]指定的行, 所有行号恰好覆盖0至n_rows - 1
+# :param rows_list	: 行号数组的列表
+# :param matrices	: 与rows_list对应的CSR矩阵列表, 列数不同时补齐到最大列数
+# :return matrix	: 形状为(n_rows, 最大列数)的CSR矩阵
+def scatter_rows(rows_list, matrices):
+	rows = numpy.concatenate([numpy.asarray(_rows, dtype=numpy.int64) for _rows in rows_list])
+	width = max(matrix.shape[1] for matrix in matrices)
+	order = numpy.empty((rows.shape[0], ), dtype=numpy.int64)
+	order[rows] = numpy.arange(rows.shape[0])
+	return sparse.vstack([resize_columns(sparse.csr_matrix(matrix), width) for matrix in matrices], format='csr')[order]
+
+
+# 将一组numpy数组保存到一个文件夹中: 写入临时目录后再重命名, 避免并发读取到不完整的文件
+# :param export_path	: 保存的文件夹路径
+# :param arrays			: 数组名到numpy数组的字典, 每个数组保存为一个npy文件
+# :param meta			: 其他需要记录的信息, 保存在meta.json中
+def save_arrays(export_path, arrays, meta):
+	temp_path = f'{export_path}.{os.getpid()}.tmp'
+	os.makedirs(temp_path, exist_ok=True)
+	for name, array in arrays.items():
+		numpy.save(os.path.join(temp_path, f'{name}.npy'), numpy.ascontiguousarray(array))
+	with open(os.path.join(temp_path, 'meta.json'), 'w', encoding='utf8') as f:
+		json.dump(dict(meta, arrays=list(arrays.keys())), f)
+	if os.path.exists(export_path):
+		shutil.rmtree(export_path, ignore_errors=True)
+	try:
+		os.replace(temp_path, export_path)
+	except OSError:
+		shutil.rmtree(temp_path, ignore_errors=True)		# 其他进程已经写入了相同的文件
+
+
+# 加载save_arrays保存的文件夹
+# :param import_path	: 保存的文件夹路径
+# :param mmap_mode		: numpy.load的mmap_mode参数, 默认以内存映射方式只读加载
+# :return arrays		: 数组名到numpy数组的字典
+# :return meta			: meta.json中记录的信息
+def load_arrays(import_path, mmap_mode='r'):
+	with open(os.path.join(import_path, 'meta.json'), 'r', encoding='utf8') as f:
+		meta = json.load(f)
+	arrays = {name: numpy.load(os.path.join(import_path, f'{name}.npy'), mmap_mode=mmap_mode) for name in meta['arrays']}
+	return arrays, meta
+
+
+# 分块计算两组向量之间的平方欧氏距离并返回每行最近的中心
+# :param data		: 形状为(n, d)的数组
+# :param centroids	: 形状为(k, d)的数组
+# :param block_size	: 每块的行数
+# :return labels	: 形状为(n, )的最近中心编号
+def assign_nearest(data, centroids, block_size=65536):
+	labels = numpy.empty((data.shape[0], ), dtype=numpy.int64)
+	centroid_norms = (centroids ** 2).sum(axis=1)
+	for start in range(0, data.shape[0], block_size):
+		block = data[start: start + block_size]
+		distances = centroid_norms[None, :] - 2 * block @ centroids.T		# 每行的|x|^2是常数, 不影响最近中心的选择
+		labels[start: start + block_size] = distances.argmin(axis=1)
+	return labels
+
+
+# numpy实现的k-means聚类(Lloyd算法), 用于构建近似最近邻索引的粗量化器与乘积量化码本
+# :param data			: 形状为(n, d)的数组
+# :param n_clusters		: 聚类数, 超过样本数时取样本数
+# :param n_iterations	: 迭代次数
+# :param seed			: 随机种子, 保证索引构建可复现
+# :return centroids		: 形状为(n_clusters, d)的聚类中心
+# :return labels		: 形状为(n, )的每个样本所属的聚类编号
+def kmeans(data, n_clusters, n_iterations=20, seed=0):
+	data = numpy.asarray(data, dtype=numpy.float32)
+	n_clusters = max(1, min(n_clusters, data.shape[0]))
+	random_state = numpy.random.RandomState(seed)
+	centroids = data[random_state.choice(data.shape[0], n_clusters, replace=False)].copy()
+	labels = assign_nearest(data, centroids)
+	for _ in range(n_iterations):
+		counts = numpy.bincount(labels, minlength=n_clusters)
+		sums = sparse.csr_matrix((numpy.ones((data.shape[0], ), dtype=numpy.float32), (labels, numpy.arange(data.shape[0]))), shape=(n_clusters, data.shape[0])) @ data
+		empty = counts == 0
+		centroids[~empty] = sums[~empty] / counts[~empty, None]
+		if empty.any():
+			centroids[empty] = data[random_state.choice(data.shape[0], int(empty.sum()), replace=False)]	# 空簇重新随机取样本作为中心
+		new_labels = assign_nearest(data, centroids)
+		if numpy.array_equal(new_labels, labels):
+			break
+		labels = new_labels
+	return centroids, labels
@@ -1,76 +1,174 @@
-# -*- coding: utf-8 -*- 
-# @author : caoyang
-# @email: caoyang@163.sufe.edu.cn
-# 其他工具函数
-
-if __name__ == '__main__':
-	import sys
-	sys.path.append('../')
-
-import os
-import time
-import json
-import logging
-
-from setting import *
-
-from functools import wraps
-
-# 程序计时的装饰器
-def timer(function):
-	@wraps(function)
-	def wrapper(*args, **kwargs):
-		start_time = time.time()
-		function_return = function(*args, **kwargs)
-		end_time = time.time()
-		print('Function `{}` runtime is {} seconds.'.format(function.__name__, end_time - start_time))
-		return function_return
-	return wrapper
-
-# 初始化日志配置
-def initialize_logger(filename, filemode='w'):
-	logger = logging.getLogger()
-	logger.setLevel(logging.DEBUG)
-
-	formatter = logging.Formatter('%(asctime)s | %(filename)s | %(levelname)s | %(message)s')
-	file_handler = logging.FileHandler(filename, mode='w', encoding='utf8')
-	file_handler.setFormatter(formatter)
-	logger.addHandler(file_handler)
-	
-	console = logging.StreamHandler()
-	console.setLevel(logging.INFO)
-	console.setFormatter(formatter)
-	logger.addHandler(console)
-	
-	return logger
-
-# 终止日志句柄
-def terminate_logger(logger):
-	for handler in logger.handlers[:]:
-		logger.removeHandler(handler)
-
-# 加载配置参数
-def load_args(Config):
-	config = Config()
-	parser = config.parser
-	try:
-		return parser.parse_args()			# 常规加载配置参数
-	except:
-		return parser.parse_known_args()[0]	# JupyterNotebook中加载配置参数
-
-# 保存配置参数
-def save_args(args, save_path=None):
-
-	class _MyEncoder(json.JSONEncoder):
-		"""自定义的特殊类型数据的序列化编码器"""
-		def default(self, obj):
-			if isinstance(obj, type) or isinstance(obj, types.FunctionType):
-				return str(obj)
-			return json.JSONEncoder.default(self, obj)
-			
-	if save_path is None:
-		save_path = os.path.join(LOGGING_DIR, f'config_{time.strftime("%Y%m%d%H%M%S")}.json')
-	with open(save_path, 'w') as f:
-		f.write(json.dumps(vars(args), cls=_MyEncoder))
-
-
+# -*- coding: utf-8 -*- 
+# @author : caoyang
+# @email: caoyang@163.sufe.edu.cn
+# 其他工具函数
+
+if __name__ == '__main__':
+	import sys
+	sys.path.append('../')
+
+import os
+import time
+import json
+import hashlib
+import logging
+import traceback
+import multiprocessing
+
+try:
+	import resource		# Windows下没有resource模块, 无法统计子进程的峰值内存
+except ImportError:
+	resource = None
+
+from setting import *
+
+from functools import wraps
+from multiprocessing.connection import wait
+
+# 程序计时的装饰器
+def timer(function):
+	@wraps(function)
+	def wrapper(*args, **kwargs):
+		start_time = time.time()
+		function_return = function(*args, **kwargs)
+		end_time = time.time()
+		print('Function `{}` runtime is {} seconds.'.format(function.__name__, end_time - start_time))
+		return function_return
+	return wrapper
+
+# 初始化日志配置
+def initialize_logger(filename, filemode='w'):
+	logger = logging.getLogger()
+	logger.setLevel(logging.DEBUG)
+
+	formatter = logging.Formatter('%(asctime)s | %(filename)s | %(levelname)s | %(message)s')
+	file_handler = logging.FileHandler(filename, mode='w', encoding='utf8')
+	file_handler.setFormatter(formatter)
+	logger.addHandler(file_handler)
+	
+	console = logging.StreamHandler()
+	console.setLevel(logging.INFO)
+	console.setFormatter(formatter)
+	logger.addHandler(console)
+	
+	return logger
+
+# 终止日志句柄
+def terminate_logger(logger):
+	for handler in logger.handlers[:]:
+		logger.removeHandler(handler)
+
+# 加载配置参数
+def load_args(Config):
+	config = Config()
+	parser = config.parser
+	try:
+		return parser.parse_args()			# 常规加载配置参数
+	except:
+		return parser.parse_known_args()[0]	# JupyterNotebook中加载配置参数
+
+# 保存配置参数
+def save_args(args, save_path=None):
+
+	class _MyEncoder(json.JSONEncoder):
+		"""自定义的特殊类型数据的序列化编码器"""
+		def default(self, obj):
+			if isinstance(obj, type) or isinstance(obj, types.FunctionType):
+				return str(obj)
+			return json.JSONEncoder.default(self, obj)
+			
+	if save_path is None:
+		save_path = os.path.join(LOGGING_DIR, f'config_{time.strftime("%Y%m%d%H%M%S")}.json')
+	with open(save_path, 'w') as f:
+		f.write(json.dumps(vars(args), cls=_MyEncoder))
+
+# 生成指纹: 由配置字典与输入文件(路径, 大小, 修改时间)共同决定的md5值, 目录会递归统计其中的所有文件
+def generate_fingerprint(config, filepaths):
+	file_stats = []
+	for filepath in sorted(set(filepaths)):
+		if os.path.isdir(filepath):
+			for root, _, filenames in os.walk(filepath):
+				for filename in sorted(filenames):
+					_filepath = os.path.join(root, filename)
+					file_stats.append([_filepath, os.path.getsize(_filepath), os.stat(_filepath).st_mtime_ns])
+		elif os.path.exists(filepath):
+			file_stats.append([filepath, os.path.getsize(filepath), os.stat(filepath).st_mtime_ns])
+		else:
+			file_stats.append([filepath, None, None])
+	string = json.dumps({'config': config, 'files': file_stats}, sort_keys=True, ensure_ascii=False)
+	return hashlib.md5(string.encode('utf8')).hexdigest()
+
+
+# 当前进程的峰值常驻内存(MB), Windows下没有resource模块时返回None
+def get_peak_memory():
+	if resource is None:
+		return None
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024	# Linux下单位为KB
+
+# 在子进程中执行run_task_graph的一个任务, 通过管道返回运行状态, 耗时(秒)与峰值内存(MB)
+def _run_task(function, kwargs, connection):
+	start_time = time.time()
+	try:
+		function(**kwargs)
+		status = 'done'
+	except BaseException:
+		status = traceback.format_exc()
+	connection.send((status, time.time() - start_time, get_peak_memory()))
+	connection.close()
+
+# 按依赖关系并行执行一组任务: 每个任务在独立的子进程中运行, 依赖的任务全部完成后才能开始, 同时运行的任务占用的CPU数之和不超过cpu_budget
+# :param tasks		: 任务名称到任务配置的字典, 任务配置包括function(模块级函数), kwargs, dependencies(依赖的任务名称列表), cpus(占用的CPU数, 默认为1)
+# :param cpu_budget	: 总CPU预算, 默认为os.cpu_count()
+# :return summary	: 任务名称到{'status', 'wall_time', 'peak_memory'}的字典, status为done, failed或skipped(依赖的任务失败)
+def run_task_graph(tasks, cpu_budget=None):
+	cpu_budget = os.cpu_count() if cpu_budget is None else cpu_budget
+	for name, task in tasks.items():
+		for dependency in task.get('dependencies', []):
+			assert dependency in tasks, f'任务{name}依赖的任务{dependency}不存在'
+	
+	# 优先启动后继任务多的任务, 使最长的依赖链尽早开始
+	children = {name: [_name for _name, _task in tasks.items() if name in _task.get('dependencies', [])] for name in tasks}
+	def _count_descendants(_name):
+		return sum(1 + _count_descendants(_child) for _child in children[_name])
+	priority = {name: _count_descendants(name) for name in tasks}
+	
+	summary = {}
+	running = {}		# 管道到(任务名称, 子进程, 占用的CPU数)
+	used_cpus = 0
+	while len(summary) < len(tasks):
+		# 依赖失败的任务直接跳过
+		for name, task in tasks.items():
+			if name not in summary and any(summary.get(dependency, {}).get('status') in ['failed', 'skipped'] for dependency in task.get('dependencies', [])):
+				summary[name] = {'status': 'skipped', 'wall_time': None, 'peak_memory': None}
+				logging.warning(f'任务{name}依赖的任务失败, 跳过')
+		started = [_name for _name, _, _ in running.values()]
+		ready = [name for name, task in tasks.items() if name not in summary and name not in started and all(summary.get(dependency, {}).get('status') == 'done' for dependency in task.get('dependencies', []))]
+		for name in sorted(ready, key=lambda _name: -priority[_name]):
+			cpus = min(tasks[name].get('cpus', 1), cpu_budget)
+			if running and used_cpus + cpus > cpu_budget:
+				continue
+			receiver, sender = multiprocessing.Pipe(duplex=False)
+			process = multiprocessing.Process(target=_run_task, args=(tasks[name]['function'], tasks[name].get('kwargs', {}), sender))
+			process.start()
+			sender.close()
+			running[receiver] = (name, process, cpus)
+			used_cpus += cpus
+			logging.info(f'启动任务{name}: 占用{cpus}个CPU, 已占用{used_cpus}/{cpu_budget}')
+		if not running:
+			break
+		for receiver in wait(list(running.keys())):
+			name, process, cpus = running.pop(receiver)
+			try:
+				status, wall_time, peak_memory = receiver.recv()
+			except EOFError:
+				status, wall_time, peak_memory = '子进程异常退出', None, None
+			process.join()
+			used_cpus -= cpus
+			if status == 'done':
+				summary[name] = {'status': 'done', 'wall_time': wall_time, 'peak_memory': peak_memory}
+				logging.info(f'任务{name}完成: 耗时{wall_time:.1f}秒, 峰值内存{peak_memory}MB')
+			else:
+				summary[name] = {'status': 'failed', 'wall_time': wall_time, 'peak_memory': peak_memory}
+				logging.error(f'任务{name}失败: {status}')
+	return summary
+